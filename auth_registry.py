@@ -0,0 +1,76 @@
+"""
+auth_registry.py
+邀请码名单 + 设备绑定的内存注册表
+
+tokens.json 只在启动后首次访问及文件 mtime 变化时读取；
+设备绑定委托给 binding_store.BindingStore，只提供异步查询（未命中缓存时在线程池中查后端）。
+邀请码校验走内存（set，O(1)）。
+start() 之后由后台任务在线程池里 stat / 重新读取 tokens.json，事件循环上不碰磁盘。
+
+对外接口：
+  InviteRegistry(tokens_file, binding_store, check_interval)
+      .is_valid(token)                → 邀请码是否在名单中
+      await .lookup_binding(token)    → 已绑定的 device_id（未绑定返回 None）；内存未命中时在线程池中查库
+      await .bind(token, device_id)   → 写入绑定，返回最终生效的 device_id
+      await .start() / .stop()        → 启停 tokens.json 后台热更新
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from binding_store import BindingStore
+from json_cache import MtimeJsonFile
+
+logger = logging.getLogger(__name__)
+
+
+def _token_set(raw) -> set:
+    if not isinstance(raw, dict):
+        return set()
+    return set(raw.get("valid_tokens", []))
+
+
+class InviteRegistry:
+    def __init__(self, tokens_file: str, binding_store: BindingStore, check_interval: float = 1.0):
+        self._tokens = MtimeJsonFile(tokens_file, default=set,
+                                     check_interval=check_interval, transform=_token_set)
+        self._check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+        self.binding_store = binding_store
+
+    def valid_tokens(self) -> set:
+        if self._task is not None:
+            return self._tokens.peek()
+        return self._tokens.get()
+
+    def is_valid(self, token: str) -> bool:
+        return token in self.valid_tokens()
+
+    async def lookup_binding(self, token: str) -> Optional[str]:
+        return await self.binding_store.lookup(token)
+
+    async def start(self):
+        if self._task is None:
+            await asyncio.to_thread(self._tokens.get)
+            self._task = asyncio.create_task(self._watch_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(max(self._check_interval, 0.1))
+            try:
+                await asyncio.to_thread(self._tokens.get)
+            except Exception:
+                logger.exception("邀请码名单重新加载失败")
+
+    async def bind(self, token: str, device_id: str) -> str:
+        return await self.binding_store.bind(token, device_id)
@@ -0,0 +1,323 @@
+"""
+binding_store.py
+邀请码 ↔ 设备绑定存储（可插拔后端 + 异步批量写入）
+
+后端：
+  SqliteBindingBackend — SQLite WAL（默认），按 token 建主键索引，
+                         多个 uvicorn worker 共享同一个库文件也安全；绑定结果进程内常驻。
+                         首次启动时导入旧的 token_bindings.json（只导入一次）；解绑用命令行：
+                           python binding_store.py list / unbind <token>（之后重启服务生效）
+  JsonBindingBackend   — token_bindings.json（需显式 BINDING_BACKEND=json），只适合单进程；
+                         管理员直接编辑文件即可解绑，改动按 mtime 生效
+  后端在 BindingStore.start() 时才创建（线程池中），import 时不碰磁盘。
+
+语义：
+  绑定是「先到先得」的一次性写入：bind_many 对已存在的 token 不做覆盖，
+  返回每个 token 最终生效的 device_id。两个并发 /verify_token
+  只会有一个绑定成功，另一个拿到的是赢家的 device_id。
+
+对外接口：
+  create_backend(kind, path, legacy_json)  → 根据配置创建后端
+  BindingStore(backend_factory)           # 无参可调用，返回后端实例
+      await .lookup(token)        → device_id / None；未命中内存缓存时在线程池中查后端
+      await .bind(token, device)  → 最终生效的 device_id
+      await .start() / .stop()    → 打开 / 关闭后端，启停后台批量写入任务
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from json_cache import MtimeJsonFile
+
+
+# ==========================================
+# 🗄️ 后端
+# ==========================================
+
+class BindingBackend:
+    # 绑定结果能否在进程内永久缓存（后端之外没有解绑途径时才安全）
+    cache_bindings = True
+
+    def get(self, token: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def bind_many(self, pairs: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """批量「不存在才写入」，返回 {token: 最终生效的 device_id}。"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonBindingBackend(BindingBackend):
+    """整个绑定表存一个 JSON 文件。仅适合单进程部署。"""
+
+    # 文件可被手工编辑（解绑），不能缓存；MtimeJsonFile 本身已是内存副本
+    cache_bindings = False
+
+    def __init__(self, path: str):
+        self._file = MtimeJsonFile(path, default=dict, check_interval=1.0,
+                                   transform=lambda raw: raw if isinstance(raw, dict) else {})
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[str]:
+        return self._file.get().get(token)
+
+    def bind_many(self, pairs):
+        with self._lock:
+            bindings = dict(self._file.get())
+            result = {}
+            for token, device_id in pairs:
+                result[token] = bindings.setdefault(token, device_id)
+            self._file.replace(bindings)
+            return result
+
+
+# PRAGMA user_version：旧 JSON 绑定表已导入
+LEGACY_IMPORTED = 1
+
+
+class SqliteBindingBackend(BindingBackend):
+    """SQLite WAL 后端。每个线程一个连接，写入用 BEGIN IMMEDIATE 串行化。"""
+
+    def __init__(self, path: str, legacy_json: Optional[str] = None):
+        self.path = path
+        self._local = threading.local()
+        # 各线程（事件循环、线程池 worker）打开的连接都登记在这里，close() 时统一关闭
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_bindings ("
+                " token TEXT PRIMARY KEY,"
+                " device_id TEXT NOT NULL,"
+                " bound_at REAL NOT NULL)"
+            )
+        if legacy_json:
+            self._import_legacy(legacy_json)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _import_legacy(self, legacy_json: str):
+        """
+        首次切换到 SQLite 时，把旧 token_bindings.json 导入（已存在的不覆盖）。
+        只导入一次：完成后记在 PRAGMA user_version 里，之后用命令行解绑的记录不会在重启时被 JSON 恢复。
+        """
+        legacy = {}
+        if os.path.exists(legacy_json):
+            try:
+                with open(legacy_json, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except (IOError, json.JSONDecodeError):
+                return   # 文件读不了：不做标记，下次启动再试
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < LEGACY_IMPORTED:
+                if isinstance(legacy, dict) and legacy:
+                    now = time.time()
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO token_bindings (token, device_id, bound_at) VALUES (?, ?, ?)",
+                        [(t, d, now) for t, d in legacy.items()]
+                    )
+                conn.execute(f"PRAGMA user_version = {LEGACY_IMPORTED}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, token: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT device_id FROM token_bindings WHERE token = ?", (token,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def bind_many(self, pairs):
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO token_bindings (token, device_id, bound_at) VALUES (?, ?, ?)",
+                [(t, d, now) for t, d in pairs]
+            )
+            result = {}
+            for token, _ in pairs:
+                row = conn.execute(
+                    "SELECT device_id FROM token_bindings WHERE token = ?", (token,)
+                ).fetchone()
+                result[token] = row[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def unbind(self, token: str) -> bool:
+        """删除一条绑定（管理命令用），返回是否删到了。"""
+        cur = self._conn().execute("DELETE FROM token_bindings WHERE token = ?", (token,))
+        return cur.rowcount > 0
+
+    def list_bindings(self) -> List[Tuple[str, str, float]]:
+        return self._conn().execute(
+            "SELECT token, device_id, bound_at FROM token_bindings ORDER BY bound_at"
+        ).fetchall()
+
+    def close(self):
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+def create_backend(kind: str, path: str, legacy_json: Optional[str] = None) -> BindingBackend:
+    if kind == "json":
+        return JsonBindingBackend(legacy_json or path)
+    if kind == "sqlite":
+        return SqliteBindingBackend(path, legacy_json=legacy_json)
+    raise ValueError(f"未知的绑定存储后端：{kind}")
+
+
+# ==========================================
+# ✍️ 批量写入 + 内存缓存
+# ==========================================
+
+class BindingStore:
+    def __init__(self, backend_factory: Callable[[], BindingBackend],
+                 max_batch: int = 64, batch_window: float = 0.005):
+        """
+        backend_factory: 创建后端的无参函数，start() 时在线程池中调用
+        max_batch:       一个事务最多合并多少条绑定
+        batch_window:    收到第一条后再等待多久凑批（秒）
+        """
+        self._backend_factory = backend_factory
+        self.backend: Optional[BindingBackend] = None
+        self._max_batch = max_batch
+        self._batch_window = batch_window
+        # 后端允许时（cache_bindings），已确认的绑定长期缓存（多 worker 也一致）
+        self._cache: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def _require_backend(self) -> BindingBackend:
+        if self.backend is None:
+            raise RuntimeError("BindingStore 尚未 start()")
+        return self.backend
+
+    def _remember(self, result: Dict[str, str]):
+        if self.backend.cache_bindings:
+            self._cache.update(result)
+
+    async def lookup(self, token: str) -> Optional[str]:
+        device_id = self._cache.get(token)
+        if device_id is None:
+            backend = self._require_backend()
+            device_id = await asyncio.get_running_loop().run_in_executor(None, backend.get, token)
+            if device_id is not None:
+                self._remember({token: device_id})
+        return device_id
+
+    async def bind(self, token: str, device_id: str) -> str:
+        if token in self._cache:
+            return self._cache[token]
+        self._require_backend()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((token, device_id, fut))
+        return await fut
+
+    async def start(self):
+        if self.backend is None:
+            self.backend = await asyncio.to_thread(self._backend_factory)
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+            self._queue = None
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.close)
+            self.backend = None
+        self._cache.clear()
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List = [await self._queue.get()]
+            deadline = loop.time() + self._batch_window
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                result = await loop.run_in_executor(
+                    None, self.backend.bind_many, [(t, d) for t, d, _ in batch]
+                )
+                self._remember(result)
+                for token, _, fut in batch:
+                    if not fut.done():
+                        fut.set_result(result[token])
+            except Exception as e:
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+if __name__ == "__main__":
+    # SQLite 后端的解绑工具：服务里的绑定缓存不会失效，解绑后需重启服务
+    import argparse
+
+    parser = argparse.ArgumentParser(description="查看 / 解除邀请码的设备绑定（SQLite 后端）")
+    parser.add_argument("--db", default=os.getenv("BINDING_DB_PATH", "token_bindings.db"))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="列出全部绑定")
+    unbind_cmd = sub.add_parser("unbind", help="解除某个邀请码的绑定")
+    unbind_cmd.add_argument("token")
+    args = parser.parse_args()
+
+    backend = SqliteBindingBackend(args.db)
+    try:
+        if args.cmd == "list":
+            for token, device_id, bound_at in backend.list_bindings():
+                print(f"{token}\t{device_id}\t{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(bound_at))}")
+        elif backend.unbind(args.token):
+            print(f"已解绑 {args.token}，重启服务后生效")
+        else:
+            print(f"{args.token} 没有绑定")
+    finally:
+        backend.close()
@@ -0,0 +1,143 @@
+"""
+blocking_io.py
+阻塞 I/O 线程池 + 事件循环阻塞检测
+
+线程池：
+  事件循环上不能直接读写磁盘 / SQLite——一次慢读会卡住进程里所有正在等待 LLM 的请求。
+  这类调用统一交给有上限的线程池：await pool.run(func, *args)。
+  install() 会把它设为事件循环的默认 executor，各模块里的 asyncio.to_thread /
+  run_in_executor(None, ...) 也一并走这个池，线程数不会随并发无限增长。
+
+阻塞检测：
+  给 asyncio 的 Handle._run 计时，事件循环上单次回调（一个 task 从 await 恢复到下一次
+  await 之间的同步代码）超过 threshold_ms 时记一条 warning，带上 task 名和协程位置。
+  每次回调只多两次 perf_counter，可在线上常开；threshold_ms <= 0 表示不启用。
+
+对外接口：
+  BlockingIOPool(max_workers)
+      await .run(func, *args, **kwargs) → func 的返回值（在线程池中执行）
+      .install(loop)                    → 设为 loop 的默认 executor
+      .stats() / .shutdown()
+  BlockingCallDetector(threshold_ms, keep=20)
+      .install() / .uninstall()         → 开始 / 停止计时（进程内只能有一个生效）
+      .stats()                          → 慢回调次数、最长耗时、最近几条记录
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+class BlockingIOPool:
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking-io")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak = 0
+        self._calls = 0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self._call, func, *args, **kwargs))
+
+    def _call(self, func, *args, **kwargs):
+        with self._lock:
+            self._calls += 1
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        loop.set_default_executor(self.executor)
+
+    def stats(self) -> Dict:
+        # to_thread / run_in_executor(None) 直接提交给 executor，不经过 _call，不计入这里的次数
+        return {"max_workers": self.max_workers, "calls": self._calls,
+                "in_flight": self._in_flight, "peak_in_flight": self._peak}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def _describe(handle: asyncio.Handle) -> str:
+    """尽量定位到是哪个协程：task 名 + 最内层协程的挂起位置（即阻塞代码之后的那个 await）。"""
+    owner = getattr(handle._callback, "__self__", None)
+    if not isinstance(owner, asyncio.Task):
+        return repr(handle)
+    coro = owner.get_coro()
+    # 沿 await 链往里走，停在 asyncio 自身代码之前
+    inner = getattr(coro, "cr_await", None)
+    while getattr(inner, "cr_code", None) is not None and not inner.cr_code.co_filename.startswith(_ASYNCIO_DIR):
+        coro, inner = inner, getattr(inner, "cr_await", None)
+    frame = getattr(coro, "cr_frame", None)
+    if frame is not None:
+        where = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+    elif getattr(coro, "cr_code", None) is not None:
+        where = f"{coro.cr_code.co_filename}:{coro.cr_code.co_firstlineno}（已结束）"
+    else:
+        where = "?"
+    return f"{owner.get_name()} {getattr(coro, '__qualname__', coro)} @ {where}"
+
+
+class BlockingCallDetector:
+    def __init__(self, threshold_ms: float, keep: int = 20):
+        self.threshold = threshold_ms / 1000
+        self._recent: Deque[Dict] = deque(maxlen=keep)
+        self._slow_calls = 0
+        self._worst_ms = 0.0
+        self._original: Optional[Callable] = None
+
+    def install(self):
+        if self._original is not None or self.threshold <= 0:
+            return
+        original = asyncio.events.Handle._run
+        detector = self
+
+        def _timed_run(handle):
+            start = time.perf_counter()
+            try:
+                return original(handle)
+            finally:
+                elapsed = time.perf_counter() - start
+                if elapsed >= detector.threshold:
+                    detector._report(handle, elapsed)
+
+        self._original = original
+        asyncio.events.Handle._run = _timed_run
+
+    def uninstall(self):
+        if self._original is not None:
+            asyncio.events.Handle._run = self._original
+            self._original = None
+
+    def _report(self, handle: asyncio.Handle, elapsed: float):
+        ms = elapsed * 1000
+        where = _describe(handle)
+        self._slow_calls += 1
+        self._worst_ms = max(self._worst_ms, ms)
+        self._recent.append({"ms": round(ms, 1), "where": where, "at": time.time()})
+        logger.warning("事件循环被阻塞 %.0f ms：%s", ms, where)
+
+    def stats(self) -> Dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "enabled": self._original is not None,
+            "slow_calls": self._slow_calls,
+            "worst_ms": round(self._worst_ms, 1),
+            "recent": list(self._recent),
+        }
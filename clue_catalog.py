@@ -0,0 +1,54 @@
+"""
+clue_catalog.py
+统一线索目录：客观线索 + 条件线索 + 信任线索，按线索 ID 查询
+
+以前条件线索 / 信任线索在玩家触发时才写进全局 objective_clues_db（所有玩家共享、
+随进程运行时间增长），没触发过的条件线索查不到名字，只能在 CONDITIONAL_CLUE_DB 里线性查找。
+现在启动时一次性合并成只读目录，各处统一从这里按 ID 取线索数据。
+
+同一 ID 出现在多个来源时以客观线索为准。
+
+对外接口：
+  ClueCatalog(objective_clues_db, conditional_clue_db, trust_clue_db)
+      只读 Mapping：catalog[cid] / catalog.get(cid) / cid in catalog / len / items()
+      .source(cid) → "objective" / "conditional" / "trust"，不存在返回 None
+"""
+
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+
+class ClueCatalog(Mapping):
+    def __init__(self, objective_clues_db: Dict[str, Dict], conditional_clue_db: Dict[str, Dict],
+                 trust_clue_db: List[Dict]):
+        self._clues: Dict[str, Dict] = {}
+        self._sources: Dict[str, str] = {}
+        for cid, clue in objective_clues_db.items():
+            self._add(cid, clue, "objective")
+        for config in conditional_clue_db.values():
+            self._add(config["clue_data"]["id"], config["clue_data"], "conditional")
+        for tc in trust_clue_db:
+            self._add(tc["clue_id"], tc["clue_data"], "trust")
+
+    def _add(self, cid: str, clue: Dict, source: str):
+        if cid not in self._clues:
+            self._clues[cid] = clue
+            self._sources[cid] = source
+
+    def __getitem__(self, cid: str) -> Dict:
+        return self._clues[cid]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._clues)
+
+    def __len__(self) -> int:
+        return len(self._clues)
+
+    def __contains__(self, cid) -> bool:
+        return cid in self._clues
+
+    def get(self, cid, default=None):
+        return self._clues.get(cid, default)
+
+    def source(self, cid: str) -> Optional[str]:
+        return self._sources.get(cid)
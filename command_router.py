@@ -0,0 +1,98 @@
+"""
+command_router.py
+玩家指令解析与分发
+
+user_input 只解析一次，得到 Command(verb, args, payload, raw)：
+  "CMD_INSPECT:灶房:水缸" → verb="CMD_INSPECT", args=("灶房", "水缸"), payload="灶房:水缸"
+  "CMD_EXIT"              → verb="CMD_EXIT", args=(), payload=""
+  "系统菜单"              → verb="系统菜单", args=(), payload=""
+  自由对话文本            → verb=原文, args=(), payload=""
+handler 按 verb 分支、从 args / payload 取参数，不再自己拆 user_input；自由对话用 raw。
+
+分发顺序：
+  1. 请求带 npc_id 且不是 CMD_ 指令 → 自由对话 handler（与 NPC 聊天时输入"系统菜单"也是对话）
+  2. verb 已注册 → 直接调用对应 handler（字典查找）
+  3. 请求带 npc_id → 自由对话 handler
+  4. 兜底 handler（"请选择操作。"）；前面的 handler 返回 done=False 时也走兜底
+
+只读指令（菜单、回想等）注册时声明 read_only=True，main.py 据此跳过存档加密、
+让客户端沿用原令牌。声明前要确认 handler 在所有分支下都不写 current_state。
+
+handler 签名：
+  async handler(command, request, current_state, model_id) → result dict（含 done）
+
+对外接口：
+  Command
+  parse_command(user_input)   → Command
+  CommandRouter()
+      .register(verbs, handler, read_only=False) → 同一 verb 重复注册抛 ValueError
+      .is_read_only(command, request) → 本次分发到的指令是否声明为只读（不修改存档）
+      .set_talk(handler) / .set_fallback(handler)
+      .dispatch(command, request, current_state, model_id) → result dict
+      .verbs()                      → 已注册的 verb 列表
+"""
+
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+Handler = Callable[..., Awaitable[Dict]]
+
+
+COMMAND_PREFIX = "CMD_"
+
+
+class Command(NamedTuple):
+    verb: str
+    args: Tuple[str, ...]   # payload 按 ":" 拆开
+    payload: str            # 第一个 ":" 之后的原文（单参数指令直接用它）
+    raw: str
+
+
+def parse_command(user_input: str) -> Command:
+    if user_input.startswith(COMMAND_PREFIX):
+        verb, sep, payload = user_input.partition(":")
+        return Command(verb, tuple(payload.split(":")) if sep else (), payload, user_input)
+    return Command(user_input, (), "", user_input)
+
+
+class CommandRouter:
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+        self._read_only: Set[str] = set()
+        self._talk: Optional[Handler] = None
+        self._fallback: Optional[Handler] = None
+
+    def register(self, verbs: Iterable[str], handler: Handler, read_only: bool = False):
+        for verb in verbs:
+            if verb in self._handlers:
+                raise ValueError(f"指令 {verb} 已由 {self._handlers[verb].__name__} 处理")
+            self._handlers[verb] = handler
+            if read_only:
+                self._read_only.add(verb)
+
+    def _is_free_talk(self, command: Command, request) -> bool:
+        return bool(request.npc_id) and not command.verb.startswith(COMMAND_PREFIX)
+
+    def is_read_only(self, command: Command, request) -> bool:
+        return command.verb in self._read_only and not self._is_free_talk(command, request)
+
+    def set_talk(self, handler: Handler):
+        self._talk = handler
+
+    def set_fallback(self, handler: Handler):
+        self._fallback = handler
+
+    async def dispatch(self, command: Command, request, current_state: Dict, model_id: str) -> Dict:
+        if self._is_free_talk(command, request):
+            handler = self._talk
+        else:
+            handler = self._handlers.get(command.verb)
+            if handler is None:
+                handler = self._talk if request.npc_id else self._fallback
+        result = await handler(command, request, current_state, model_id)
+        if not result["done"] and handler is not self._fallback:
+            # 参数不合法等情况下 handler 未处理，同样走兜底
+            result = await self._fallback(command, request, current_state, model_id)
+        return result
+
+    def verbs(self) -> List[str]:
+        return list(self._handlers)
@@ -14,16 +14,16 @@
       → 返回当前可触发的条件线索列表（用于生成动态按钮）
 
   try_trigger_conditional_clue(clue_id, d_state, current_location, current_time)
-      → 尝试触发某条件线索，返回结果文本或失败原因
+      → 尝试触发某条件线索，返回结果文本或失败原因（只改玩家存档，线索数据统一由 clue_catalog 提供）
 
   get_trust_triggered_clues(d_state, current_time)
-      → 返回本时辰应主动推送给玩家的信任线索列表
+      → 返回本时辰应主动推送给玩家的信任线索列表（配置见 TRUST_CLUE_DB）
 
   check_dark_attempt(clue_id, current_location, current_time)
       → 玩家在黑暗中尝试光照类线索时，返回"看不清"的反馈文本
 """
 
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 # ==========================================
 # 🕯️ 光照系统
@@ -520,6 +520,161 @@ CONDITIONAL_CLUE_DB: Dict[str, Dict] = {
 }
 
 
+# ==========================================
+# 🤝 信任触发线索
+# ==========================================
+# 独立于 CONDITIONAL_CLUE_DB，因为触发逻辑不同：
+# NPC 信任度达到 trust_threshold，且当前时辰在 trigger_time 内时，主动递给玩家。
+
+TRUST_CLUE_DB: List[Dict] = [
+    {
+        "clue_id": "clue_026",  # 顾琼家书
+        "npc_id": "npc_guqiong",
+        "trust_threshold": 70,
+        "trigger_time": ["巳时", "午时"],
+        "feed_text": "顾琼似乎想和你说些什么",
+        "trigger_text": (
+            "顾琼在走廊拦住你，四下看了看，把一封写了一半的信递过来。\n\n"
+            "「你自己看吧。」\n\n"
+            "信纸上，收信人只写了「吾儿」二字，正文写道：\n"
+            "「娘此行若不归，箱底红木匣内有你的身世文书。\n"
+            "记住，杨氏的血不是罪，是证据。等你长大，去找——」\n\n"
+            "后面被撕掉了。\n\n"
+            "顾琼重新接过信，折好收进袖中，\n"
+            "眼神里有什么东西一闪而过，随即恢复冷漠：\n"
+            "「现在你知道我为什么不能死在这里了。」"
+        ),
+        "clue_data": {
+            "id": "clue_026",
+            "name": "顾琼的家书",
+            "location": "顾琼房",
+            "description": (
+                "顾琼写给孩子的未完成家书，提到「杨氏的血不是罪，是证据」。"
+                "后半段被撕去。她是杨氏后人，此行背负着远不止复仇的使命。"
+            ),
+            "hidden": False,
+            "visible_condition": "trust"
+        }
+    },
+    {
+        "clue_id": "clue_037_testimony",  # 韩子敬脚步声证词
+        "npc_id": "npc_hanzijing",
+        "trust_threshold": 50,
+        "trigger_time": ["午时", "未时"],
+        "feed_text": "韩子敬在你门口徘徊了许久",
+        "trigger_text": (
+            "韩子敬鼓起勇气找到你，结结巴巴地说：\n\n"
+            "「小……小生昨夜听到了一些动静，一直不敢说。」\n\n"
+            "「大约丑时，有人从二楼走到楼梯口，脚步很重，"
+            "是男人，靴子底有铁掌声——咚咚咚的。\n"
+            "然后大概过了半炷香，同样的脚步声从楼梯上来，"
+            "但走得……很不均匀，像是有一条腿不太对劲。」\n\n"
+            "「小生不知道这有没有用……但小生说的都是真的，"
+            "求大人不要追究小生那些诗稿！」"
+        ),
+        "clue_data": {
+            "id": "clue_037_testimony",
+            "name": "韩子敬的脚步声证词",
+            "location": "韩子敬（主动提供）",
+            "description": (
+                "韩子敬昨夜听到：丑时有人下楼，铁掌靴底，脚步沉重。"
+                "约半炷香后，同一人上楼，步伐明显不均匀，像一条腿有伤。"
+                "丑时正是赵虎独自守夜的时段——这条证词直指他。"
+            ),
+            "hidden": False,
+            "visible_condition": "trust"
+        }
+    },
+    {
+        "clue_id": "clue_qingxuzi_testimony",  # 清虚子：拂尘是做法时遗落的
+        "npc_id": "npc_qingxuzi",
+        "trust_threshold": 65,
+        "trigger_time": ["辰时", "巳时"],
+        "feed_text": "清虚子神色不安，像是想到了什么",
+        "trigger_text": (
+            "清虚子拉住你的袖子，压低声音：\n\n"
+            "「贫道想到了一件非常要紧的事……」\n\n"
+            "「那把拂尘，确实是贫道的。\n"
+            "你们来驿站之前，张三施主找贫道在后院佛龛前做了场法事，"
+            "说是最近心神不宁，要请神消灾。\n"
+            "贫道做完法事就回屋了，"
+            "但拂尘……贫道忘在佛龛旁边了。」\n\n"
+            "「后来贫道一直没想起来去拿。\n"
+            "直到起夜看见尸体时，才发现拂尘就在旁边——\n"
+            "所以贫道才顺手捡了起来，结果就被你们当成嫌疑人了！」\n\n"
+            "清虚子的眼神第一次真正流露出恐惧，"
+            "而不是装出来的惶恐。"
+        ),
+        "clue_data": {
+            "id": "clue_qingxuzi_testimony",
+            "name": "清虚子的证词：拂尘是做法时遗落的",
+            "location": "清虚子（主动提供）",
+            "description": (
+                "清虚子证实：戌时前张三请他在后院佛龛做法事，"
+                "做完后清虚子忘记带走拂尘，遗落在佛龛旁。"
+                "拂尘出现在案发现场是巧合——"
+                "但张三为什么偏偏选在佛龛前做法？他是否预见了什么？"
+            ),
+            "hidden": False,
+            "visible_condition": "trust"
+        }
+    },
+]
+
+
+def _index_trust_clues_by_time(trust_clues: List[Dict]) -> Dict[str, Tuple[Dict, ...]]:
+    index: Dict[str, List[Dict]] = {}
+    for tc in trust_clues:
+        for t in tc["trigger_time"]:
+            index.setdefault(t, []).append(tc)
+    return {t: tuple(entries) for t, entries in index.items()}
+
+
+# 时辰 → 该时辰可能触发的信任线索（按 TRUST_CLUE_DB 顺序）；未列出的时辰不做任何检查
+_TRUST_CLUES_BY_TIME = _index_trust_clues_by_time(TRUST_CLUE_DB)
+
+
+# ==========================================
+# 🗂️ 条件线索索引
+# ==========================================
+# (地点, 触发场景) → 该处可能出现的条件线索，场景为 "search" 或 "talk_with_npc:<npc_id>"。
+# 地点 / 场景 / 线索类型在索引里一次性筛好，前提线索预先转成 frozenset；
+# 每轮只需检查当前地点的少数候选条目，与线索库总量无关。trust 类型不进索引。
+# 线索库在 import 后不再变动（运行时统一走 clue_catalog 只读目录），索引在模块加载时建好一次。
+
+class _IndexedClue(NamedTuple):
+    clue_id: str
+    requires: frozenset
+    available_times: Optional[frozenset]   # 仅 time 类型有值
+    light_required: bool
+    button_text: str
+
+
+def _build_index(clue_db: Dict) -> Dict[Tuple[str, str], Tuple[_IndexedClue, ...]]:
+    index: Dict[Tuple[str, str], List[_IndexedClue]] = {}
+    for clue_id, config in clue_db.items():
+        ctype = config["type"]
+        if ctype == "trust":
+            continue
+        if config.get("trigger_context", "search") == "talk_with_npc":
+            ctx_key = f"talk_with_npc:{config.get('trigger_npc', '')}"
+        else:
+            ctx_key = "search"
+        entry = _IndexedClue(
+            clue_id=clue_id,
+            requires=frozenset(config.get("requires_clues", [])),
+            available_times=frozenset(config.get("available_times", [])) if ctype == "time" else None,
+            light_required=config.get("light_required", False),
+            button_text=config["button_text"],
+        )
+        for loc in dict.fromkeys(config.get("valid_locations", [])):
+            index.setdefault((loc, ctx_key), []).append(entry)
+    return {key: tuple(entries) for key, entries in index.items()}
+
+
+_CONDITIONAL_INDEX = _build_index(CONDITIONAL_CLUE_DB)
+
+
 # ==========================================
 # 🔧 核心接口函数
 # ==========================================
@@ -543,58 +698,31 @@ def get_available_conditional_clues(
     light_ok=False 表示按钮应显示但执行会得到"看不清"反馈。
     """
     collected = set(d_state.get("inventory", {}).get("clues_collected", []))
+    # 对话中只看该 NPC 的对话线索，其余场景一律按搜查处理
+    ctx_key = context if context.startswith("talk_with_npc:") else "search"
     results = []
 
-    for clue_id, config in CONDITIONAL_CLUE_DB.items():
+    for entry in _CONDITIONAL_INDEX.get((current_location, ctx_key), ()):
         # 跳过已收集的
-        if clue_id in collected:
+        if entry.clue_id in collected:
             continue
 
-        ctype = config["type"]
-
-        # trust 类型不在这里处理
-        if ctype == "trust":
-            continue
-
-        # 检查地点
-        valid_locs = config.get("valid_locations", [])
-        if current_location not in valid_locs:
-            continue
-
-        # 检查 context（对话中触发 vs 搜查触发）
-        trigger_ctx = config.get("trigger_context", "search")
-        if trigger_ctx == "talk_with_npc":
-            # 只在和指定 NPC 对话时出现
-            expected_npc = config.get("trigger_npc", "")
-            if not context.startswith("talk_with_npc:"):
-                continue
-            if context != f"talk_with_npc:{expected_npc}":
-                continue
-        else:
-            # 普通搜查，跳过对话专属
-            if context.startswith("talk_with_npc:"):
-                continue
-
         # 检查时间条件（time 类型）
-        if ctype == "time":
-            available_times = config.get("available_times", [])
-            if current_time not in available_times:
-                continue
+        if entry.available_times is not None and current_time not in entry.available_times:
+            continue
 
         # 检查线索前提
-        requires = set(config.get("requires_clues", []))
-        if not requires.issubset(collected):
+        if not entry.requires <= collected:
             continue
 
         # 检查光照需求（不阻止按钮显示，只影响执行结果）
-        light_required = config.get("light_required", False)
         light_ok = True
-        if light_required:
+        if entry.light_required:
             light_ok = is_location_lit(current_location, current_time)
 
         results.append({
-            "clue_id": clue_id,
-            "button_text": config["button_text"],
+            "clue_id": entry.clue_id,
+            "button_text": entry.button_text,
             "light_ok": light_ok,
         })
 
@@ -605,8 +733,7 @@ def try_trigger_conditional_clue(
     clue_id: str,
     d_state: Dict,
     current_location: str,
-    current_time: str,
-    objective_clues_db: Dict
+    current_time: str
 ) -> Tuple[bool, str, Optional[str]]:
     """
     尝试触发指定条件线索。
@@ -637,12 +764,7 @@ def try_trigger_conditional_clue(
             return False, config.get("unavailable_text", "现在时机不对，看不出什么。"), None
 
     # 成功：加入线索
-    clue_data = config["clue_data"]
-    clue_id_to_add = clue_data["id"]
-
-    # 同步到 objective_clues_db（运行时注册）
-    if clue_id_to_add not in objective_clues_db:
-        objective_clues_db[clue_id_to_add] = clue_data
+    clue_id_to_add = config["clue_data"]["id"]
 
     if clue_id_to_add not in d_state["inventory"]["clues_collected"]:
         d_state["inventory"]["clues_collected"].append(clue_id_to_add)
@@ -667,120 +789,21 @@ def get_trust_triggered_clues(
       "trigger_text": ... # 玩家点击后的完整对话文本
     }
     """
-    # 信任触发线索配置（独立于 CONDITIONAL_CLUE_DB，因为触发逻辑不同）
-    TRUST_CLUES = [
-        {
-            "clue_id": "clue_026",  # 顾琼家书
-            "npc_id": "npc_guqiong",
-            "trust_threshold": 70,
-            "trigger_time": ["巳时", "午时"],
-            "feed_text": "顾琼似乎想和你说些什么",
-            "trigger_text": (
-                "顾琼在走廊拦住你，四下看了看，把一封写了一半的信递过来。\n\n"
-                "「你自己看吧。」\n\n"
-                "信纸上，收信人只写了「吾儿」二字，正文写道：\n"
-                "「娘此行若不归，箱底红木匣内有你的身世文书。\n"
-                "记住，杨氏的血不是罪，是证据。等你长大，去找——」\n\n"
-                "后面被撕掉了。\n\n"
-                "顾琼重新接过信，折好收进袖中，\n"
-                "眼神里有什么东西一闪而过，随即恢复冷漠：\n"
-                "「现在你知道我为什么不能死在这里了。」"
-            ),
-            "clue_data": {
-                "id": "clue_026",
-                "name": "顾琼的家书",
-                "location": "顾琼房",
-                "description": (
-                    "顾琼写给孩子的未完成家书，提到「杨氏的血不是罪，是证据」。"
-                    "后半段被撕去。她是杨氏后人，此行背负着远不止复仇的使命。"
-                ),
-                "hidden": False,
-                "visible_condition": "trust"
-            }
-        },
-        {
-            "clue_id": "clue_037_testimony",  # 韩子敬脚步声证词
-            "npc_id": "npc_hanzijing",
-            "trust_threshold": 50,
-            "trigger_time": ["午时", "未时"],
-            "feed_text": "韩子敬在你门口徘徊了许久",
-            "trigger_text": (
-                "韩子敬鼓起勇气找到你，结结巴巴地说：\n\n"
-                "「小……小生昨夜听到了一些动静，一直不敢说。」\n\n"
-                "「大约丑时，有人从二楼走到楼梯口，脚步很重，"
-                "是男人，靴子底有铁掌声——咚咚咚的。\n"
-                "然后大概过了半炷香，同样的脚步声从楼梯上来，"
-                "但走得……很不均匀，像是有一条腿不太对劲。」\n\n"
-                "「小生不知道这有没有用……但小生说的都是真的，"
-                "求大人不要追究小生那些诗稿！」"
-            ),
-            "clue_data": {
-                "id": "clue_037_testimony",
-                "name": "韩子敬的脚步声证词",
-                "location": "韩子敬（主动提供）",
-                "description": (
-                    "韩子敬昨夜听到：丑时有人下楼，铁掌靴底，脚步沉重。"
-                    "约半炷香后，同一人上楼，步伐明显不均匀，像一条腿有伤。"
-                    "丑时正是赵虎独自守夜的时段——这条证词直指他。"
-                ),
-                "hidden": False,
-                "visible_condition": "trust"
-            }
-        },
-        {
-            "clue_id": "clue_qingxuzi_testimony",  # 清虚子：拂尘是做法时遗落的
-            "npc_id": "npc_qingxuzi",
-            "trust_threshold": 65,
-            "trigger_time": ["辰时", "巳时"],
-            "feed_text": "清虚子神色不安，像是想到了什么",
-            "trigger_text": (
-                "清虚子拉住你的袖子，压低声音：\n\n"
-                "「贫道想到了一件非常要紧的事……」\n\n"
-                "「那把拂尘，确实是贫道的。\n"
-                "你们来驿站之前，张三施主找贫道在后院佛龛前做了场法事，"
-                "说是最近心神不宁，要请神消灾。\n"
-                "贫道做完法事就回屋了，"
-                "但拂尘……贫道忘在佛龛旁边了。」\n\n"
-                "「后来贫道一直没想起来去拿。\n"
-                "直到起夜看见尸体时，才发现拂尘就在旁边——\n"
-                "所以贫道才顺手捡了起来，结果就被你们当成嫌疑人了！」\n\n"
-                "清虚子的眼神第一次真正流露出恐惧，"
-                "而不是装出来的惶恐。"
-            ),
-            "clue_data": {
-                "id": "clue_qingxuzi_testimony",
-                "name": "清虚子的证词：拂尘是做法时遗落的",
-                "location": "清虚子（主动提供）",
-                "description": (
-                    "清虚子证实：戌时前张三请他在后院佛龛做法事，"
-                    "做完后清虚子忘记带走拂尘，遗落在佛龛旁。"
-                    "拂尘出现在案发现场是巧合——"
-                    "但张三为什么偏偏选在佛龛前做法？他是否预见了什么？"
-                ),
-                "hidden": False,
-                "visible_condition": "trust"
-            }
-        },
-    ]
-
-    collected = set(d_state.get("inventory", {}).get("clues_collected", []))
-    trust = d_state.get("npc_trust", {})
-    already_triggered = set(d_state.get("trust_clues_triggered", []))
     results = []
-
-    for tc in TRUST_CLUES:
+    candidates = _TRUST_CLUES_BY_TIME.get(current_time)
+    if not candidates:
+        return results
+    # 候选只有寥寥几条，直接在列表上查找，不必先建集合
+    collected = d_state["inventory"]["clues_collected"]
+    trust = d_state["npc_trust"]
+    already_triggered = d_state["trust_clues_triggered"]
+
+    for tc in candidates:
         clue_id = tc["clue_id"]
-        npc_id = tc["npc_id"]
-
-        if clue_id in collected:
-            continue
-        if clue_id in already_triggered:
-            continue
-        if current_time not in tc["trigger_time"]:
+        if clue_id in collected or clue_id in already_triggered:
             continue
-        if trust.get(npc_id, 0) < tc["trust_threshold"]:
+        if trust.get(tc["npc_id"], 0) < tc["trust_threshold"]:
             continue
-
         results.append(tc)
 
     return results
@@ -788,26 +811,19 @@ def get_trust_triggered_clues(
 
 def register_trust_clue_triggered(d_state: Dict, clue_id: str):
     """标记信任线索已推送，避免重复触发。"""
-    triggered = d_state.setdefault("trust_clues_triggered", [])
+    triggered = d_state["trust_clues_triggered"]
     if clue_id not in triggered:
         triggered.append(clue_id)
 
 
-def collect_trust_clue(
-    clue_id: str,
-    clue_data: Dict,
-    d_state: Dict,
-    objective_clues_db: Dict
-):
-    """玩家接受信任线索后，正式加入收集列表。"""
-    if clue_id not in objective_clues_db:
-        objective_clues_db[clue_id] = clue_data
+def collect_trust_clue(clue_id: str, d_state: Dict):
+    """玩家接受信任线索后，正式加入收集列表（线索数据见 clue_catalog）。"""
     if clue_id not in d_state["inventory"]["clues_collected"]:
         d_state["inventory"]["clues_collected"].append(clue_id)
     register_trust_clue_triggered(d_state, clue_id)
 
 
-def get_clue_summary_for_prompt(d_state: Dict, objective_clues_db: Dict) -> str:
+def get_clue_summary_for_prompt(d_state: Dict, clue_catalog: Dict) -> str:
     """
     为 NPC prompt 生成线索摘要，包含条件线索。
     直接替换 npc_prompt_builder 中的 build_player_clue_summary。
@@ -818,18 +834,9 @@ def get_clue_summary_for_prompt(d_state: Dict, objective_clues_db: Dict) -> str:
 
     lines = []
     for cid in collected:
-        clue = objective_clues_db.get(cid)
+        clue = clue_catalog.get(cid)
         if clue:
             loc = clue.get("location", "")
             name = clue.get("name", cid)
             lines.append(f"- {name}（{loc}）" if loc else f"- {name}")
-        else:
-            # 可能是运行时注册的条件线索，从 CONDITIONAL_CLUE_DB 里找
-            for cfg in CONDITIONAL_CLUE_DB.values():
-                if cfg["clue_data"]["id"] == cid:
-                    cd = cfg["clue_data"]
-                    loc = cd.get("location", "")
-                    name = cd.get("name", cid)
-                    lines.append(f"- {name}（{loc}）" if loc else f"- {name}")
-                    break
     return "\n".join(lines)
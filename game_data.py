@@ -0,0 +1,625 @@
+"""
+game_data.py
+静态游戏数据：时辰、地点、谜底、客观线索、房间、NPC 名单
+
+只有数据和由数据直接构建的只读目录，不依赖 FastAPI / LLM / 数据库。
+main.py 从这里导入；state_codec.py 更新注册表时也只 import 本模块，不加载游戏服务。
+
+对外接口：
+  TIME_CYCLES / MAX_AP_PER_CYCLE / ALL_LOCATIONS / SOLUTION
+  objective_clues_db / ROOM_DB / NPC_LIST / NPC_IDS
+  clue_catalog                → 客观 + 条件 + 信任线索的只读目录（clue_catalog.ClueCatalog）
+  state_registry_ids()        → 需要登记进存档注册表（state_registry.json）的全部 ID
+"""
+
+from typing import Dict, List
+
+from clue_catalog import ClueCatalog
+from conditional_clues import CONDITIONAL_CLUE_DB, TRUST_CLUE_DB
+from inference_engine import INFERENCE_DB
+
+# ==========================================
+# ⏳ 时间与地点配置
+# ==========================================
+TIME_CYCLES = ["子时", "丑时", "寅时", "卯时", "辰时", "巳时", "午时", "未时", "申时", "酉时", "戌时", "亥时"]
+MAX_AP_PER_CYCLE = 4  
+ALL_LOCATIONS = ["大堂", "后院", "灶房", "二楼走廊", "李德福房间", "赵虎房间", "顾琼房间", "韩子敬房间", "清虚子房间", "大堂侧屋"]
+
+# ==========================================
+# ⚖️ 核心谜底配置（GAME_TRUTH 已移除，真相由NPC JSON各自管理）
+# ==========================================
+SOLUTION = {
+    "killer_id": "npc_zhaohu",
+    "weapon_id": "clue_012",
+    "mastermind_id": "npc_lidefu"
+}
+
+# ==========================================
+# 🔍 核心线索库
+# ==========================================
+objective_clues_db = {
+ 
+    # ── 后院·尸体 ─────────────────────────────────────────────
+    "clue_001": {
+        "id": "clue_001", "name": "死者尸体", "location": "后院",
+        "search_difficulty": 1,
+        "description": (
+            "张三死在后院废弃的【佛龛】前。颈部有极细的勒痕，深入皮肉。"
+            "死者双目圆睁，面容惊恐，双手呈'鹰爪'状僵硬，"
+            "似乎临死前曾猛力抓向某处。他的膝盖沾满新鲜泥土，"
+            "生前似乎正在跪拜礼佛。"
+        ),
+        "visible_condition": "none", "hidden": False
+    },
+    "clue_002": {
+        "id": "clue_002", "name": "颈部的勒痕", "location": "后院 (尸体)",
+        "search_difficulty": 1,
+        "description": (
+            "死者脖颈处有两道清晰的紫黑色勒痕，在咽喉处呈【X】形交叉，"
+            "深陷皮肉，力道极大。这种交叉手法能同时压迫颈动脉与喉骨，"
+            "死亡极为迅速。凶器极细，却韧性惊人。"
+        ),
+        "visible_condition": "inspect_corpse"
+    },
+    "clue_003": {
+        "id": "clue_003", "name": "死者手部", "location": "后院 (尸体)",
+        "search_difficulty": 1,
+        "description": (
+            "死者右手指甲缝有暗红血痕——他死前抓伤过凶手。"
+            "左手紧握成死拳，指骨处乌青淤紫，似乎死死攥着什么东西。"
+            "那只拳头……能掰开吗？"
+        ),
+        "visible_condition": "inspect_corpse"
+    },
+    "clue_003_new": {
+        "id": "clue_003_new", "name": "掌心压痕", "location": "后院 (尸体)",
+        "search_difficulty": 1,
+        "description": (
+            "【条件线索】费力掰开死者左拳后， 手掌中央有一个做工精美的鎏金指套，内侧刻着一个运字。似乎在什么地方看到过相似的东西？"
+            
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_004": {
+        "id": "clue_004", "name": "佛龛刮痕", "location": "后院",
+        "search_difficulty": 1,
+        "description": (
+            "木制佛龛底座边缘有数道新鲜刮痕，漆面剥落，木茬雪白。"
+            "像是被金属器物反复撬动过。佛龛底座与地面之间，"
+            "有一条隐约的缝隙……"
+        ),
+        "visible_condition": "inspect_shrine"
+    },
+    "clue_005": {
+        "id": "clue_005", "name": "混乱的足迹", "location": "后院",
+        "search_difficulty": 1,
+        "description": (
+            "湿软泥地上有三串足迹。\n"
+            "第一串：宽大深重，花纹粗糙，从后门直通佛龛。\n"
+            "第二串：细窄男靴，前深后浅、步幅小，在尸体旁短暂停留后慌乱折返大堂。\n"
+            "第三串：宽大深重，花纹粗糙，从佛龛处延伸后院中央，随后消失——"
+            "像是有人从墙上攀爬离开。"
+        ),
+        "visible_condition": "inspect_ground"
+    },
+ 
+    # ── 各房间 ────────────────────────────────────────────────
+    "clue_006": {
+        "id": "clue_006", "name": "金疮药味", "location": "赵虎房",
+        "search_difficulty": 2,
+        "description": (
+            "房间里若有若无地飘着一股金创药的气味。"
+            "赵虎……近期受了伤？伤在哪里？"
+        ),
+        "visible_condition": "search_room"
+    },
+    "clue_007": {
+        "id": "clue_007", "name": "加密的绢帛底稿", "location": "李德福房",
+        "search_difficulty": 2,
+        "description": (
+            "藏在行李最深处的一卷绢帛，写满难以辨认的加密字符，"
+            "落款处有模糊的官方印鉴。旁边以蝇头小楷批注着几个字："
+            "【旧内侍】【查清】【清除】。"
+            "这是一道密旨——有人要杀人灭口。"
+        ),
+        "visible_condition": "search_room_hard"
+    },
+    "clue_008": {
+        "id": "clue_008", "name": "烧焦的手札残页", "location": "顾琼房",
+        "search_difficulty": 1,
+        "description": (
+            "火炉冷灰中有一片未烧尽的纸角，秀丽字迹，"
+            "隐约可见「复仇」二字，以及半个残缺的人名。"
+            "顾琼在此之前，经历过什么？"
+        ),
+        "visible_condition": "search_fireplace"
+    },
+    "clue_009": {
+        "id": "clue_009", "name": "被修改的星盘图", "location": "清虚子房",
+        "search_difficulty": 1,
+        "description": (
+            "桌上铺着一张复杂的星盘图，某些星位被浓墨重重涂改，墨迹尚新。"
+            "涂改的位置……对应的是今夜的天象。"
+            "清虚子在掩盖什么预言？"
+        ),
+        "visible_condition": "search_table"
+    },
+    "clue_010": {
+        "id": "clue_010", "name": "大堂桌椅", "location": "大堂",
+        "search_difficulty": 1,
+        "description": (
+            "几张桌子散乱摆放。靠窗那张是顾琼坐过的，桌上有一只茶盏。"
+            "柜台后方有一个上锁的小木柜，锁头看起来很新。"
+        ),
+        "visible_condition": "search_lobby"
+    },
+    "clue_010_new": {
+        "id": "clue_010_new", "name": "柜台锦袋", "location": "大堂",
+        "search_difficulty": 2,
+        "description": (
+            "柜台后方的小木柜里，压着一只空的【锦袋】。"
+            "袋口的流苏是宫廷样式，袋身绣着云纹，内里还残留着淡淡的龙涎香气。"
+            "这种香料只有内廷才用得起。"
+            "锦袋是空的——原本装着的东西已经不见了。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_011": {
+        "id": "clue_011", "name": "大堂茶盏", "location": "大堂",
+        "search_difficulty": 1,
+        "description": (
+            "顾琼桌上的茶碗稳稳立在正放的茶托上，看起来并无异样。"
+            "茶水已凉，碗沿有浅浅的口脂印记。"
+        ),
+        "visible_condition": "search_lobby_teacup"
+    },
+    "clue_012": {
+        "id": "clue_012", "name": "锦套内的乌金丝拂尘", "location": "李德福房",
+        "search_difficulty": 2,
+        "description": (
+            "【关键证物】枕头里藏着的锦套内，是一柄【金镶玉柄拂尘】。"
+            "拂尘比寻常的沉重许多——尘尾中藏着一根极细且坚硬，泛着金属光泽的丝线！"
+            "柄上的收线机关已经损坏，金属丝线无法缩回，微微外露。"
+            "柄身有裂纹，系被人大力使用后损坏。"
+            "柄底刻着小篆「运」字。这不是装饰品，是一件杀人的兵器。"
+        ),
+        "visible_condition": "search_room_hard"
+    },
+    "clue_013": {
+        "id": "clue_013", "name": "小二通铺", "location": "大堂侧屋",
+        "search_difficulty": 1,
+        "description": (
+            "张三的床铺凌乱，东西散落一地，明显被人翻找过。"
+            "床底灰尘中有一处长条形空白痕迹，长约三尺——"
+            "像是原本藏着什么细长的东西"
+        ),
+        "visible_condition": "search_room_zhang"
+    },
+    "clue_014": {
+        "id": "clue_014", "name": "未完全烧毁的男靴", "location": "灶房",
+        "search_difficulty": 1,
+        "description": (
+            "灶房炉膛里有东西没烧尽，还在冒黑烟。"
+            "掏出来是一双鞋型细长的靴子，靴底花纹是男式，"
+            "但内里竟是绸缎衬里，尺码偏小——穿这双靴子的人，"
+            "是个习惯乔装的女人。"
+        ),
+        "visible_condition": "search_room_kitchen"
+    },
+    "clue_015": {
+        "id": "clue_015", "name": "李德福房的覆托立盏", "location": "李德福房",
+        "search_difficulty": 1,
+        "description": (
+            "李德福自带的茶碗，底下的漆器茶托被底朝天扣在桌面上，"
+            "茶碗却四平八稳立在翻转的茶托底面上。"
+        ),
+        "visible_condition": "search_room_hard"
+    },
+    "clue_016": {
+        "id": "clue_016", "name": "顾琼衣柜", "location": "顾琼房",
+        "search_difficulty": 1,
+        "description": (
+            "衣柜里挂着几件便于行动的男式长衫，显然她路上惯于乔装。"
+            "奇怪的是，其中一套明显缺了配套的靴子——"
+            "那双靴子去哪了？"
+        ),
+        "visible_condition": "search_room_gu"
+    },
+    "clue_017": {
+        "id": "clue_017", "name": "泥泞的折扇", "location": "后院",
+        "search_difficulty": 1,
+        "description": (
+            "后门草丛里有一把折扇，扇面湿透沾满泥，"
+            "但扇骨是湘妃竹，颇为雅致。"
+            "扇面上题着半首诗：「朱门酒肉臭，路有……」"
+            "笔迹清秀，墨色被雨水晕开。这是谁的？"
+        ),
+        "visible_condition": "inspect_ground"
+    },
+    "clue_018": {
+        "id": "clue_018", "name": "烧残的诗稿", "location": "韩子敬房",
+        "search_difficulty": 1,
+        "description": (
+            "韩子敬房间的炭盆里，有一本没烧完的诗稿。"
+            "字里行间写满对圣人、对朝廷的愤懑不满——"
+            "这是要杀头的【反诗】。"
+            "难怪他见到李德福（宫里人）吓得脸色惨白。"
+        ),
+        "visible_condition": "search_room_han"
+    },
+    "clue_019": {
+        "id": "clue_019", "name": "木柄拂尘", "location": "后院",
+        "search_difficulty": 1,
+        "description": (
+            "尸体旁泥泞中掉落着一把【桃木柄拂尘】，沾满泥水。"
+            "这是道士清虚子的随身之物。"
+            "拂尘的马尾毛凌乱毛糙，似被人紧紧攥握过。"
+            "你扯了扯尘毛，几根轻飘飘地脱落——毛根处有些异常。"
+        ),
+        "visible_condition": "inspect_ground"
+    },
+    "clue_020": {
+        "id": "clue_020", "name": "老旧精美的荷包", "location": "清虚子房",
+        "search_difficulty": 2,
+        "description": (
+            "清虚子布袋里搜出一个刺绣荷包，款式极老，针法出自宫中，"
+            "绝非寻常道士所能拥有。"
+            "荷包内里绣着「运」字，里面只有几枚铜板和碎银。"
+            "这是谁的钱袋？「运」字……在哪里还见过？"
+        ),
+        "visible_condition": "search_room_qing"
+    },
+ 
+    # ── 新增线索 ──────────────────────────────────────────────
+    "clue_021": {
+        "id": "clue_021", "name": "拂尘柄内的乌金丝残段", "location": "后院",
+        "search_difficulty": 2,
+        "description": (
+            "【条件线索·需光亮】借助充足的光线，仔细检查桃木拂尘的柄部——"
+            "木柄根部的马尾毛束中，混入了一根极细的金属丝，"
+            "泛着幽幽的乌光。这不是马毛。"
+            "它从哪里断下来的？"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_022": {
+        "id": "clue_022", "name": "佛龛底座暗槽", "location": "后院",
+        "search_difficulty": 2,
+        "description": (
+            "循着尸体的鎏金指套线索返回检查佛龛——"
+            "底座侧面有一道极细的缝隙，用力按压后弹开，"
+            "露出一个浅浅的暗槽。槽内壁有一处凹陷，很小，像是能放下什么首饰"
+            "像是环形物品收纳于此。"
+            "张三把什么藏在这里？"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_023": {
+        "id": "clue_023", "name": "尸体的体温", "location": "后院 (尸体)",
+        "search_difficulty": 1,
+        "description": (
+            "你将手覆上死者胸口——"
+            "尸身尚有残温，远未到完全僵硬的程度。"
+            "死亡时间约两个时辰前。"
+            "这说明：凶手就在驿站之中，现在还没走。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_024": {
+        "id": "clue_024", "name": "断裂的绑带", "location": "赵虎房",
+        "search_difficulty": 2,
+        "description": (
+            "【条件线索】搜查赵虎床铺底板缝隙，发现一截被撕断的布绑带，"
+            "布面有陈旧血迹，已经干透变黑。"
+            "这是包扎伤口用的——伤在什么部位，需要藏得这么深？"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_025": {
+        "id": "clue_025", "name": "「李福运」字条", "location": "大堂侧屋",
+        "search_difficulty": 2,
+        "description": (
+            "张三床铺木板夹缝中藏着一张折叠字条，"
+            "纸张已经被揉皱再展开过无数次。"
+            "字条上只有三个字：【李福运】。"
+            "下方有一行更小的字，几乎难以辨认：「若我死，此名可保命。」"
+            "张三……知道自己有危险。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_new_wall": {
+        "id": "clue_new_wall", "name": "二楼外墙划痕", "location": "二楼走廊",
+        "search_difficulty": 2,
+        "description": (
+            "检查二楼走廊外侧窗台——"
+            "窗框下沿和外墙砖面有数道新鲜划痕，还粘着泥土和细碎的青苔。"
+            "有人从这里翻出去，或者攀爬上来。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_li_finger": {
+        "id": "clue_li_finger", "name": "錾花金指套", "location": "大堂",
+        "search_difficulty": 2,
+        "description": (
+            "与李德福交谈时注意他的右手——"
+            "他惯于把玩一枚【錾花金指套】，套在拇指上。这枚指套似曾相识？"
+        ),
+        "visible_condition": "conditional"
+    },
+ 
+    # ── 信任/高难度线索 ───────────────────────────────────────
+    "clue_026": {
+        "id": "clue_026", "name": "顾琼的家书", "location": "顾琼房",
+        "search_difficulty": 1,
+        "description": (
+            "顾琼主动递给你一封家书。"
+            "信中提及她的家族三年前死于一桩冤案，"
+            "主谋正是当时的掌印太监。"
+            "「我此行不是探亲，」她的字迹颤抖，「我要亲眼看着他死。」"
+        ),
+        "visible_condition": "trust_triggered"
+    },
+    "clue_027": {
+        "id": "clue_027", "name": "韩子敬的落榜文书", "location": "韩子敬房",
+        "search_difficulty": 2,
+        "description": (
+            "书页夹层中发现一张官府文书——"
+            "韩子敬此前已参加过两届春闱，皆以「文风不正」为由落榜。"
+            "主考官的批语：「狂悖之词，不堪大用。」"
+            "他的诗稿是反诗，也是他对整个科举制度的绝望控诉。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_028": {
+        "id": "clue_028", "name": "清虚子的度牒", "location": "清虚子房",
+        "search_difficulty": 2,
+        "description": (
+            "床铺底下压着一份道士度牒，"
+            "官方印鉴是真的，但姓名栏被人工涂改过。"
+            "他的真实身份不是道士——或者说，他不一直是道士。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_029": {
+        "id": "clue_029", "name": "清虚子的证词：拂尘是做法时遗落的", "location": "后院",
+        "search_difficulty": 1,
+        "description": (
+            "清虚子压低声音告诉你——"
+            "戌时前，张三请他在后院佛龛前做法消灾。"
+            "做完法事后清虚子回屋，忘记带走拂尘，遗落在佛龛旁。"
+            "「贫道的拂尘……是自己忘拿的，不是故意放在那里的！」"
+        ),
+        "visible_condition": "trust_triggered"
+    },
+    "clue_030": {
+        "id": "clue_030", "name": "李德福行李中的画像", "location": "李德福房",
+        "search_difficulty": 3,
+        "description": (
+            "行李夹层最深处藏着一张折叠画像——"
+            "画中人身着内侍官服，面容与张三有五分相似，"
+            "但眼神截然不同：画中人目光锐利，气度威严。"
+            "画像背面写着：「掌印太监李福运，先帝十二年。」"
+            "死者……是他。"
+        ),
+        "visible_condition": "conditional"
+    },
+    "clue_037_testimony": {
+        "id": "clue_037_testimony", "name": "韩子敬的脚步声证词", "location": "韩子敬房",
+        "search_difficulty": 1,
+        "description": (
+            "韩子敬颤抖着开口——"
+            "寅时前他出门去后院埋诗稿时，看到了尸体，"
+            "吓得拔腿就跑，折扇掉落都顾不上捡。"
+            "但他发誓，他出门之前（大约丑时），就已经听到过一阵沉重的脚步声"
+            "从走廊经过——那脚步声，不像是去如厕，更像是有目的地行动。"
+        ),
+        "visible_condition": "trust_triggered"
+    },
+}
+
+
+# ==========================================
+# 🏠 场景配置
+# ==========================================
+ROOM_DB = {
+    "后院": {
+        "name": "后院",
+        "atmosphere": "破败的佛龛，泥泞的地面，暴雨声盖过了一切。",
+        "furniture_list": [
+            "死者全身", "死者颈部", "死者手部", "死者左拳",
+            "佛龛", "佛龛底部", "泥地", "草丛", "尸体旁的泥泞"
+        ],
+        "furniture_map": {
+            "死者全身":     "clue_001",
+            "死者颈部":     "clue_002",
+            "死者手部":     "clue_003",
+            "死者左拳":     "clue_003_new",   # 条件：持有clue_003
+            "佛龛":         "clue_004",
+            "佛龛底部":     "clue_022",        # 条件：持有clue_021
+            "泥地":         "clue_005",
+            "草丛":         "clue_017",
+            "尸体旁的泥泞": "clue_019",
+        },
+        "conditional_furniture": {"死者左拳", "佛龛底部"},  # 前端渲染为◈按钮
+        "owner": None
+    },
+ 
+    "灶房": {
+        "name": "灶房",
+        "atmosphere": "灰烬的焦味，柴火堆潮湿，有什么东西没烧干净。",
+        "furniture_list": ["炉膛", "水缸", "柴火堆"],
+        "furniture_map": {
+            "炉膛":   "clue_014",
+            "水缸":   None,
+            "柴火堆": None,
+        },
+        "owner": None
+    },
+ 
+    "大堂": {
+        "name": "大堂",
+        "atmosphere": "油灯昏黄，雨水从破窗缝渗入，空气潮腻。",
+        "furniture_list": ["大堂桌椅", "顾琼的桌子", "柜台", "柜台后木柜", "角落"],
+        "furniture_map": {
+            "大堂桌椅":   "clue_010",
+            "顾琼的桌子": "clue_011",
+            "柜台":       None,
+            "柜台后木柜": "clue_010_new",   # 条件：持有clue_010
+            "角落":       None,
+        },
+        "conditional_furniture": {"柜台后木柜"},
+        "inspect_texts": {
+            "柜台": "柜台后方有一个上锁的小木柜，锁头看起来很新。也许值得仔细搜一搜。"
+        },
+        "owner": None
+    },
+ 
+    "大堂侧屋": {
+        "name": "小二通铺",
+        "atmosphere": "杂乱的铺盖，东西散落一地，有人翻找过。",
+        "furniture_list": ["床铺", "床底", "枕头", "破衣柜", "床板夹缝"],
+        "furniture_map": {
+            "床铺":     None,
+            "床底":     "clue_013",
+            "枕头":     None,
+            "破衣柜":   None,
+            "床板夹缝": "clue_025",   # 条件：持有clue_007+020
+        },
+        "conditional_furniture": {"床板夹缝"},
+        "inspect_texts": {
+            "床铺":   "乱作一团，似乎被人翻过。",
+            "枕头":   "掉在地上，芯子被翻了出来。",
+            "破衣柜": "衣柜门敞开，里面乱七八糟，几件衣服掉在地上。",
+            "床底":   "床底积满灰尘，但有一处长条形空白——像是藏过什么细长的东西。",
+        },
+        "owner": None
+    },
+ 
+    "李德福房间": {
+        "name": "李德福房间",
+        "atmosphere": "龙涎香气残存，被褥质地极好，处处透着宫廷习气。",
+        "furniture_list": ["行李", "行李夹层", "桌子", "床铺", "枕头"],
+        "furniture_map": {
+            "行李":     "clue_007",
+            "行李夹层": "clue_030",   # 条件：持有clue_007+025，难度5
+            "桌子":     "clue_015",
+            "床铺":     None,
+            "枕头":     "clue_012",
+        },
+        "conditional_furniture": {"行李夹层"},
+        "hidden_until": {"枕头": "床铺"},  # 枕头在检查床铺后才出现
+        "inspect_texts": {
+            "床铺": (
+                "被褥虽乱，但质地极好。你在被褥间摸索了一番，"
+                "除了残温外一无所获。不过这【枕头】看起来过于鼓囊，"
+                "里面像是塞了什么硬物。"
+            ),
+            "行李": "沉甸甸的行李，最外层是些寻常衣物。夹层深处似乎还有东西……",
+        },
+        "owner": "npc_lidefu"
+    },
+ 
+    "赵虎房间": {
+        "name": "赵虎房间",
+        "atmosphere": "床铺硬实，药味若有若无，窗户关得严实。",
+        "furniture_list": ["桌上", "床边", "床底", "床板底缝"],
+        "furniture_map": {
+            "桌上":    "clue_006",
+            "床边":    None,
+            "床底":    None,
+            "床板底缝": "clue_024",   # 条件：持有clue_006，难度3
+        },
+        "conditional_furniture": {"床板底缝"},
+        "inspect_texts": {
+            "床底":    "床底积满灰尘，没有明显异物。但床板和地面之间……有条缝。",
+            "床边":    "床边放着一双靴子，靴底有新鲜的泥点。",
+        },
+        "owner": "npc_zhaohu"
+    },
+ 
+    "顾琼房间": {
+        "name": "顾琼房间",
+        "atmosphere": "梳妆台上有佛珠，衣柜微开，淡淡的女子脂粉香。",
+        "furniture_list": ["衣柜", "火炉", "梳妆台"],
+        "furniture_map": {
+            "衣柜":   "clue_016",
+            "火炉":   "clue_008",
+            "梳妆台": None,
+        },
+        "inspect_texts": {
+            "梳妆台": "梳妆台上摆着一串佛珠和一面铜镜，没有其他异常。",
+        },
+        "owner": "npc_guqiong"
+    },
+ 
+    "韩子敬房间": {
+        "name": "韩子敬房间",
+        "atmosphere": "墨香混着炭灰味，书卷叠了半桌，炭盆还有余温。",
+        "furniture_list": ["书桌", "炭盆", "书页夹层"],
+        "furniture_map": {
+            "炭盆":     "clue_018",
+            "书桌":     None,
+            "书页夹层": "clue_027",   # 条件：持有clue_018，难度2
+        },
+        "conditional_furniture": {"书页夹层"},
+        "inspect_texts": {
+            "书桌": "桌上摆着几本经义，翻开的那页用手指抠出了折痕。有一本书页间似乎夹着什么。",
+        },
+        "owner": "npc_hanzijing"
+    },
+ 
+    "清虚子房间": {
+        "name": "清虚子房间",
+        "atmosphere": "符纸贴了满壁，药草香混着尘土，透着几分江湖气。",
+        "furniture_list": ["桌子", "布袋", "床铺", "床底"],
+        "furniture_map": {
+            "桌子": "clue_009",
+            "布袋": "clue_020",
+            "床铺": None,
+            "床底": "clue_028",   # 条件：持有clue_009，难度2
+        },
+        "conditional_furniture": {"床底"},
+        "inspect_texts": {
+            "床铺": "铺着旧棉被，有些潮。床底压着什么东西——边角露出一点。",
+        },
+        "owner": "npc_qingxuzi"
+    },
+ 
+    "二楼走廊": {
+        "name": "二楼走廊",
+        "atmosphere": "走廊昏暗，窗外雨声如注，脚步声在此处格外清晰。",
+        "furniture_list": ["走廊窗台", "地面"],
+        "furniture_map": {
+            "走廊窗台": "clue_new_wall",   # 条件：持有clue_005+006
+            "地面":     None,
+        },
+        "conditional_furniture": {"走廊窗台"},
+        "inspect_texts": {
+            "地面":     "走廊地板有几处新鲜的泥脚印，来自楼下。",
+            "走廊窗台": "窗框紧闭，但窗台下沿……似乎有划痕。",
+        },
+        "owner": None
+    },
+}
+
+NPC_LIST = [
+    {"id": "npc_lidefu", "name": "李德福"},
+    {"id": "npc_zhaohu", "name": "赵虎"},
+    {"id": "npc_guqiong", "name": "顾琼"},
+    {"id": "npc_hanzijing", "name": "韩子敬"},
+    {"id": "npc_qingxuzi", "name": "清虚子"}
+]
+NPC_IDS = [npc["id"] for npc in NPC_LIST]
+
+# 客观 + 条件 + 信任线索的只读目录；handler / prompt / 回想都从这里按 ID 取线索
+clue_catalog = ClueCatalog(objective_clues_db, CONDITIONAL_CLUE_DB, TRUST_CLUE_DB)
+
+
+def state_registry_ids() -> Dict[str, List[str]]:
+    """当前游戏数据里需要登记进存档注册表的全部 ID（线索取自统一目录，含信任线索）。"""
+    return {
+        "clues": list(clue_catalog),
+        "npcs": NPC_IDS,
+        "locations": ALL_LOCATIONS,
+        "inferences": list(INFERENCE_DB),
+    }
@@ -23,11 +23,62 @@ def init(context: dict):
 def _get(key):
     return _ctx[key]
 
+
+# ------------------------------------------
+# 静态菜单：只依赖 NPC_LIST / ROOM_DB，与存档无关
+# handler 与 /api/manifest 共用，前端可据 manifest 在本地渲染
+# ------------------------------------------
+def _talk_menu():
+    UIAction = _get("UIAction")
+    return {
+        "reply": "请选择你要问话的对象：", "sender": "系统", "ui_type": "select_npc",
+        "ui_options": [UIAction(label=npc["name"], action_type="TALK", payload=npc["id"])
+                       for npc in _get("NPC_LIST")],
+    }
+
+def _confront_menu():
+    UIAction = _get("UIAction")
+    options = [UIAction(label=f"» 对质 {npc['name']}", action_type="CONFRONT_SELECT_NPC", payload=npc["id"])
+               for npc in _get("NPC_LIST")]
+    options.append(UIAction(label="‹ 取消", action_type="CANCEL", payload="MAIN"))
+    return {
+        "reply": "你决定亮出证据，逼问嫌疑人。请选择对质对象：", "sender": "系统", "ui_type": "select_npc",
+        "ui_options": options,
+    }
+
+def _search_menu():
+    UIAction = _get("UIAction")
+    return {
+        "reply": "请选择你要搜查的区域：", "sender": "系统", "ui_type": "select_room",
+        "ui_options": [UIAction(label=room_data["name"], action_type="SEARCH_ENTER", payload=room_key)
+                       for room_key, room_data in _get("ROOM_DB").items()],
+    }
+
+def _accuse_menu():
+    UIAction = _get("UIAction")
+    return {
+        "reply": '你决定结束调查，向李德福指认凶手。\n\n李德福坐在太师椅上，冷冷地看着你："说吧，是谁杀了张三？"',
+        "sender": "李德福", "ui_type": "select_npc",
+        "ui_options": [UIAction(label=f"» 指认 {npc['name']}", action_type="ACCUSE_TARGET", payload=npc["id"])
+                       for npc in _get("NPC_LIST") if npc["id"] != "npc_lidefu"],
+    }
+
+STATIC_MENUS = {
+    "CMD_SHOW_TALK_MENU": _talk_menu,
+    "CMD_SHOW_CONFRONT_MENU": _confront_menu,
+    "CMD_SHOW_SEARCH_MENU": _search_menu,
+    "CMD_SHOW_ACCUSE_MENU": _accuse_menu,
+}
+
+def build_static_menu(verb: str) -> Dict:
+    """返回 {"reply", "sender", "ui_type", "ui_options"}；verb 须在 STATIC_MENUS 中。"""
+    return STATIC_MENUS[verb]()
+
 def _visible_furniture(room_data, d_state, room_name):
     """返回当前应显示的普通家具列表（排除 conditional_furniture 和未解锁的 hidden_until）"""
     cond_set = room_data.get("conditional_furniture", set())
     hidden_until = room_data.get("hidden_until", {})
-    search_counts = d_state.get("search_counts", {})
+    search_counts = d_state["search_counts"]
     result = []
     for f in room_data["furniture_list"]:
         if f in cond_set:
@@ -76,7 +127,7 @@ OWNER_BLOCK_LINES = {
 def adjust_trust(d_state, npc_id, rule_key):
     """根据规则调整信任度，限制在 0-100"""
     delta = TRUST_RULES.get(rule_key, 0)
-    trust = d_state.setdefault("npc_trust", {})
+    trust = d_state["npc_trust"]
     current = trust.get(npc_id, 50)
     trust[npc_id] = max(0, min(100, current + delta))
 
@@ -88,11 +139,11 @@ def adjust_trust(d_state, npc_id, rule_key):
 def _compute_game_stats(current_state):
     """从 dynamic_state 中提取各种统计数据，供结局和报告使用"""
     d = current_state["dynamic_state"]
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
     NPC_LIST = _get("NPC_LIST")
 
     collected = d["inventory"]["clues_collected"]
-    total_clues = len(objective_clues_db)
+    total_clues = len(clue_catalog)
     found_clues = len(collected)
 
     # 关键线索检测
@@ -100,14 +151,14 @@ def _compute_game_stats(current_state):
     found_key = key_clues & set(collected)
 
     # 信任度
-    trust = d.get("npc_trust", {})
+    trust = d["npc_trust"]
     ally_npc = max(trust, key=trust.get, default=None)  # 最信任的NPC
     enemy_npc = min(trust, key=trust.get, default=None)  # 最敌对的NPC
     ally_name = next((n["name"] for n in NPC_LIST if n["id"] == ally_npc), "无") if ally_npc else "无"
     enemy_name = next((n["name"] for n in NPC_LIST if n["id"] == enemy_npc), "无") if enemy_npc else "无"
 
     # 对质历史
-    confrontations = d.get("confrontation_used", {})
+    confrontations = d["confrontation_used"]
     total_confrontations = sum(len(v) for v in confrontations.values())
 
     # 公堂次数
@@ -230,11 +281,11 @@ async def _generate_ending_narration(ending_type: str, current_state: dict, mode
     confrontation_summary = ""
     confrontations = stats["confrontations"]
     if confrontations:
-        objective_clues_db = _get("objective_clues_db")
+        clue_catalog = _get("clue_catalog")
         parts = []
         for npc_id, clue_ids in confrontations.items():
             npc_name = next((n["name"] for n in NPC_LIST if n["id"] == npc_id), npc_id)
-            clue_names = [objective_clues_db.get(c, {}).get("name", c) for c in clue_ids]
+            clue_names = [clue_catalog.get(c, {}).get("name", c) for c in clue_ids]
             parts.append(f"  对{npc_name}出示了：{', '.join(clue_names)}")
         confrontation_summary = "\n".join(parts)
 
@@ -299,37 +350,32 @@ async def _generate_ending_narration(ending_type: str, current_state: dict, mode
         {"role": "user", "content": f"请为 {ending_type} 结局生成叙事。"}
     ]
 
-    narration = await call_llm(ending_prompt, messages, model_id)
+    narration = await call_llm(ending_prompt, messages, model_id, purpose="ending")
     return template["base_narration"] + narration
 
 
 # ------------------------------------------
 # 指认系统 (accuse + endings)
 # ------------------------------------------
-async def handle_accuse(user_input, request, current_state, model_id):
+async def handle_accuse(command, request, current_state, model_id):
     """处理: CMD_SHOW_ACCUSE_MENU, CMD_ACCUSE_TARGET, CMD_ACCUSE_EVIDENCE, CMD_ENDING_*, CMD_SHOW_REPORT"""
 
     UIAction = _get("UIAction")
     NPC_LIST = _get("NPC_LIST")
     SOLUTION = _get("SOLUTION")
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
     encrypt_state = _get("encrypt_state")
 
     result = {"reply": "", "sender": "系统", "ui_type": "text", "ui_options": [], "bg_img": None, "done": False}
 
     # --- 指认菜单 ---
-    if user_input == "CMD_SHOW_ACCUSE_MENU":
-        result["reply"] = '你决定结束调查，向李德福指认凶手。\n\n李德福坐在太师椅上，冷冷地看着你："说吧，是谁杀了张三？"'
-        result["sender"] = "李德福"
-        result["ui_type"] = "select_npc"
-        for npc in NPC_LIST:
-            if npc["id"] != "npc_lidefu":
-                result["ui_options"].append(UIAction(label=f"» 指认 {npc['name']}", action_type="ACCUSE_TARGET", payload=npc["id"]))
+    if command.verb == "CMD_SHOW_ACCUSE_MENU":
+        result.update(build_static_menu(command.verb))
         result["done"] = True
 
     # --- 选凶手 → 选凶器 ---
-    elif user_input.startswith("CMD_ACCUSE_TARGET"):
-        target_id = user_input.split(":", 1)[1]
+    elif command.verb == "CMD_ACCUSE_TARGET":
+        target_id = command.payload
         current_state["dynamic_state"]["temp_accuse_target"] = target_id
         target_name = next((n["name"] for n in NPC_LIST if n["id"] == target_id), "未知")
         result["sender"] = "李德福"
@@ -341,14 +387,14 @@ async def handle_accuse(user_input, request, current_state, model_id):
             result["ui_options"].append(UIAction(label="… 哑口无言", action_type="ACCUSE_EVIDENCE", payload="none"))
         else:
             for cid in collected_ids:
-                clue = objective_clues_db.get(cid)
+                clue = clue_catalog.get(cid)
                 if clue:
                     result["ui_options"].append(UIAction(label=f"▪ {clue['name']}", action_type="ACCUSE_EVIDENCE", payload=cid))
         result["done"] = True
 
     # --- 判定结局（转场） ---
-    elif user_input.startswith("CMD_ACCUSE_EVIDENCE"):
-        evidence_id = user_input.split(":", 1)[1]
+    elif command.verb == "CMD_ACCUSE_EVIDENCE":
+        evidence_id = command.payload
         target_id = current_state["dynamic_state"].get("temp_accuse_target")
         is_killer_correct = (target_id == SOLUTION["killer_id"])
         is_weapon_correct = (evidence_id == SOLUTION["weapon_id"])
@@ -387,7 +433,7 @@ async def handle_accuse(user_input, request, current_state, model_id):
         result["done"] = True
 
     # --- 结局分支：公布真相 ---
-    elif user_input == "CMD_ENDING_REVEAL":
+    elif command.verb == "CMD_ENDING_REVEAL":
         current_state["dynamic_state"]["ending_type"] = "TRUE_END"
         narration = await _generate_ending_narration("TRUE_END", current_state, model_id)
         current_state["dynamic_state"]["game_over"] = True
@@ -398,7 +444,7 @@ async def handle_accuse(user_input, request, current_state, model_id):
         result["done"] = True
 
     # --- 结局分支：替罪羊 ---
-    elif user_input == "CMD_ENDING_SCAPEGOAT":
+    elif command.verb == "CMD_ENDING_SCAPEGOAT":
         current_state["dynamic_state"]["ending_type"] = "NORMAL_END"
         narration = await _generate_ending_narration("NORMAL_END", current_state, model_id)
         current_state["dynamic_state"]["game_over"] = True
@@ -409,8 +455,8 @@ async def handle_accuse(user_input, request, current_state, model_id):
         result["done"] = True
 
     # --- 案件卷宗报告 ---
-    elif user_input.startswith("CMD_SHOW_REPORT"):
-        ending_type = user_input.split(":", 1)[1] if ":" in user_input else d_state_ending(current_state)
+    elif command.verb == "CMD_SHOW_REPORT":
+        ending_type = command.payload or d_state_ending(current_state)
         stats = _compute_game_stats(current_state)
         TIME_CYCLES = _get("TIME_CYCLES")
 
@@ -452,12 +498,12 @@ def d_state_ending(current_state):
 # ------------------------------------------
 # 对质系统 (confront)
 # ------------------------------------------
-async def handle_confront(user_input, request, current_state, model_id):
+async def handle_confront(command, request, current_state, model_id):
     """处理: CMD_SHOW_CONFRONT_MENU, CMD_CONFRONT_SELECT_NPC, CMD_CONFRONT_WITH_CLUE"""
     
     UIAction = _get("UIAction")
     NPC_LIST = _get("NPC_LIST")
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
     TIME_CYCLES = _get("TIME_CYCLES")
     load_npc_profile = _get("load_npc_profile")
     call_llm = _get("call_llm")
@@ -468,17 +514,13 @@ async def handle_confront(user_input, request, current_state, model_id):
     result = {"reply": "", "sender": "系统", "ui_type": "text", "ui_options": [], "bg_img": None, "done": False}
     
     # 对质A: 选择对质对象
-    if user_input == "CMD_SHOW_CONFRONT_MENU":
-        result["reply"] = "你决定亮出证据，逼问嫌疑人。请选择对质对象："
-        result["ui_type"] = "select_npc"
-        for npc in NPC_LIST:
-            result["ui_options"].append(UIAction(label=f"» 对质 {npc['name']}", action_type="CONFRONT_SELECT_NPC", payload=npc["id"]))
-        result["ui_options"].append(UIAction(label="‹ 取消", action_type="CANCEL", payload="MAIN"))
+    if command.verb == "CMD_SHOW_CONFRONT_MENU":
+        result.update(build_static_menu(command.verb))
         result["done"] = True
     
     # 对质B: 选择出示的线索
-    elif user_input.startswith("CMD_CONFRONT_SELECT_NPC"):
-        target_npc_id = user_input.split(":", 1)[1]
+    elif command.verb == "CMD_CONFRONT_SELECT_NPC":
+        target_npc_id = command.payload
         target_name = next((n["name"] for n in NPC_LIST if n["id"] == target_npc_id), "未知")
         collected_ids = current_state["dynamic_state"]["inventory"]["clues_collected"]
         if not collected_ids:
@@ -487,29 +529,27 @@ async def handle_confront(user_input, request, current_state, model_id):
             result["reply"] = f"你要用什么证据质问【{target_name}】？"
             result["ui_type"] = "select_clue"
             for cid in collected_ids:
-                clue = objective_clues_db.get(cid)
+                clue = clue_catalog.get(cid)
                 if clue:
                     result["ui_options"].append(UIAction(label=f"▪ {clue['name']}", action_type="CONFRONT_WITH_CLUE", payload=f"{target_npc_id}:{cid}"))
             result["ui_options"].append(UIAction(label="‹ 返回选人", action_type="SHOW_CONFRONT_MENU", payload="BACK"))
         result["done"] = True
     
     # 对质C: 执行对质（含 LLM 调用）
-    elif user_input.startswith("CMD_CONFRONT_WITH_CLUE"):
-        parts = user_input.split(":", 2)
-        target_npc_id = parts[1]
-        confront_clue_id = parts[2]
-        clue = objective_clues_db.get(confront_clue_id)
+    elif command.verb == "CMD_CONFRONT_WITH_CLUE":
+        target_npc_id, confront_clue_id = command.args[0], command.args[1]
+        clue = clue_catalog.get(confront_clue_id)
         clue_name = clue["name"] if clue else "未知证据"
         clue_desc = clue["description"] if clue else ""
 
         # 记录对质历史
-        confront_history = current_state["dynamic_state"].setdefault("confrontation_used", {})
+        confront_history = current_state["dynamic_state"]["confrontation_used"]
         npc_confront_list = confront_history.setdefault(target_npc_id, [])
         if confront_clue_id not in npc_confront_list:
             npc_confront_list.append(confront_clue_id)
 
         # ── 揭穿逻辑：检测当前线索能否揭穿已记录的 NPC 陈述 ──
-        all_stmts = current_state["dynamic_state"].get("npc_statements", {}).get(target_npc_id, [])
+        all_stmts = current_state["dynamic_state"]["npc_statements"].get(target_npc_id, [])
         expose_info = None
         confronted_statements = []
         for stmt in all_stmts:
@@ -561,20 +601,21 @@ async def handle_confront(user_input, request, current_state, model_id):
         if npc_profile:
             result["sender"] = npc_profile.get("static_profile", {}).get("name", "神秘人")
             npc_loc = current_state['dynamic_state'].get('npc_locations', {}).get(target_npc_id, "未知")
-            npc_trust = current_state["dynamic_state"].get("npc_trust", {})
-            npc_activities = current_state["dynamic_state"].get("npc_activities", {})
+            npc_trust = current_state["dynamic_state"]["npc_trust"]
+            npc_activities = current_state["dynamic_state"]["npc_activities"]
             system_prompt = build_npc_system_prompt(
                 npc_id=target_npc_id, npc_profile=npc_profile,
                 current_time=TIME_CYCLES[current_state['dynamic_state']['time_idx']],
                 npc_location=npc_loc,
                 player_clues=current_state["dynamic_state"]["inventory"]["clues_collected"],
-                clues_db=objective_clues_db,
+                clues_db=clue_catalog,
                 npc_activities=npc_activities,
                 npc_trust=npc_trust
             )
             npc_history = get_npc_history(current_state, target_npc_id)
             messages = build_llm_messages(system_prompt, npc_history, confront_user_message)
-            result["reply"] = await call_llm(system_prompt, messages, model_id)
+            result["reply"] = await call_llm(system_prompt, messages, model_id,
+                                             purpose="confront", npc_id=target_npc_id)
             save_npc_history(current_state, target_npc_id, f"[对质：出示{clue_name}]", result["reply"])
         else:
             result["reply"] = "找不到档案"
@@ -589,27 +630,24 @@ async def handle_confront(user_input, request, current_state, model_id):
 # ------------------------------------------
 # 搜查系统 (search + inspect + room enter)
 # ------------------------------------------
-async def handle_search(user_input, request, current_state, model_id):
+async def handle_search(command, request, current_state, model_id):
     """处理: CMD_SHOW_SEARCH_MENU, CMD_ENTER_ROOM, CMD_INSPECT"""
     
     UIAction = _get("UIAction")
     ROOM_DB = _get("ROOM_DB")
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
     encrypt_state = _get("encrypt_state")
     # GameResponse 只在房间进入被阻挡时需要直接返回，这里用 special_response 标记
     
     result = {"reply": "", "sender": "系统", "ui_type": "text", "ui_options": [], "bg_img": None, "done": False, "early_return": None}
     
-    if user_input == "CMD_SHOW_SEARCH_MENU":
-        result["reply"] = "请选择你要搜查的区域："
-        result["ui_type"] = "select_room"
-        for room_key, room_data in ROOM_DB.items():
-            result["ui_options"].append(UIAction(label=room_data["name"], action_type="SEARCH_ENTER", payload=room_key))
+    if command.verb == "CMD_SHOW_SEARCH_MENU":
+        result.update(build_static_menu(command.verb))
         result["done"] = True
     
-    elif user_input.startswith("CMD_ENTER_ROOM"):
+    elif command.verb == "CMD_ENTER_ROOM":
         try:
-            target_room = user_input.split(":", 1)[1]
+            target_room = command.args[0]
             room_data = ROOM_DB.get(target_room)
             if not room_data:
                 result["reply"] = "无法进入该区域。"
@@ -626,7 +664,7 @@ async def handle_search(user_input, request, current_state, model_id):
                 if npc_locs.get(owner_id) == target_room:
                     owner_present = True
                     owner_name = next((n["name"] for n in NPC_LIST if n["id"] == owner_id), "主人")
-                    trust = d_state.get("npc_trust", {}).get(owner_id, 50)
+                    trust = d_state["npc_trust"].get(owner_id, 50)
 
                     # ── 信任三档判定 ──
                     if trust >= 70:
@@ -651,8 +689,7 @@ async def handle_search(user_input, request, current_state, model_id):
                             f"{owner_name}正在房内，用警惕的目光审视着你。")
                         result["reply"] = f"⚠ {probe_line}\n（{owner_name}在旁监视，搜查难度提升）\n\n"
                         # 标记该房间的搜查惩罚
-                        penalty = d_state.setdefault("search_penalty", {})
-                        penalty[target_room] = 1
+                        d_state["search_penalty"][target_room] = 1
 
             current_state['dynamic_state']['current_location'] = target_room
             if owner_id:
@@ -673,7 +710,7 @@ async def handle_search(user_input, request, current_state, model_id):
                 ))
 
             # ── 条件线索按钮注入 ──
-            objective_clues_db = _get("objective_clues_db")
+            clue_catalog = _get("clue_catalog")
             cond_clues = get_available_conditional_clues(
                 d_state, target_room, current_time, context="search"
             )
@@ -698,13 +735,13 @@ async def handle_search(user_input, request, current_state, model_id):
             result["reply"] = "指令错误。"
         result["done"] = True
     
-    # ── 条件线索触发（必须在 CMD_INSPECT 之前，避免 startswith 误拦截）──
-    elif user_input.startswith("CMD_INSPECT_CONDITIONAL"):
+    # ── 条件线索触发 ──
+    elif command.verb == "CMD_INSPECT_CONDITIONAL":
         try:
-            _, room_name, cond_clue_id = user_input.split(":", 2)
+            room_name, cond_clue_id = command.args
             d_state = current_state["dynamic_state"]
             TIME_CYCLES = _get("TIME_CYCLES")
-            objective_clues_db = _get("objective_clues_db")
+            clue_catalog = _get("clue_catalog")
             ROOM_DB = _get("ROOM_DB")
             current_time = TIME_CYCLES[d_state["time_idx"]]
 
@@ -712,8 +749,7 @@ async def handle_search(user_input, request, current_state, model_id):
                 clue_id=cond_clue_id,
                 d_state=d_state,
                 current_location=room_name,
-                current_time=current_time,
-                objective_clues_db=objective_clues_db
+                current_time=current_time
             )
 
             result["sender"] = "调查结果"
@@ -747,10 +783,10 @@ async def handle_search(user_input, request, current_state, model_id):
             ))
 
             if success:
-                clue_name = objective_clues_db.get(added_clue_id, {}).get("name", added_clue_id)
+                clue_name = clue_catalog.get(added_clue_id, {}).get("name", added_clue_id)
                 result["reply"] = text + f"\n\n**▪ 新线索入档：{clue_name}**"
                 # 成功才计入搜查计数 / 推进时间
-                d_state["room_inspect_count"] = d_state.get("room_inspect_count", 0) + 1
+                d_state["room_inspect_count"] += 1
                 if d_state["room_inspect_count"] % 2 == 0:
                     advance_time_func = _get("advance_time")
                     advance_time_func(current_state)
@@ -762,13 +798,13 @@ async def handle_search(user_input, request, current_state, model_id):
             result["reply"] = "指令错误。"
         result["done"] = True
 
-    elif user_input.startswith("CMD_INSPECT"):
+    elif command.verb == "CMD_INSPECT":
         try:
-            _, room_name, furniture_name = user_input.split(":")
+            room_name, furniture_name = command.args
             room_data = ROOM_DB.get(room_name)
             d_state = current_state["dynamic_state"]
 
-            inspect_count = d_state.get("room_inspect_count", 0) + 1
+            inspect_count = d_state["room_inspect_count"] + 1
             d_state["room_inspect_count"] = inspect_count
             if inspect_count % 2 == 0:
                 advance_time = _get("advance_time")
@@ -783,7 +819,7 @@ async def handle_search(user_input, request, current_state, model_id):
             custom_text = room_data.get("inspect_texts", {}).get(furniture_name)
 
             # 记录搜查次数（所有家具，不仅是有线索的）
-            search_counts = d_state.setdefault("search_counts", {})
+            search_counts = d_state["search_counts"]
             furniture_key = f"{room_name}:{furniture_name}"
             search_counts[furniture_key] = search_counts.get(furniture_key, 0) + 1
 
@@ -811,11 +847,11 @@ async def handle_search(user_input, request, current_state, model_id):
             if custom_text:
                 result["reply"] += custom_text
             elif clue_id:
-                clue = objective_clues_db.get(clue_id)
+                clue = clue_catalog.get(clue_id)
                 if clue:
                     difficulty = clue.get("search_difficulty", 1)
                     # ── 信任试探惩罚：房主在场监视时搜查更难 ──
-                    penalty = d_state.get("search_penalty", {}).get(room_name, 0)
+                    penalty = d_state["search_penalty"].get(room_name, 0)
                     difficulty = difficulty + penalty
 
                     current_count = search_counts[furniture_key]
@@ -827,7 +863,7 @@ async def handle_search(user_input, request, current_state, model_id):
                             d_state["inventory"]["clues_collected"].append(clue['id'])
                             # ── 推断检查 ──
                             from inference_engine import check_new_inferences, format_inference_message
-                            new_infs = check_new_inferences(d_state)
+                            new_infs = check_new_inferences(d_state, [clue['id']])
                             if new_infs:
                                 inf_texts = [format_inference_message(i) for i in new_infs]
                                 result["reply"] += "\n\n" + "\n\n".join(inf_texts)
@@ -855,13 +891,13 @@ async def handle_search(user_input, request, current_state, model_id):
 # ------------------------------------------
 # NPC 对话系统 (talk + free chat)
 # ------------------------------------------
-async def handle_talk(user_input, request, current_state, model_id):
+async def handle_talk(command, request, current_state, model_id):
     """处理: CMD_SHOW_TALK_MENU, NPC自由对话"""
     
     UIAction = _get("UIAction")
     NPC_LIST = _get("NPC_LIST")
     TIME_CYCLES = _get("TIME_CYCLES")
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
     load_npc_profile = _get("load_npc_profile")
     call_llm = _get("call_llm")
     get_npc_history = _get("get_npc_history")
@@ -870,15 +906,13 @@ async def handle_talk(user_input, request, current_state, model_id):
     
     result = {"reply": "", "sender": "系统", "ui_type": "text", "ui_options": [], "bg_img": None, "done": False}
     
-    if user_input == "CMD_SHOW_TALK_MENU":
-        result["reply"] = "请选择你要问话的对象："
-        result["ui_type"] = "select_npc"
-        for npc in NPC_LIST:
-            result["ui_options"].append(UIAction(label=npc["name"], action_type="TALK", payload=npc["id"]))
+    if command.verb == "CMD_SHOW_TALK_MENU":
+        result.update(build_static_menu(command.verb))
         result["done"] = True
     
-    # NPC 自由对话（request.npc_id 有值时）
+    # NPC 自由对话（request.npc_id 有值时），玩家输入即 command.raw
     elif request.npc_id:
+        user_input = command.raw
         result["ui_type"] = "chat_mode"
         d_state = current_state["dynamic_state"]
         current_time = TIME_CYCLES[d_state["time_idx"]]
@@ -909,20 +943,21 @@ async def handle_talk(user_input, request, current_state, model_id):
         if npc_profile:
             result["sender"] = npc_profile.get("static_profile", {}).get("name", "神秘人")
             npc_loc = d_state.get("npc_locations", {}).get(npc_id, "未知")
-            npc_trust = d_state.get("npc_trust", {})
-            npc_activities = d_state.get("npc_activities", {})
+            npc_trust = d_state["npc_trust"]
+            npc_activities = d_state["npc_activities"]
             system_prompt = build_npc_system_prompt(
                 npc_id=npc_id, npc_profile=npc_profile,
                 current_time=current_time,
                 npc_location=npc_loc,
                 player_clues=collected_ids,
-                clues_db=objective_clues_db,
+                clues_db=clue_catalog,
                 npc_activities=npc_activities,
                 npc_trust=npc_trust
             )
             npc_history = get_npc_history(current_state, npc_id)
             messages = build_llm_messages(system_prompt, npc_history, user_input)
-            result["reply"] = await call_llm(system_prompt, messages, model_id)
+            result["reply"] = await call_llm(system_prompt, messages, model_id,
+                                             purpose="talk", npc_id=npc_id)
             save_npc_history(current_state, npc_id, user_input, result["reply"])
 
             # ── 陈述提取：检测本轮对话是否触发了可证伪陈述 ──
@@ -933,7 +968,7 @@ async def handle_talk(user_input, request, current_state, model_id):
             for stmt in confrontable_stmts:
                 stmt_id = stmt["id"]
                 # 避免重复记录已触发过的陈述
-                already = d_state.setdefault("npc_statements", {}).get(npc_id, [])
+                already = d_state["npc_statements"].get(npc_id, [])
                 if any(s["id"] == stmt_id for s in already):
                     continue
                 # 检测触发关键词（玩家输入或 NPC 回复中包含任意一个关键词即触发）
@@ -955,11 +990,11 @@ async def handle_talk(user_input, request, current_state, model_id):
                 result["new_statements"] = new_statements
 
             # ── 信任双向博弈：对话中的三档行为 ──
-            trust_val = d_state.get("npc_trust", {}).get(npc_id, 50)
+            trust_val = d_state["npc_trust"].get(npc_id, 50)
 
             # 高信任（≥70）：NPC 主动提供线索提示
             if trust_val >= 70:
-                act_data = d_state.get("npc_activities", {}).get(npc_id, {})
+                act_data = d_state["npc_activities"].get(npc_id, {})
                 if act_data.get("theory"):
                     sender_name = result["sender"]
                     result["reply"] += (
@@ -1006,20 +1041,19 @@ async def handle_talk(user_input, request, current_state, model_id):
         result["done"] = True
 
     # ── 对话中细节观察（触发对话型条件线索）──
-    elif user_input.startswith("CMD_OBSERVE_NPC_DETAIL"):
+    elif command.verb == "CMD_OBSERVE_NPC_DETAIL":
         try:
-            _, npc_id, cond_clue_id = user_input.split(":", 2)
+            npc_id, cond_clue_id = command.args
             d_state = current_state["dynamic_state"]
             current_time = TIME_CYCLES[d_state["time_idx"]]
-            objective_clues_db = _get("objective_clues_db")
+            clue_catalog = _get("clue_catalog")
             current_location = d_state.get("current_location", "大堂")
 
             success, text, added_clue_id = try_trigger_conditional_clue(
                 clue_id=cond_clue_id,
                 d_state=d_state,
                 current_location=current_location,
-                current_time=current_time,
-                objective_clues_db=objective_clues_db
+                current_time=current_time
             )
 
             result["ui_type"] = "chat_mode"
@@ -1046,7 +1080,7 @@ async def handle_talk(user_input, request, current_state, model_id):
                 ))
 
             if success:
-                clue_name = objective_clues_db.get(added_clue_id, {}).get("name", added_clue_id)
+                clue_name = clue_catalog.get(added_clue_id, {}).get("name", added_clue_id)
                 result["reply"] = text + f"\n\n**▪ 新线索入档：{clue_name}**"
             else:
                 result["reply"] = text
@@ -1061,7 +1095,7 @@ async def handle_talk(user_input, request, current_state, model_id):
 # ------------------------------------------
 # 公堂对质系统 (tribunal)
 # ------------------------------------------
-async def handle_tribunal(user_input, request, current_state, model_id):
+async def handle_tribunal(command, request, current_state, model_id):
     """处理全员公堂系统:
        CMD_SHOW_TRIBUNAL_MENU  → 选呈堂证物
        CMD_TRIBUNAL_TOPIC:clue_id → 选首要质问对象
@@ -1072,7 +1106,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
     """
     UIAction = _get("UIAction")
     NPC_LIST = _get("NPC_LIST")
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
     TIME_CYCLES = _get("TIME_CYCLES")
     call_llm = _get("call_llm")
     load_npc_profile = _get("load_npc_profile")
@@ -1084,7 +1118,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
     MAX_TRIBUNALS = 3
 
     # ── 公堂菜单：选呈堂证物 ──────────────────────────────────────────────
-    if user_input == "CMD_SHOW_TRIBUNAL_MENU":
+    if command.verb == "CMD_SHOW_TRIBUNAL_MENU":
         used = d_state.get("tribunal_count", 0)
         if used >= MAX_TRIBUNALS:
             result["reply"] = '李德福不耐烦地挥手："够了够了，咱家不是来看你唱戏的！"'
@@ -1105,7 +1139,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
         )
         result["ui_type"] = "select_clue"
         for cid in collected_ids:
-            clue = objective_clues_db.get(cid)
+            clue = clue_catalog.get(cid)
             if clue:
                 result["ui_options"].append(UIAction(
                     label=f"▪ {clue['name']}",
@@ -1116,19 +1150,19 @@ async def handle_tribunal(user_input, request, current_state, model_id):
         result["done"] = True
 
     # ── 选好证物 → 选首要质问对象 ────────────────────────────────────────
-    elif user_input.startswith("CMD_TRIBUNAL_TOPIC:"):
-        clue_id = user_input.split(":", 1)[1]
+    elif command.verb == "CMD_TRIBUNAL_TOPIC" and command.args:
+        clue_id = command.payload
         d_state["temp_tribunal_clue"] = clue_id
-        clue = objective_clues_db.get(clue_id, {})
+        clue = clue_catalog.get(clue_id, {})
         result["reply"] = f"证物【{clue.get('name', '未知')}】已置于桌上。请点击上方头像选择质问对象。"
         result["ui_type"] = "tribunal_mode"
         result["done"] = True
 
     # ── 执行全员公堂质问 ─────────────────────────────────────────────────
-    elif user_input.startswith("CMD_TRIBUNAL_EXECUTE:"):
-        focus_npc_id = user_input.split(":", 1)[1]
+    elif command.verb == "CMD_TRIBUNAL_EXECUTE" and command.args:
+        focus_npc_id = command.payload
         clue_id = d_state.get("temp_tribunal_clue", "")
-        clue = objective_clues_db.get(clue_id, {})
+        clue = clue_catalog.get(clue_id, {})
         clue_name = clue.get("name", "未知证物")
         clue_desc = clue.get("description", "")
         focus_profile = load_npc_profile(focus_npc_id)
@@ -1143,7 +1177,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
             profile = load_npc_profile(npc["id"])
             if not profile:
                 continue
-            trust = d_state.get("npc_trust", {}).get(npc["id"], 50)
+            trust = d_state["npc_trust"].get(npc["id"], 50)
             # 取该旁听者对焦点 NPC 的 relationship 描述
             rels = profile.get("dynamic_state_template", {}).get("relationships", {})
             rel_desc = ""
@@ -1164,8 +1198,8 @@ async def handle_tribunal(user_input, request, current_state, model_id):
         bystander_summary = "\n".join(bystander_lines)
 
         # ── 取焦点 NPC 信任度与已有陈述 ──
-        focus_trust = d_state.get("npc_trust", {}).get(focus_npc_id, 50)
-        focus_stmts = d_state.get("npc_statements", {}).get(focus_npc_id, [])
+        focus_trust = d_state["npc_trust"].get(focus_npc_id, 50)
+        focus_stmts = d_state["npc_statements"].get(focus_npc_id, [])
         recorded_stmts_text = ""
         if focus_stmts:
             lines = [f"  「{s['text']}」（{'已被揭穿' if s.get('confronted') else '尚未揭穿'}）"
@@ -1209,7 +1243,8 @@ async def handle_tribunal(user_input, request, current_state, model_id):
             {"role": "user", "content": f"请围绕证物【{clue_name}】对{focus_name}展开公堂质问。"}
         ]
 
-        raw = await call_llm(tribunal_prompt, messages, model_id)
+        raw = await call_llm(tribunal_prompt, messages, model_id,
+                             purpose="tribunal", npc_id=focus_npc_id)
 
         # ── 解析 LLM JSON 输出 ──
         import re as _re
@@ -1234,7 +1269,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
 
         # ── 信任度调整（静默执行）──
         adjust_trust(d_state, focus_npc_id, "tribunal_accused")
-        trust_map = d_state.setdefault("npc_trust", {})
+        trust_map = d_state["npc_trust"]
         for r in reactions:
             npc_match = next((n["id"] for n in NPC_LIST if n["name"] == r["name"]), None)
             if npc_match:
@@ -1246,7 +1281,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
         result["done"] = True
 
     # ── 结束公堂：消耗 2 个时辰 ─────────────────────────────────────────
-    elif user_input == "CMD_TRIBUNAL_CLOSE":
+    elif command.verb == "CMD_TRIBUNAL_CLOSE":
         # 直接推进 2 个时辰（无论进入时 ap_used_this_cycle 为何值）
         d_state["ap_used_this_cycle"] = 0
         current_idx = d_state["time_idx"]
@@ -1271,7 +1306,7 @@ async def handle_tribunal(user_input, request, current_state, model_id):
         result["done"] = True
 
     # ── 兼容旧指令（SELECT_A / SELECT_B），重定向到新菜单 ────────────────
-    elif user_input.startswith("CMD_TRIBUNAL_SELECT_A") or user_input.startswith("CMD_TRIBUNAL_SELECT_B"):
+    elif command.verb in ("CMD_TRIBUNAL_SELECT_A", "CMD_TRIBUNAL_SELECT_B"):
         result["reply"] = "公堂流程已更新，请重新召集公堂。"
         result["ui_type"] = "text"
         result["ui_options"].append(UIAction(
@@ -1281,21 +1316,21 @@ async def handle_tribunal(user_input, request, current_state, model_id):
 
     return result
 
-async def handle_recall_cmd(user_input, request, current_state, model_id):
+async def handle_recall_cmd(command, request, current_state, model_id):
     """处理 CMD_SHOW_RECALL_MENU / CMD_RECALL_* 指令（纯只读，不消耗 AP）"""
     RECALL_CMDS = {
         "CMD_SHOW_RECALL_MENU", "CMD_RECALL_CLUES",
         "CMD_RECALL_INFERENCES", "CMD_RECALL_TIMELINE"
     }
-    if user_input not in RECALL_CMDS:
+    if command.verb not in RECALL_CMDS:
         return {"done": False, "reply": "", "sender": "系统",
                 "ui_type": "text", "ui_options": [], "bg_img": None}
 
     UIAction = _get("UIAction")
     d_state = current_state["dynamic_state"]
-    objective_clues_db = _get("objective_clues_db")
+    clue_catalog = _get("clue_catalog")
 
-    res = handle_recall(user_input, d_state, objective_clues_db)
+    res = handle_recall(command.verb, d_state, clue_catalog, known_version=request.recall_version)
 
     ui_opts = [
         UIAction(label=o["label"], action_type=o["action_type"], payload=o["payload"])
@@ -1309,5 +1344,30 @@ async def handle_recall_cmd(user_input, request, current_state, model_id):
         "ui_options": ui_opts,
         "bg_img": None,
         "done": True,
+        "recall": {"version": res["recall_version"], "unchanged": res["unchanged"]},
     }
-    
\ No newline at end of file
+    
+
+# ------------------------------------------
+# 指令注册（见 command_router.py）
+# ------------------------------------------
+def register_commands(router):
+    """把各系统负责的指令注册到路由表；新增指令时在对应系统的列表里加一项。"""
+    # 只读：菜单 / 报告 / 回想，不修改存档
+    router.register(["CMD_SHOW_TRIBUNAL_MENU", "CMD_TRIBUNAL_SELECT_A", "CMD_TRIBUNAL_SELECT_B"],
+                    handle_tribunal, read_only=True)
+    router.register(["CMD_TRIBUNAL_TOPIC", "CMD_TRIBUNAL_EXECUTE", "CMD_TRIBUNAL_CLOSE"], handle_tribunal)
+    router.register(["CMD_SHOW_ACCUSE_MENU", "CMD_SHOW_REPORT"], handle_accuse, read_only=True)
+    router.register([
+        "CMD_ACCUSE_TARGET", "CMD_ACCUSE_EVIDENCE", "CMD_ENDING_REVEAL", "CMD_ENDING_SCAPEGOAT",
+    ], handle_accuse)
+    router.register(["CMD_SHOW_CONFRONT_MENU"], handle_confront, read_only=True)
+    router.register(["CMD_CONFRONT_SELECT_NPC", "CMD_CONFRONT_WITH_CLUE"], handle_confront)
+    router.register(["CMD_SHOW_SEARCH_MENU"], handle_search, read_only=True)
+    router.register(["CMD_ENTER_ROOM", "CMD_INSPECT_CONDITIONAL", "CMD_INSPECT"], handle_search)
+    router.register(["CMD_SHOW_TALK_MENU"], handle_talk, read_only=True)
+    router.register(["CMD_OBSERVE_NPC_DETAIL"], handle_talk)
+    router.register([
+        "CMD_SHOW_RECALL_MENU", "CMD_RECALL_CLUES", "CMD_RECALL_INFERENCES", "CMD_RECALL_TIMELINE",
+    ], handle_recall_cmd, read_only=True)
+    router.set_talk(handle_talk)
@@ -5,14 +5,15 @@ inference_engine.py
 逻辑：
   - INFERENCE_DB 定义所有推断规则，每条规则有 required_clues（触发条件）
     和 unlocks（解锁的推断结论 ID）
-  - 玩家每收集一条新线索后，调用 check_new_inferences() 返回新触发的推断
-  - 推断结论存入 d_state["inferences_unlocked"]，不会重复触发
+  - 玩家每收集一条新线索后，调用 check_new_inferences(d_state, [新线索]) 返回新触发的推断；
+    INFERENCE_INDEX（线索 → 规则倒排索引 + 位掩码）保证只检查引用了新线索的规则
+  - 推断结论按 INFERENCE_DB 顺序存入 d_state["inferences_unlocked"]，不会重复触发
   - 推断有两种类型：
       "insight"  — 侦探内心独白，帮助玩家理解线索关系（不直接给答案）
       "unlock"   — 解锁新的游戏选项（如对质时多出一个追问选项）
 """
 
-from typing import Dict, List, Set
+from typing import Container, Dict, Iterable, List, Optional, Tuple
 
 # ─────────────────────────────────────────────
 #  推断规则库
@@ -193,35 +194,93 @@ INFERENCE_DB = {
 
 }
 
+# ─────────────────────────────────────────────
+#  线索 → 规则索引
+# ─────────────────────────────────────────────
+
+class ClueRuleIndex:
+    """
+    「集齐若干线索即触发」类规则的索引，推断 / 时间线 / 陈述等系统可共用。
+
+    每条线索分配一个比特位，规则的前提编译成位掩码；
+    新增线索时只检查引用了这些线索的规则（clue → rules 倒排索引）。
+    返回结果一律按规则注册顺序排列。
+    """
+
+    def __init__(self, rules: Dict[str, Iterable[str]]):
+        self.order: Dict[str, int] = {rule_id: i for i, rule_id in enumerate(rules)}
+        self._bits: Dict[str, int] = {}
+        self._masks: Dict[str, int] = {}
+        by_clue: Dict[str, List[str]] = {}
+        for rule_id, clues in rules.items():
+            mask = 0
+            for clue_id in clues:
+                bit = self._bits.setdefault(clue_id, len(self._bits))
+                mask |= 1 << bit
+                by_clue.setdefault(clue_id, []).append(rule_id)
+            self._masks[rule_id] = mask
+        self._by_clue: Dict[str, Tuple[str, ...]] = {c: tuple(ids) for c, ids in by_clue.items()}
+
+    def mask_of(self, clues: Iterable[str]) -> int:
+        mask = 0
+        bits = self._bits
+        for clue_id in clues:
+            bit = bits.get(clue_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def satisfied(self, collected: Iterable[str], new_clues: Optional[Iterable[str]] = None,
+                  exclude: Container[str] = ()) -> List[str]:
+        """
+        返回前提已全部满足、且不在 exclude 中的规则 ID（按注册顺序）。
+        new_clues 不为空时只检查引用了这些线索的规则。
+        """
+        if new_clues is None:
+            candidates: Iterable[str] = self.order
+        else:
+            ids = {rule_id for clue_id in new_clues for rule_id in self._by_clue.get(clue_id, ())}
+            if not ids:
+                return []
+            candidates = sorted(ids, key=self.order.__getitem__)
+        have = self.mask_of(collected)
+        masks = self._masks
+        return [rule_id for rule_id in candidates
+                if rule_id not in exclude and masks[rule_id] & have == masks[rule_id]]
+
+    def sort(self, rule_ids: Iterable[str]) -> List[str]:
+        """去重并按注册顺序排列，丢弃未知 ID。"""
+        return sorted({r for r in rule_ids if r in self.order}, key=self.order.__getitem__)
+
+
+INFERENCE_INDEX = ClueRuleIndex({inf_id: inf["required_clues"] for inf_id, inf in INFERENCE_DB.items()})
+
+
 # ─────────────────────────────────────────────
 #  核心函数
 # ─────────────────────────────────────────────
 
-def check_new_inferences(d_state: Dict) -> List[Dict]:
+def check_new_inferences(d_state: Dict, new_clues: Optional[Iterable[str]] = None) -> List[Dict]:
     """
     根据当前已收集线索，检查哪些推断首次满足触发条件。
     返回新触发的推断列表（每条只触发一次）。
-    同时把已解锁的 id 写入 d_state["inferences_unlocked"]。
-    """
-    collected: Set[str] = set(d_state["inventory"]["clues_collected"])
-    already: Set[str]   = set(d_state.setdefault("inferences_unlocked", []))
+    同时把已解锁的 id 写入 d_state["inferences_unlocked"]（按 INFERENCE_DB 顺序）。
 
-    newly_triggered = []
-    for inf_id, inf in INFERENCE_DB.items():
-        if inf_id in already:
-            continue
-        if inf["required_clues"].issubset(collected):
-            newly_triggered.append(inf)
-            already.add(inf_id)
-
-    d_state["inferences_unlocked"] = list(already)
-    return newly_triggered
+    new_clues：本次新增的线索；给出时只检查引用了这些线索的规则，为空则全量检查。
+    """
+    unlocked = d_state["inferences_unlocked"]
+    newly_ids = INFERENCE_INDEX.satisfied(
+        d_state["inventory"]["clues_collected"], new_clues, exclude=set(unlocked)
+    )
+    if not newly_ids:
+        return []
+    d_state["inferences_unlocked"] = INFERENCE_INDEX.sort(unlocked + newly_ids)
+    return [INFERENCE_DB[i] for i in newly_ids]
 
 
 def get_all_unlocked(d_state: Dict) -> List[Dict]:
-    """返回所有已解锁推断，供「回想」界面使用。"""
-    unlocked_ids = set(d_state.get("inferences_unlocked", []))
-    return [INFERENCE_DB[i] for i in unlocked_ids if i in INFERENCE_DB]
+    """返回所有已解锁推断（按 INFERENCE_DB 顺序），供「回想」界面使用。"""
+    return [INFERENCE_DB[i] for i in INFERENCE_INDEX.sort(d_state.get("inferences_unlocked", []))]
 
 
 def get_hint_for_next_step(d_state: Dict) -> List[str]:
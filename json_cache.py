@@ -0,0 +1,101 @@
+"""
+json_cache.py
+基于 mtime 的 JSON 文件内存缓存
+
+逻辑：
+  - 首次访问时读取并解析文件，之后直接返回内存中的对象
+  - 每隔 check_interval 秒最多 stat 一次文件，mtime 变化才重新解析
+  - 文件缺失 → 返回 default；解析失败 → 保留上一次的有效内容
+
+对外接口：
+  MtimeJsonFile(path, default, check_interval)
+      .get()         → 当前内容（可能触发一次 reload）
+      .peek()        → 当前内容，不 stat（只在从未加载过时读一次文件）；供后台线程负责 get() 的场景
+      .replace(data) → 写回磁盘并同步内存（先写同目录临时文件再 os.replace，读者不会看到半截文件；
+                       写完记录新 mtime，避免自己触发 reload）
+"""
+
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+
+class MtimeJsonFile:
+    def __init__(self, path: str, default: Callable[[], Any] = dict,
+                 check_interval: float = 1.0,
+                 transform: Optional[Callable[[Any], Any]] = None):
+        """
+        path:           JSON 文件路径
+        default:        文件不存在时的默认值工厂（dict / set / list ...）
+        check_interval: 两次 stat 之间的最短间隔（秒），0 表示每次都检查
+        transform:      解析后的后处理（如把 list 转成 set 以便 O(1) 查询）
+        """
+        self.path = path
+        self._default = default
+        self._transform = transform
+        self._check_interval = check_interval
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._data: Any = default()
+        self._loaded = False
+
+    def _stat_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _reload(self, mtime: Optional[float]):
+        if mtime is None:
+            # 文件被删除 / 从未存在
+            self._data = self._default()
+            self._mtime = None
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            # 写到一半 / 格式错误：保留旧内容，下次再试
+            return
+        self._data = self._transform(raw) if self._transform else raw
+        self._mtime = mtime
+
+    def get(self) -> Any:
+        now = time.monotonic()
+        if self._loaded and now - self._last_check < self._check_interval:
+            return self._data
+        self._last_check = now
+        mtime = self._stat_mtime()
+        if not self._loaded or mtime != self._mtime:
+            self._reload(mtime)
+            self._loaded = True
+        return self._data
+
+    def peek(self) -> Any:
+        if not self._loaded:
+            return self.get()
+        return self._data
+
+    def replace(self, raw: Any):
+        """整体写回文件，并把内存内容换成新数据。"""
+        # 临时文件必须和目标在同一目录（同一文件系统），os.replace 才是原子的
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                        prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(raw, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._data = self._transform(raw) if self._transform else raw
+        self._mtime = self._stat_mtime()
+        self._last_check = time.monotonic()
+        self._loaded = True
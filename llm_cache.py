@@ -0,0 +1,163 @@
+"""
+llm_cache.py
+LLM 响应缓存（内存 LRU + SQLite 持久化，两级）
+
+逻辑：
+  - key = sha256(模型 + system prompt + messages)，完全相同的请求才会命中
+  - 一级：进程内 OrderedDict LRU，条目数有上限，带 TTL
+  - 二级：SQLite 表（可选），重启后仍然有效；命中后回填一级。open() 时才建库
+  - 只缓存成功的回复，失败 / 网络错误不会写入
+  - 哪些调用走缓存由调用方按用途（talk / confront / ending ...）决定
+
+对外接口：
+  LLMResponseCache(max_entries, ttl, db_path)
+      await .open()            → 打开 SQLite 二级缓存（db_path 为空时什么都不做）
+      .make_key(model_id, system_prompt, messages) → str
+      await .get(key)          → 缓存的回复 / None
+      await .put(key, reply)
+      .stats()                 → 命中 / 未命中计数
+      .close()
+  SingleFlight()
+      await .do(key, coro_factory) → 相同 key 的并发调用共享同一次上游请求
+      .stats()                     → 进行中 / 已合并的调用数
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class LLMResponseCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400.0, db_path: Optional[str] = None):
+        """
+        max_entries: 内存 LRU 条目上限
+        ttl:         有效期（秒），两级共用
+        db_path:     SQLite 文件路径，为空则只用内存
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()   # key → (写入时间, reply)
+        self._db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+    # ---------- SQLite ----------
+
+    async def open(self):
+        if self._db_path and self._conn is None:
+            await asyncio.to_thread(self._open_db)
+
+    def _open_db(self):
+        conn = sqlite3.connect(self._db_path, timeout=5.0, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " reply TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        # 启动时顺手清掉过期条目
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self._ttl,))
+        self._conn = conn
+
+    def _db_get(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT created_at, reply FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _db_put(self, key: str, created_at: float, reply: str):
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, reply, created_at) VALUES (?, ?, ?)",
+                (key, reply, created_at)
+            )
+
+    # ---------- 读写 ----------
+
+    @staticmethod
+    def make_key(model_id: str, system_prompt: str, messages: list) -> str:
+        payload = json.dumps([model_id, system_prompt, messages], ensure_ascii=False,
+                             sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, created_at: float, reply: str):
+        self._memory[key] = (created_at, reply)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if now - entry[0] < self._ttl:
+                self._memory.move_to_end(key)
+                self._counts["memory_hits"] += 1
+                return entry[1]
+            del self._memory[key]
+        if self._conn is not None:
+            row = await asyncio.to_thread(self._db_get, key)
+            if row is not None and now - row[0] < self._ttl:
+                self._remember(key, row[0], row[1])
+                self._counts["disk_hits"] += 1
+                return row[1]
+        self._counts["misses"] += 1
+        return None
+
+    async def put(self, key: str, reply: str):
+        created_at = time.time()
+        self._remember(key, created_at, reply)
+        self._counts["writes"] += 1
+        if self._conn is not None:
+            await asyncio.to_thread(self._db_put, key, created_at, reply)
+
+    def stats(self) -> Dict:
+        hits = self._counts["memory_hits"] + self._counts["disk_hits"]
+        total = hits + self._counts["misses"]
+        return dict(self._counts, entries=len(self._memory),
+                    hit_rate=round(hits / total, 4) if total else 0.0)
+
+    def close(self):
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.close()
+            self._conn = None
+
+
+# ==========================================
+# 🔀 并发相同请求合并（single-flight）
+# ==========================================
+
+class SingleFlight:
+    """
+    同一个 key 同时只发一次上游请求，后到的调用直接等待同一个结果。
+    上游请求放在独立 task 中执行：发起者断开（如 SSE 客户端关闭）不会连累其他等待者。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._counts = {"calls": 0, "deduplicated": 0}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]):
+        """返回 (结果, 是否为发起者)。"""
+        self._counts["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self._counts["deduplicated"] += 1
+            return await asyncio.shield(task), False
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), True
+
+    def stats(self) -> Dict:
+        return dict(self._counts, in_flight=len(self._inflight))
@@ -0,0 +1,241 @@
+"""
+llm_client.py
+LLM 供应商的长连接 HTTP 客户端池
+
+每个 MODEL_REGISTRY 条目一个常驻 httpx.AsyncClient：
+  - 应用启动时 open()，关闭时 close()，请求之间复用 TCP/TLS 连接
+  - 连接池上限、keep-alive 时长、是否启用 HTTP/2 都可在注册表的 "pool" 字段配置
+  - 通过 httpx 的 trace 扩展统计：新建连接数、排队等待连接的耗时、当前并发
+
+对外接口：
+  LLMClientPool(registry)
+      await .open() / await .close()
+      .get(model_id)               → httpx.AsyncClient
+      await .post(model_id, ...)   → httpx.Response（带统计）
+      async with .stream(model_id, ...) as resp  → 流式响应（带统计）
+      .stats()                     → {model_id: {...}}，供 /api/metrics 使用
+  PromptCacheStats()
+      .record(usage, model=..., npc=..., purpose=...)  → 记录一次响应的 usage
+      .stats()                     → 按模型 / NPC / 用途汇总的前缀缓存命中率
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 注册表条目未配置 "pool" 时使用的默认值
+DEFAULT_POOL_CONFIG = {
+    "max_connections": 20,            # 同时打开的连接上限
+    "max_keepalive_connections": 10,  # 空闲保活连接上限
+    "keepalive_expiry": 60.0,         # 空闲连接保留秒数
+    "http2": False,                   # 需要安装 h2（pip install httpx[http2]）
+    "timeout": 30.0,
+}
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _PoolStats:
+    __slots__ = ("requests", "in_flight", "max_in_flight", "connections_opened",
+                 "wait_total", "wait_max", "errors")
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections_opened = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.errors = 0
+
+
+class LLMClientPool:
+    def __init__(self, registry: Dict[str, Dict]):
+        self._registry = registry
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _PoolStats] = {}
+
+    def _pool_config(self, model_id: str) -> Dict:
+        cfg = dict(DEFAULT_POOL_CONFIG)
+        cfg.update(self._registry.get(model_id, {}).get("pool", {}))
+        if cfg["http2"] and not _h2_available():
+            logger.warning("模型 %s 配置了 http2，但未安装 h2，回退到 HTTP/1.1", model_id)
+            cfg["http2"] = False
+        return cfg
+
+    def _create_client(self, model_id: str) -> httpx.AsyncClient:
+        cfg = self._pool_config(model_id)
+        limits = httpx.Limits(
+            max_connections=cfg["max_connections"],
+            max_keepalive_connections=cfg["max_keepalive_connections"],
+            keepalive_expiry=cfg["keepalive_expiry"],
+        )
+        return httpx.AsyncClient(limits=limits, http2=cfg["http2"], timeout=cfg["timeout"])
+
+    async def open(self):
+        for model_id in self._registry:
+            if model_id not in self._clients:
+                self._clients[model_id] = self._create_client(model_id)
+                self._stats.setdefault(model_id, _PoolStats())
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, model_id: str) -> httpx.AsyncClient:
+        client = self._clients.get(model_id)
+        if client is None:
+            # 未经 open()（如脚本里直接调用）时按需创建，close() 时一并释放
+            client = self._clients[model_id] = self._create_client(model_id)
+            self._stats.setdefault(model_id, _PoolStats())
+        return client
+
+    def _tracker(self, model_id: str):
+        """返回 (trace 回调, 结束回调)，用于统计单次请求的连接等待。"""
+        stats = self._stats[model_id]
+        started = time.perf_counter()
+        waited: Optional[float] = None
+
+        async def trace(event_name: str, info: Dict):
+            nonlocal waited
+            if event_name == "connection.connect_tcp.complete":
+                stats.connections_opened += 1
+            elif waited is None and event_name.endswith("send_request_headers.started"):
+                # 从发起到开始写请求头 = 等待空闲连接 + 必要时新建连接
+                waited = time.perf_counter() - started
+
+        def finish(failed: bool):
+            stats.in_flight -= 1
+            if failed:
+                stats.errors += 1
+            if waited is not None:
+                stats.wait_total += waited
+                stats.wait_max = max(stats.wait_max, waited)
+
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        return trace, finish
+
+    async def post(self, model_id: str, url: str, **kwargs) -> httpx.Response:
+        """发送请求并记录连接池统计。"""
+        client = self.get(model_id)
+        trace, finish = self._tracker(model_id)
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+        failed = True
+        try:
+            resp = await client.post(url, extensions=extensions, **kwargs)
+            failed = False
+            return resp
+        finally:
+            finish(failed)
+
+    @asynccontextmanager
+    async def stream(self, model_id: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """流式 POST（供 SSE 使用），统计口径与 post() 相同。"""
+        client = self.get(model_id)
+        trace, finish = self._tracker(model_id)
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+        failed = True
+        try:
+            async with client.stream("POST", url, extensions=extensions, **kwargs) as resp:
+                yield resp
+            failed = False
+        finally:
+            finish(failed)
+
+    def _connection_counts(self, client: httpx.AsyncClient) -> Dict[str, int]:
+        # httpx 未公开连接池状态，取不到时只返回空
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"connections_open": len(connections), "connections_idle": idle,
+                "connections_in_use": len(connections) - idle}
+
+    def stats(self) -> Dict[str, Dict]:
+        out = {}
+        for model_id, s in self._stats.items():
+            entry = {
+                "requests": s.requests,
+                "in_flight": s.in_flight,
+                "max_in_flight": s.max_in_flight,
+                "connections_opened": s.connections_opened,
+                "errors": s.errors,
+                "avg_wait_ms": round(s.wait_total / s.requests * 1000, 2) if s.requests else 0.0,
+                "max_wait_ms": round(s.wait_max * 1000, 2),
+            }
+            client = self._clients.get(model_id)
+            if client is not None:
+                entry.update(self._connection_counts(client))
+            out[model_id] = entry
+        return out
+
+
+# ==========================================
+# 📊 供应商前缀缓存命中统计
+# ==========================================
+
+def cache_tokens(usage: Optional[Dict]) -> Optional[tuple]:
+    """
+    从响应的 usage 中取出 (命中 token, 未命中 token)。
+    DeepSeek 为 prompt_cache_hit_tokens / prompt_cache_miss_tokens，
+    OpenAI 兼容接口为 prompt_tokens_details.cached_tokens。都没有时返回 None。
+    """
+    if not usage:
+        return None
+    if "prompt_cache_hit_tokens" in usage or "prompt_cache_miss_tokens" in usage:
+        return usage.get("prompt_cache_hit_tokens", 0), usage.get("prompt_cache_miss_tokens", 0)
+    details = usage.get("prompt_tokens_details") or {}
+    if "cached_tokens" in details:
+        hit = details["cached_tokens"] or 0
+        return hit, max(usage.get("prompt_tokens", 0) - hit, 0)
+    return None
+
+
+class PromptCacheStats:
+    def __init__(self):
+        # {维度: {取值: [请求数, 命中 token, 未命中 token]}}
+        self._buckets: Dict[str, Dict[str, list]] = {}
+
+    def record(self, usage: Optional[Dict], **dims: Optional[str]):
+        tokens = cache_tokens(usage)
+        if tokens is None:
+            return
+        hit, miss = tokens
+        for dim, value in dims.items():
+            if value is None:
+                continue
+            bucket = self._buckets.setdefault(dim, {}).setdefault(value, [0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += hit
+            bucket[2] += miss
+
+    def stats(self) -> Dict[str, Dict]:
+        out = {}
+        for dim, values in self._buckets.items():
+            out[dim] = {
+                value: {
+                    "requests": n,
+                    "hit_tokens": hit,
+                    "miss_tokens": miss,
+                    "hit_rate": round(hit / (hit + miss), 4) if hit + miss else 0.0,
+                }
+                for value, (n, hit, miss) in values.items()
+            }
+        return out
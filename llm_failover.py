@@ -0,0 +1,208 @@
+"""
+llm_failover.py
+LLM 供应商容灾：按顺序降级 + 熔断 + 对冲请求
+
+逻辑：
+  - MODEL_REGISTRY 条目可配置 "fallbacks": [备用 model_id, ...]，按顺序尝试
+  - 每个供应商一个熔断器：最近 window 次调用中失败率或慢调用比例过高 → 熔断，
+    cooldown 秒内直接跳过；冷却结束后进入半开，只放行一个试探调用，
+    试探结果出来之前其余请求仍视为不可用；试探成功恢复，失败继续熔断
+  - 对冲（"hedge": {"enabled": True}）：主请求超过该供应商 p95 延迟仍未返回时，
+    向下一个可用供应商再发一份，先返回的胜出，另一份取消
+  - 所有供应商都失败 / 熔断时抛 LLMUnavailableError，由上层决定如何提示玩家
+    （不会再把"网络错误"当成 NPC 台词返回）
+
+对外接口：
+  LLMUnavailableError / ProviderError
+  ProviderRouter(registry)
+      .candidates(model_id)        → 当前可用的供应商顺序（已排除熔断中的）
+      .hedge_delay(model_id)       → 对冲等待秒数，未启用返回 None
+      .acquire(provider)           → 真正发请求前调用：None 表示被拒（熔断 / 试探名额已占），
+                                     True 表示本次是半开试探，False 表示普通调用
+      .record(provider, ok, latency, probe=False)
+      .release(provider)           → 试探调用被取消、没有结果时归还名额
+      .stats()                     → {provider: {...}}，供 /api/metrics 使用
+"""
+
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class LLMUnavailableError(Exception):
+    """所有供应商都不可用。"""
+
+
+class ProviderError(Exception):
+    """单个供应商调用失败（非 200、超时、连接错误等）。"""
+
+
+# 注册表条目未配置 "breaker" / "hedge" 时使用的默认值
+DEFAULT_BREAKER_CONFIG = {
+    "window": 20,               # 统计最近多少次调用
+    "min_calls": 5,             # 样本不足时不熔断
+    "error_rate": 0.5,          # 失败率超过此值熔断
+    "slow_call_seconds": 20.0,  # 超过此耗时算慢调用
+    "slow_rate": 0.8,           # 慢调用比例超过此值熔断
+    "cooldown": 30.0,           # 熔断持续秒数
+    "probe_timeout": 60.0,      # 半开试探超过此时间仍无结果，视为丢失，允许重新试探
+}
+
+DEFAULT_HEDGE_CONFIG = {
+    "enabled": False,
+    "quantile": 0.95,           # 以该分位延迟作为对冲等待时间
+    "min_delay": 2.0,           # 对冲等待的下限（秒），避免样本少时过早对冲
+    "min_samples": 10,
+}
+
+
+class CircuitBreaker:
+    def __init__(self, cfg: Dict):
+        self._cfg = cfg
+        self._calls: deque = deque(maxlen=cfg["window"])   # (ok, latency)
+        self.open_until = 0.0
+        self.trips = 0
+        self._probe_started: Optional[float] = None   # 半开试探开始时间
+
+    @property
+    def state(self) -> str:
+        if self.open_until == 0.0:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def _probe_in_flight(self) -> bool:
+        return (self._probe_started is not None
+                and time.monotonic() - self._probe_started < self._cfg["probe_timeout"])
+
+    def available(self) -> bool:
+        """只读判断，不占用试探名额。"""
+        state = self.state
+        if state == "half_open":
+            return not self._probe_in_flight()
+        return state == "closed"
+
+    def acquire(self) -> Optional[bool]:
+        """发请求前调用：None = 拒绝，True = 半开试探（唯一），False = 普通调用。"""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "open" or self._probe_in_flight():
+            return None
+        self._probe_started = time.monotonic()
+        return True
+
+    def release(self):
+        self._probe_started = None
+
+    def record(self, ok: bool, latency: float, probe: bool = False):
+        slow = latency >= self._cfg["slow_call_seconds"]
+        if probe:
+            # 冷却后的试探调用：成功就恢复，失败继续熔断
+            self._probe_started = None
+            if ok and not slow:
+                self.open_until = 0.0
+                self._calls.clear()
+            else:
+                self._trip()
+            return
+        if self.state != "closed":
+            # 熔断前发出、熔断后才返回的调用，不影响试探结果
+            return
+        self._calls.append((ok, latency))
+        n = len(self._calls)
+        if n < self._cfg["min_calls"]:
+            return
+        errors = sum(1 for c_ok, _ in self._calls if not c_ok)
+        slow_calls = sum(1 for _, lat in self._calls if lat >= self._cfg["slow_call_seconds"])
+        if errors / n > self._cfg["error_rate"] or slow_calls / n > self._cfg["slow_rate"]:
+            self._trip()
+
+    def _trip(self):
+        self.open_until = time.monotonic() + self._cfg["cooldown"]
+        self._calls.clear()
+        self.trips += 1
+
+
+class _ProviderStats:
+    __slots__ = ("breaker", "latencies", "ok", "failed")
+
+    def __init__(self, breaker_cfg: Dict):
+        self.breaker = CircuitBreaker(breaker_cfg)
+        self.latencies: deque = deque(maxlen=200)   # 成功调用的耗时，用于估算分位数
+        self.ok = 0
+        self.failed = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ProviderRouter:
+    def __init__(self, registry: Dict[str, Dict]):
+        self._registry = registry
+        self._providers: Dict[str, _ProviderStats] = {}
+        self.hedges = 0
+        self.failovers = 0
+
+    def _stats(self, provider: str) -> _ProviderStats:
+        s = self._providers.get(provider)
+        if s is None:
+            cfg = dict(DEFAULT_BREAKER_CONFIG)
+            cfg.update(self._registry.get(provider, {}).get("breaker", {}))
+            s = self._providers[provider] = _ProviderStats(cfg)
+        return s
+
+    def _hedge_config(self, model_id: str) -> Dict:
+        cfg = dict(DEFAULT_HEDGE_CONFIG)
+        cfg.update(self._registry.get(model_id, {}).get("hedge", {}))
+        return cfg
+
+    def candidates(self, model_id: str) -> List[str]:
+        chain = [model_id] + list(self._registry.get(model_id, {}).get("fallbacks", []))
+        seen, out = set(), []
+        for provider in chain:
+            if provider in seen or provider not in self._registry:
+                continue
+            seen.add(provider)
+            if self._stats(provider).breaker.available():
+                out.append(provider)
+        return out
+
+    def hedge_delay(self, model_id: str) -> Optional[float]:
+        cfg = self._hedge_config(model_id)
+        if not cfg["enabled"]:
+            return None
+        s = self._stats(model_id)
+        if len(s.latencies) < cfg["min_samples"]:
+            return max(cfg["min_delay"], DEFAULT_BREAKER_CONFIG["slow_call_seconds"] / 2)
+        return max(cfg["min_delay"], s.quantile(cfg["quantile"]))
+
+    def acquire(self, provider: str) -> Optional[bool]:
+        return self._stats(provider).breaker.acquire()
+
+    def release(self, provider: str):
+        self._stats(provider).breaker.release()
+
+    def record(self, provider: str, ok: bool, latency: float, probe: bool = False):
+        s = self._stats(provider)
+        if ok:
+            s.ok += 1
+            s.latencies.append(latency)
+        else:
+            s.failed += 1
+        s.breaker.record(ok, latency, probe)
+
+    def stats(self) -> Dict:
+        out = {"hedged_requests": self.hedges, "failovers": self.failovers, "providers": {}}
+        for provider, s in self._providers.items():
+            p95 = s.quantile(0.95)
+            out["providers"][provider] = {
+                "state": s.breaker.state,
+                "trips": s.breaker.trips,
+                "ok": s.ok,
+                "failed": s.failed,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+        return out
@@ -0,0 +1,142 @@
+"""
+llm_scheduler.py
+LLM 调用的并发上限 + 优先级调度（每个模型一个）
+
+逻辑：
+  - 每个 MODEL_REGISTRY 条目同时最多 max_in_flight 个上游请求，超出的排队
+  - 队列按优先级出队：talk > confront > tribunal > ending，同级先到先得
+  - 预留 interactive_reserve 个名额只给交互类调用（talk / confront），
+    公堂、结局这类长 prompt 请求再多也占不满，普通问话不会被堵住
+  - 统计：当前并发、队列深度、各优先级的排队次数与等待时长
+
+对外接口：
+  PRIORITIES                       → {purpose: 优先级}，数字越小越优先
+  LLMScheduler(registry)
+      async with .slot(model_id, purpose): ...   → 占用一个名额
+      .stats()                     → {model_id: {...}}，供 /api/metrics 使用
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+PRIORITIES = {"talk": 0, "confront": 1, "tribunal": 2, "ending": 3}
+DEFAULT_PRIORITY = 2          # 未标注用途的调用按公堂同级处理
+INTERACTIVE_PRIORITY = 1      # <= 此值的调用可以使用预留名额
+
+# 注册表条目未配置 "scheduler" 时使用的默认值
+DEFAULT_SCHEDULER_CONFIG = {
+    "max_in_flight": 8,
+    "interactive_reserve": 2,
+}
+
+
+class PriorityLimiter:
+    def __init__(self, max_in_flight: int, interactive_reserve: int = 0):
+        self.max_in_flight = max(1, max_in_flight)
+        # 预留名额不能把非交互调用的上限压到 0
+        self.heavy_limit = max(1, self.max_in_flight - interactive_reserve)
+        self.in_flight = 0
+        self._waiters: List = []          # 堆：(优先级, 序号, future)
+        self._seq = itertools.count()
+        self._wait_stats: Dict[int, List[float]] = {}   # 优先级 → [排队次数, 总等待, 最大等待]
+        self.peak_in_flight = 0
+        self.peak_queue = 0
+
+    def _limit(self, priority: int) -> int:
+        return self.max_in_flight if priority <= INTERACTIVE_PRIORITY else self.heavy_limit
+
+    def _take(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    async def acquire(self, priority: int):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._wake()
+        if fut.done():
+            # 有空闲名额，且没有更优先的调用在排队
+            return
+        self.peak_queue = max(self.peak_queue, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 名额已经交到手上才被取消：还回去
+                self.release()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            s = self._wait_stats.setdefault(priority, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += waited
+            s[2] = max(s[2], waited)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            priority, _, fut = self._waiters[0]
+            if fut.done():
+                # 排队期间已取消
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self._limit(priority):
+                # 队首是非交互调用且已到上限；更高优先级的不会排在它后面
+                break
+            heapq.heappop(self._waiters)
+            self._take()
+            fut.set_result(None)
+
+    def stats(self) -> Dict:
+        names = {v: k for k, v in PRIORITIES.items()}
+        waits = {}
+        for priority, (n, total, peak) in sorted(self._wait_stats.items()):
+            waits[names.get(priority, str(priority))] = {
+                "queued": n,
+                "avg_wait_ms": round(total / n * 1000, 2) if n else 0.0,
+                "max_wait_ms": round(peak * 1000, 2),
+            }
+        return {
+            "max_in_flight": self.max_in_flight,
+            "heavy_limit": self.heavy_limit,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "queue_depth": sum(1 for _, _, f in self._waiters if not f.done()),
+            "peak_queue_depth": self.peak_queue,
+            "waits": waits,
+        }
+
+
+class LLMScheduler:
+    def __init__(self, registry: Dict[str, Dict]):
+        self._registry = registry
+        self._limiters: Dict[str, PriorityLimiter] = {}
+
+    def _limiter(self, model_id: str) -> PriorityLimiter:
+        limiter = self._limiters.get(model_id)
+        if limiter is None:
+            cfg = dict(DEFAULT_SCHEDULER_CONFIG)
+            cfg.update(self._registry.get(model_id, {}).get("scheduler", {}))
+            limiter = self._limiters[model_id] = PriorityLimiter(
+                cfg["max_in_flight"], cfg["interactive_reserve"]
+            )
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, model_id: str, purpose: Optional[str] = None):
+        limiter = self._limiter(model_id)
+        await limiter.acquire(PRIORITIES.get(purpose, DEFAULT_PRIORITY))
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {model_id: limiter.stats() for model_id, limiter in self._limiters.items()}
@@ -0,0 +1,135 @@
+"""
+llm_stream.py
+NPC 回复的流式输出（Server-Sent Events）
+
+链路：
+  /chat/stream 为本次请求绑定一个 sink（asyncio.Queue，存于 contextvar）
+  → handler 照常调用 call_llm
+  → call_llm 发现当前上下文有 sink，就以 stream=True 请求供应商，
+    边收边用 ReplyFieldStreamer 从 JSON 片段中取出 reply 文本推入 sink
+  → /chat/stream 把 sink 中的文本作为 token 事件转发给前端，
+    handler 结束后再发一个 done 事件（完整 GameResponse）
+  → 供应商输出到一半失败、要换下一个供应商时，先往 sink 放 RESET，
+    前端收到 reset 事件后清掉已显示的半段回复
+
+handler 本身不需要知道自己是否在流式模式下运行。
+
+对外接口：
+  bind_sink(queue) / current_sink()   → 绑定 / 获取当前请求的输出队列
+  RESET                               → sink 中的哨兵：丢弃此前推送的正文
+  ReplyFieldStreamer(keys).feed(text) → 增量解析 {"reply": "..."}，返回新增的正文
+  iter_content_deltas(response, usage) → 逐个产出供应商 SSE 中的 delta.content
+  format_sse(event, data)             → 拼一条 SSE 消息
+"""
+
+import asyncio
+import contextvars
+import json
+import re
+from typing import AsyncIterator, Dict, Optional, Sequence
+
+RESET = object()
+
+_stream_sink: contextvars.ContextVar[Optional[asyncio.Queue]] = contextvars.ContextVar(
+    "llm_stream_sink", default=None
+)
+
+
+def bind_sink(queue: asyncio.Queue):
+    """在当前上下文（通常是一个独立 task）中绑定输出队列。"""
+    return _stream_sink.set(queue)
+
+
+def current_sink() -> Optional[asyncio.Queue]:
+    return _stream_sink.get()
+
+
+class ReplyFieldStreamer:
+    """
+    从逐块到达的 JSON 文本中，增量取出指定字符串字段的值。
+    NPC 对话为 {"reply": ...}，公堂为 {"focus_reply": ...}。
+    """
+
+    def __init__(self, keys: Sequence[str] = ("reply", "focus_reply")):
+        alt = "|".join(re.escape(k) for k in keys)
+        self._key_re = re.compile(r'"(?:%s)"\s*:\s*"' % alt)
+        self._buf = ""
+        self._pos = 0          # 值内下一个待解析字符的位置
+        self._in_value = False
+        self._done = False
+
+    def feed(self, text: str) -> str:
+        if self._done or not text:
+            return ""
+        self._buf += text
+        if not self._in_value:
+            m = self._key_re.search(self._buf)
+            if not m:
+                return ""
+            self._in_value = True
+            self._pos = m.end()
+        return self._drain()
+
+    def _drain(self) -> str:
+        out = []
+        buf, i, n = self._buf, self._pos, len(self._buf)
+        while i < n:
+            ch = buf[i]
+            if ch == '"':
+                self._done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # 转义序列：不完整时等下一块
+            if i + 1 >= n:
+                break
+            if buf[i + 1] == "u":
+                end = i + 6
+                if end > n:
+                    break
+                code = int(buf[i + 2:end], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # 高位代理，需要和后面的 \uXXXX 一起解码
+                    if end + 6 > n:
+                        break
+                    out.append(json.loads('"%s"' % buf[i:end + 6]))
+                    i = end + 6
+                else:
+                    out.append(chr(code))
+                    i = end
+                continue
+            out.append(json.loads('"%s"' % buf[i:i + 2]))
+            i += 2
+        self._pos = i
+        return "".join(out)
+
+
+async def iter_content_deltas(response, usage: Optional[Dict] = None) -> AsyncIterator[str]:
+    """
+    解析 OpenAI 兼容的 SSE 流，产出 choices[0].delta.content。
+    传入 usage 字典时，把最后一个 chunk 里的 usage（需 stream_options.include_usage）写进去。
+    """
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        if usage is not None and chunk.get("usage"):
+            usage.update(chunk["usage"])
+        choices = chunk.get("choices") or []
+        if choices:
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+def format_sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
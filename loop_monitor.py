@@ -0,0 +1,138 @@
+"""
+loop_monitor.py
+事件循环调度延迟监控
+
+整个服务是单个 asyncio 进程：拼 prompt、json.dumps、Fernet、zlib 这类 CPU 工作
+都在事件循环上执行，一次慢的就会推迟所有会话。一轮变慢时，用它区分是供应商慢还是自己的循环堵了。
+
+逻辑：
+  - 采样 task：每隔 interval 秒 sleep 一次，实际醒来时间比预期晚多少就是调度延迟，
+    记入直方图（累计次数 / 最大值 / 均值）
+  - 看门狗线程：采样 task 每次醒来更新心跳；心跳超过 stall_ms 没更新，说明循环正被某个
+    回调占着，此时直接抓事件循环线程的当前调用栈写日志（每次卡顿只抓一次）
+  与 blocking_io.BlockingCallDetector 互补：那边在回调结束后报耗时，这边在卡住的当下报调用栈。
+
+对外接口：
+  LoopLagMonitor(interval=0.25, stall_ms=250, keep=10)
+      await .start() / .stop()   → 在当前事件循环上启停采样 task 与看门狗线程
+      .stats()                   → 直方图、最大 / 平均延迟、最近几次卡顿的调用栈
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界（毫秒），最后一个桶收集更大的值
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+STACK_LINES = 30   # 卡顿时最多保留的调用栈行数
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.25, stall_ms: float = 250, keep: int = 10):
+        """
+        interval: 采样间隔（秒）
+        stall_ms: 心跳停滞多久视为卡顿并抓调用栈（毫秒）
+        keep:     保留最近几次卡顿记录
+        """
+        self.interval = interval
+        self.stall = stall_ms / 1000
+        self._counts: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self._samples = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._stalls = 0
+        self._recent_stalls: Deque[Dict] = deque(maxlen=keep)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- 启停 ----------
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample_loop(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._watchdog.join)
+        self._watchdog = None
+
+    # ---------- 采样 ----------
+
+    async def _sample_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self._record(max(0.0, loop.time() - expected))
+
+    def _record(self, lag: float):
+        ms = lag * 1000
+        for i, bound in enumerate(LAG_BUCKETS_MS):
+            if ms <= bound:
+                self._counts[i] += 1
+                break
+        else:
+            self._counts[-1] += 1
+        self._samples += 1
+        self._total += lag
+        self._max = max(self._max, lag)
+
+    # ---------- 看门狗 ----------
+
+    def _watch(self):
+        dumped_for = None   # 已经抓过栈的那次心跳，避免同一次卡顿重复记录
+        poll = min(self.interval, self.stall) / 2
+        while not self._stop.wait(poll):
+            beat = self._heartbeat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.stall or beat == dumped_for:
+                continue
+            dumped_for = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)[-STACK_LINES:]
+            self._stalls += 1
+            self._recent_stalls.append({"at": time.time(), "blocked_ms": round(blocked * 1000), "stack": stack})
+            logger.warning("事件循环已卡住 %.0f ms，当前调用栈：\n%s", blocked * 1000, "".join(stack))
+
+    # ---------- 指标 ----------
+
+    def stats(self) -> Dict:
+        labels = [f"<={b}ms" for b in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]}ms"]
+        return {
+            "enabled": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "stall_ms": self.stall * 1000,
+            "samples": self._samples,
+            "mean_lag_ms": round(self._total / self._samples * 1000, 2) if self._samples else 0.0,
+            "max_lag_ms": round(self._max * 1000, 1),
+            "histogram": dict(zip(labels, self._counts)),
+            "stalls": self._stalls,
+            "recent_stalls": list(self._recent_stalls),
+        }
@@ -1,23 +1,84 @@
 import os
 import json
+import asyncio
+import logging
+import time
 import uuid
+import hashlib
+import hmac
 import random
-from typing import Dict, Any, Optional, Set, List
-from fastapi import FastAPI, Header, HTTPException
-from fastapi.responses import FileResponse
+from typing import Dict, Any, Optional, Set, List, Tuple
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from cryptography.fernet import Fernet
-import httpx
 import uvicorn
-import zlib
+from contextlib import asynccontextmanager
 from npc_prompt_builder import build_npc_system_prompt
 import game_handlers
 from npc_exploration import run_npc_exploration
+from auth_registry import InviteRegistry
+from blocking_io import BlockingCallDetector, BlockingIOPool
+from loop_monitor import LoopLagMonitor
+from binding_store import BindingStore, create_backend
+from llm_client import LLMClientPool, PromptCacheStats
+from llm_cache import LLMResponseCache, SingleFlight
+from llm_scheduler import LLMScheduler
+from llm_failover import LLMUnavailableError, ProviderError, ProviderRouter
+from npc_registry import NpcProfileRegistry
+from session_store import SessionError, SessionStore, is_session_token
+from state_codec import StateCodecError
+import state_token
+from command_router import CommandRouter, parse_command
+from state_schema import StateSchemaError, new_game_state, upgrade as upgrade_state_schema
+from game_data import (
+    ALL_LOCATIONS, MAX_AP_PER_CYCLE, NPC_IDS, NPC_LIST, ROOM_DB, SOLUTION, TIME_CYCLES,
+    clue_catalog, objective_clues_db, state_registry_ids,
+)
+import llm_stream
 from dotenv import load_dotenv
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+# 阻塞 I/O（SQLite、文件）统一进有上限的线程池；事件循环上单次同步执行超过 BLOCKING_WARN_MS 记 warning
+io_pool = BlockingIOPool(max_workers=int(os.getenv("BLOCKING_IO_WORKERS", "8")))
+blocking_detector = BlockingCallDetector(float(os.getenv("BLOCKING_WARN_MS", "100")))
+
+# 事件循环调度延迟采样 + 卡顿时抓调用栈；LOOP_MONITOR=0 关闭
+loop_monitor = None
+if os.getenv("LOOP_MONITOR", "1") != "0":
+    loop_monitor = LoopLagMonitor(
+        interval=float(os.getenv("LOOP_MONITOR_INTERVAL", "0.25")),
+        stall_ms=float(os.getenv("LOOP_STALL_MS", "250")),
+    )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    io_pool.install(asyncio.get_running_loop())   # to_thread / run_in_executor(None) 也走这个池
+    await binding_store.start()
+    if session_store is not None:
+        await asyncio.to_thread(session_store.open)
+    await invite_registry.start()
+    await llm_pool.open()
+    await llm_cache.open()
+    await npc_registry.start()
+    blocking_detector.install()   # 启动 / 关闭阶段的同步加载不计入
+    if loop_monitor is not None:
+        await loop_monitor.start()
+    yield
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    blocking_detector.uninstall()
+    await npc_registry.stop()
+    await llm_pool.close()
+    llm_cache.close()
+    if session_store is not None:
+        session_store.close()
+    await invite_registry.stop()
+    await binding_store.stop()
+    io_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,32 +90,47 @@ app.add_middleware(
 # 🔐 核心鉴权逻辑：名单 + 绑定
 # ==========================================
 
-def load_allowed_tokens() -> Set[str]:
-    try:
-        with open("tokens.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return set(data.get("valid_tokens", []))
-    except (IOError, json.JSONDecodeError): return set()
+TOKENS_FILE = "tokens.json"
+BINDING_FILE = "token_bindings.json"               # JSON 绑定表（sqlite 后端首次启动时自动导入）
+BINDING_BACKEND = os.getenv("BINDING_BACKEND", "sqlite")   # sqlite（多 worker 安全，解绑用 python binding_store.py） / json（仅单进程）
+BINDING_DB_PATH = os.getenv("BINDING_DB_PATH", "token_bindings.db")
 
-BINDING_FILE = "token_bindings.json"
+# 设备绑定：后台批量写入；后端在 lifespan 里打开，import main 不会创建 / 迁移数据库
+binding_store = BindingStore(
+    lambda: create_backend(BINDING_BACKEND, BINDING_DB_PATH, legacy_json=BINDING_FILE)
+)
 
-def load_bindings() -> Dict[str, str]:
-    if not os.path.exists(BINDING_FILE): return {}
-    try:
-        with open(BINDING_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (IOError, json.JSONDecodeError): return {}
+# 名单常驻内存，仅在文件 mtime 变化时重新读取（最多每秒 stat 一次）
+invite_registry = InviteRegistry(
+    TOKENS_FILE, binding_store,
+    check_interval=float(os.getenv("AUTH_RELOAD_INTERVAL", "1.0"))
+)
+
+def load_allowed_tokens() -> Set[str]:
+    return invite_registry.valid_tokens()
 
-def save_binding(token: str, device_id: str):
-    bindings = load_bindings()
-    bindings[token] = device_id
-    with open(BINDING_FILE, "w", encoding="utf-8") as f:
-        json.dump(bindings, f)
+async def save_binding(token: str, device_id: str) -> str:
+    """写入绑定，返回最终生效的 device_id（并发时可能是另一个请求的）。"""
+    return await invite_registry.bind(token, device_id)
 
 SECRET_KEY = os.getenv("GAME_SECRET_KEY")
 if not SECRET_KEY:
     raise RuntimeError("❌ 请在 .env 中设置 GAME_SECRET_KEY，否则重启后所有存档失效！")
-cipher = Fernet(SECRET_KEY.encode())
+
+# 存档模式：token（默认，整份状态加密放在令牌里） / server（服务端存档，令牌只带会话ID+版本）
+# server 模式只支持单个 worker（见 session_store.py）；SQLite 与写入线程在 lifespan 里打开
+STATE_STORE = os.getenv("STATE_STORE", "token")
+session_store = None
+if STATE_STORE == "server":
+    session_store = SessionStore(
+        SECRET_KEY.encode(),
+        db_path=os.getenv("SESSION_DB_PATH", "sessions.db") or None,
+        max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "2048")),
+        ttl=float(os.getenv("SESSION_TTL", str(7 * 86400))),
+    )
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        logger.warning("STATE_STORE=server 只支持单个 worker，当前 WEB_CONCURRENCY=%s，"
+                       "其他 worker 可能读不到刚保存的存档", os.getenv("WEB_CONCURRENCY"))
 
 # ==========================================
 # 🤖 模型注册表
@@ -66,6 +142,19 @@ MODEL_REGISTRY = {
         "api_key_env": "DEEPSEEK_API_KEY",       # 从环境变量读取
         "model_name": "deepseek-chat",
         "supports_json_mode": True,               # 是否支持 response_format
+        "pool": {                                 # 长连接池配置（缺省见 llm_client.DEFAULT_POOL_CONFIG）
+            "max_connections": int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            "max_keepalive_connections": int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+            "keepalive_expiry": float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60")),
+            "http2": os.getenv("LLM_HTTP2", "0") == "1",
+        },
+        "scheduler": {                            # 并发上限与优先级调度（见 llm_scheduler）
+            "max_in_flight": int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+            "interactive_reserve": int(os.getenv("LLM_INTERACTIVE_RESERVE", "2")),
+        },
+        # 主供应商失败 / 熔断时依次尝试的备用条目（见 llm_failover），如 "LLM_FALLBACKS=openai"
+        "fallbacks": [m for m in os.getenv("LLM_FALLBACKS", "").split(",") if m],
+        "hedge": {"enabled": os.getenv("LLM_HEDGE", "0") == "1"},
     }
     #"grok": {
     #    "display_name": "Grok",
@@ -86,6 +175,26 @@ MODEL_REGISTRY = {
 
 DEFAULT_MODEL = "deepseek"
 
+# 每个模型一个常驻 httpx 客户端，启动时打开、关闭时释放
+llm_pool = LLMClientPool(MODEL_REGISTRY)
+prompt_cache_stats = PromptCacheStats()
+
+# 相同请求（模型 + system prompt + messages 完全一致）直接复用之前的回复
+# 按用途显式开启（如 LLM_CACHE_PURPOSES=ending），默认全部关闭；
+# LLM_CACHE_DB 指定文件时才启用 SQLite 二级缓存（lifespan 中打开），默认只用内存
+LLM_CACHE_PURPOSES = {p for p in os.getenv("LLM_CACHE_PURPOSES", "").split(",") if p}
+llm_cache = LLMResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+    db_path=os.getenv("LLM_CACHE_DB", "") or None,
+)
+# 双击 / 客户端重试导致的并发相同请求只发一次
+llm_single_flight = SingleFlight()
+# 每个模型的并发上限：talk > confront > tribunal > ending
+llm_scheduler = LLMScheduler(MODEL_REGISTRY)
+# 供应商降级顺序、熔断与对冲
+llm_router = ProviderRouter(MODEL_REGISTRY)
+
 def get_available_models():
     """返回已配置了API Key的可用模型列表"""
     available = []
@@ -98,598 +207,6 @@ def get_available_models():
             })
     return available
 
-
-# ==========================================
-# ⏳ 时间与地点配置
-# ==========================================
-TIME_CYCLES = ["子时", "丑时", "寅时", "卯时", "辰时", "巳时", "午时", "未时", "申时", "酉时", "戌时", "亥时"]
-MAX_AP_PER_CYCLE = 4  
-ALL_LOCATIONS = ["大堂", "后院", "灶房", "二楼走廊", "李德福房间", "赵虎房间", "顾琼房间", "韩子敬房间", "清虚子房间", "大堂侧屋"]
-
-# ==========================================
-# ⚖️ 核心谜底配置（GAME_TRUTH 已移除，真相由NPC JSON各自管理）
-# ==========================================
-SOLUTION = {
-    "killer_id": "npc_zhaohu",
-    "weapon_id": "clue_012",
-    "mastermind_id": "npc_lidefu"
-}
-
-# ==========================================
-# 🔍 核心线索库
-# ==========================================
-objective_clues_db = {
- 
-    # ── 后院·尸体 ─────────────────────────────────────────────
-    "clue_001": {
-        "id": "clue_001", "name": "死者尸体", "location": "后院",
-        "search_difficulty": 1,
-        "description": (
-            "张三死在后院废弃的【佛龛】前。颈部有极细的勒痕，深入皮肉。"
-            "死者双目圆睁，面容惊恐，双手呈'鹰爪'状僵硬，"
-            "似乎临死前曾猛力抓向某处。他的膝盖沾满新鲜泥土，"
-            "生前似乎正在跪拜礼佛。"
-        ),
-        "visible_condition": "none", "hidden": False
-    },
-    "clue_002": {
-        "id": "clue_002", "name": "颈部的勒痕", "location": "后院 (尸体)",
-        "search_difficulty": 1,
-        "description": (
-            "死者脖颈处有两道清晰的紫黑色勒痕，在咽喉处呈【X】形交叉，"
-            "深陷皮肉，力道极大。这种交叉手法能同时压迫颈动脉与喉骨，"
-            "死亡极为迅速。凶器极细，却韧性惊人。"
-        ),
-        "visible_condition": "inspect_corpse"
-    },
-    "clue_003": {
-        "id": "clue_003", "name": "死者手部", "location": "后院 (尸体)",
-        "search_difficulty": 1,
-        "description": (
-            "死者右手指甲缝有暗红血痕——他死前抓伤过凶手。"
-            "左手紧握成死拳，指骨处乌青淤紫，似乎死死攥着什么东西。"
-            "那只拳头……能掰开吗？"
-        ),
-        "visible_condition": "inspect_corpse"
-    },
-    "clue_003_new": {
-        "id": "clue_003_new", "name": "掌心压痕", "location": "后院 (尸体)",
-        "search_difficulty": 1,
-        "description": (
-            "【条件线索】费力掰开死者左拳后， 手掌中央有一个做工精美的鎏金指套，内侧刻着一个运字。似乎在什么地方看到过相似的东西？"
-            
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_004": {
-        "id": "clue_004", "name": "佛龛刮痕", "location": "后院",
-        "search_difficulty": 1,
-        "description": (
-            "木制佛龛底座边缘有数道新鲜刮痕，漆面剥落，木茬雪白。"
-            "像是被金属器物反复撬动过。佛龛底座与地面之间，"
-            "有一条隐约的缝隙……"
-        ),
-        "visible_condition": "inspect_shrine"
-    },
-    "clue_005": {
-        "id": "clue_005", "name": "混乱的足迹", "location": "后院",
-        "search_difficulty": 1,
-        "description": (
-            "湿软泥地上有三串足迹。\n"
-            "第一串：宽大深重，花纹粗糙，从后门直通佛龛。\n"
-            "第二串：细窄男靴，前深后浅、步幅小，在尸体旁短暂停留后慌乱折返大堂。\n"
-            "第三串：宽大深重，花纹粗糙，从佛龛处延伸后院中央，随后消失——"
-            "像是有人从墙上攀爬离开。"
-        ),
-        "visible_condition": "inspect_ground"
-    },
- 
-    # ── 各房间 ────────────────────────────────────────────────
-    "clue_006": {
-        "id": "clue_006", "name": "金疮药味", "location": "赵虎房",
-        "search_difficulty": 2,
-        "description": (
-            "房间里若有若无地飘着一股金创药的气味。"
-            "赵虎……近期受了伤？伤在哪里？"
-        ),
-        "visible_condition": "search_room"
-    },
-    "clue_007": {
-        "id": "clue_007", "name": "加密的绢帛底稿", "location": "李德福房",
-        "search_difficulty": 2,
-        "description": (
-            "藏在行李最深处的一卷绢帛，写满难以辨认的加密字符，"
-            "落款处有模糊的官方印鉴。旁边以蝇头小楷批注着几个字："
-            "【旧内侍】【查清】【清除】。"
-            "这是一道密旨——有人要杀人灭口。"
-        ),
-        "visible_condition": "search_room_hard"
-    },
-    "clue_008": {
-        "id": "clue_008", "name": "烧焦的手札残页", "location": "顾琼房",
-        "search_difficulty": 1,
-        "description": (
-            "火炉冷灰中有一片未烧尽的纸角，秀丽字迹，"
-            "隐约可见「复仇」二字，以及半个残缺的人名。"
-            "顾琼在此之前，经历过什么？"
-        ),
-        "visible_condition": "search_fireplace"
-    },
-    "clue_009": {
-        "id": "clue_009", "name": "被修改的星盘图", "location": "清虚子房",
-        "search_difficulty": 1,
-        "description": (
-            "桌上铺着一张复杂的星盘图，某些星位被浓墨重重涂改，墨迹尚新。"
-            "涂改的位置……对应的是今夜的天象。"
-            "清虚子在掩盖什么预言？"
-        ),
-        "visible_condition": "search_table"
-    },
-    "clue_010": {
-        "id": "clue_010", "name": "大堂桌椅", "location": "大堂",
-        "search_difficulty": 1,
-        "description": (
-            "几张桌子散乱摆放。靠窗那张是顾琼坐过的，桌上有一只茶盏。"
-            "柜台后方有一个上锁的小木柜，锁头看起来很新。"
-        ),
-        "visible_condition": "search_lobby"
-    },
-    "clue_010_new": {
-        "id": "clue_010_new", "name": "柜台锦袋", "location": "大堂",
-        "search_difficulty": 2,
-        "description": (
-            "柜台后方的小木柜里，压着一只空的【锦袋】。"
-            "袋口的流苏是宫廷样式，袋身绣着云纹，内里还残留着淡淡的龙涎香气。"
-            "这种香料只有内廷才用得起。"
-            "锦袋是空的——原本装着的东西已经不见了。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_011": {
-        "id": "clue_011", "name": "大堂茶盏", "location": "大堂",
-        "search_difficulty": 1,
-        "description": (
-            "顾琼桌上的茶碗稳稳立在正放的茶托上，看起来并无异样。"
-            "茶水已凉，碗沿有浅浅的口脂印记。"
-        ),
-        "visible_condition": "search_lobby_teacup"
-    },
-    "clue_012": {
-        "id": "clue_012", "name": "锦套内的乌金丝拂尘", "location": "李德福房",
-        "search_difficulty": 2,
-        "description": (
-            "【关键证物】枕头里藏着的锦套内，是一柄【金镶玉柄拂尘】。"
-            "拂尘比寻常的沉重许多——尘尾中藏着一根极细且坚硬，泛着金属光泽的丝线！"
-            "柄上的收线机关已经损坏，金属丝线无法缩回，微微外露。"
-            "柄身有裂纹，系被人大力使用后损坏。"
-            "柄底刻着小篆「运」字。这不是装饰品，是一件杀人的兵器。"
-        ),
-        "visible_condition": "search_room_hard"
-    },
-    "clue_013": {
-        "id": "clue_013", "name": "小二通铺", "location": "大堂侧屋",
-        "search_difficulty": 1,
-        "description": (
-            "张三的床铺凌乱，东西散落一地，明显被人翻找过。"
-            "床底灰尘中有一处长条形空白痕迹，长约三尺——"
-            "像是原本藏着什么细长的东西"
-        ),
-        "visible_condition": "search_room_zhang"
-    },
-    "clue_014": {
-        "id": "clue_014", "name": "未完全烧毁的男靴", "location": "灶房",
-        "search_difficulty": 1,
-        "description": (
-            "灶房炉膛里有东西没烧尽，还在冒黑烟。"
-            "掏出来是一双鞋型细长的靴子，靴底花纹是男式，"
-            "但内里竟是绸缎衬里，尺码偏小——穿这双靴子的人，"
-            "是个习惯乔装的女人。"
-        ),
-        "visible_condition": "search_room_kitchen"
-    },
-    "clue_015": {
-        "id": "clue_015", "name": "李德福房的覆托立盏", "location": "李德福房",
-        "search_difficulty": 1,
-        "description": (
-            "李德福自带的茶碗，底下的漆器茶托被底朝天扣在桌面上，"
-            "茶碗却四平八稳立在翻转的茶托底面上。"
-        ),
-        "visible_condition": "search_room_hard"
-    },
-    "clue_016": {
-        "id": "clue_016", "name": "顾琼衣柜", "location": "顾琼房",
-        "search_difficulty": 1,
-        "description": (
-            "衣柜里挂着几件便于行动的男式长衫，显然她路上惯于乔装。"
-            "奇怪的是，其中一套明显缺了配套的靴子——"
-            "那双靴子去哪了？"
-        ),
-        "visible_condition": "search_room_gu"
-    },
-    "clue_017": {
-        "id": "clue_017", "name": "泥泞的折扇", "location": "后院",
-        "search_difficulty": 1,
-        "description": (
-            "后门草丛里有一把折扇，扇面湿透沾满泥，"
-            "但扇骨是湘妃竹，颇为雅致。"
-            "扇面上题着半首诗：「朱门酒肉臭，路有……」"
-            "笔迹清秀，墨色被雨水晕开。这是谁的？"
-        ),
-        "visible_condition": "inspect_ground"
-    },
-    "clue_018": {
-        "id": "clue_018", "name": "烧残的诗稿", "location": "韩子敬房",
-        "search_difficulty": 1,
-        "description": (
-            "韩子敬房间的炭盆里，有一本没烧完的诗稿。"
-            "字里行间写满对圣人、对朝廷的愤懑不满——"
-            "这是要杀头的【反诗】。"
-            "难怪他见到李德福（宫里人）吓得脸色惨白。"
-        ),
-        "visible_condition": "search_room_han"
-    },
-    "clue_019": {
-        "id": "clue_019", "name": "木柄拂尘", "location": "后院",
-        "search_difficulty": 1,
-        "description": (
-            "尸体旁泥泞中掉落着一把【桃木柄拂尘】，沾满泥水。"
-            "这是道士清虚子的随身之物。"
-            "拂尘的马尾毛凌乱毛糙，似被人紧紧攥握过。"
-            "你扯了扯尘毛，几根轻飘飘地脱落——毛根处有些异常。"
-        ),
-        "visible_condition": "inspect_ground"
-    },
-    "clue_020": {
-        "id": "clue_020", "name": "老旧精美的荷包", "location": "清虚子房",
-        "search_difficulty": 2,
-        "description": (
-            "清虚子布袋里搜出一个刺绣荷包，款式极老，针法出自宫中，"
-            "绝非寻常道士所能拥有。"
-            "荷包内里绣着「运」字，里面只有几枚铜板和碎银。"
-            "这是谁的钱袋？「运」字……在哪里还见过？"
-        ),
-        "visible_condition": "search_room_qing"
-    },
- 
-    # ── 新增线索 ──────────────────────────────────────────────
-    "clue_021": {
-        "id": "clue_021", "name": "拂尘柄内的乌金丝残段", "location": "后院",
-        "search_difficulty": 2,
-        "description": (
-            "【条件线索·需光亮】借助充足的光线，仔细检查桃木拂尘的柄部——"
-            "木柄根部的马尾毛束中，混入了一根极细的金属丝，"
-            "泛着幽幽的乌光。这不是马毛。"
-            "它从哪里断下来的？"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_022": {
-        "id": "clue_022", "name": "佛龛底座暗槽", "location": "后院",
-        "search_difficulty": 2,
-        "description": (
-            "循着尸体的鎏金指套线索返回检查佛龛——"
-            "底座侧面有一道极细的缝隙，用力按压后弹开，"
-            "露出一个浅浅的暗槽。槽内壁有一处凹陷，很小，像是能放下什么首饰"
-            "像是环形物品收纳于此。"
-            "张三把什么藏在这里？"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_023": {
-        "id": "clue_023", "name": "尸体的体温", "location": "后院 (尸体)",
-        "search_difficulty": 1,
-        "description": (
-            "你将手覆上死者胸口——"
-            "尸身尚有残温，远未到完全僵硬的程度。"
-            "死亡时间约两个时辰前。"
-            "这说明：凶手就在驿站之中，现在还没走。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_024": {
-        "id": "clue_024", "name": "断裂的绑带", "location": "赵虎房",
-        "search_difficulty": 2,
-        "description": (
-            "【条件线索】搜查赵虎床铺底板缝隙，发现一截被撕断的布绑带，"
-            "布面有陈旧血迹，已经干透变黑。"
-            "这是包扎伤口用的——伤在什么部位，需要藏得这么深？"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_025": {
-        "id": "clue_025", "name": "「李福运」字条", "location": "大堂侧屋",
-        "search_difficulty": 2,
-        "description": (
-            "张三床铺木板夹缝中藏着一张折叠字条，"
-            "纸张已经被揉皱再展开过无数次。"
-            "字条上只有三个字：【李福运】。"
-            "下方有一行更小的字，几乎难以辨认：「若我死，此名可保命。」"
-            "张三……知道自己有危险。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_new_wall": {
-        "id": "clue_new_wall", "name": "二楼外墙划痕", "location": "二楼走廊",
-        "search_difficulty": 2,
-        "description": (
-            "检查二楼走廊外侧窗台——"
-            "窗框下沿和外墙砖面有数道新鲜划痕，还粘着泥土和细碎的青苔。"
-            "有人从这里翻出去，或者攀爬上来。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_li_finger": {
-        "id": "clue_li_finger", "name": "錾花金指套", "location": "大堂",
-        "search_difficulty": 2,
-        "description": (
-            "与李德福交谈时注意他的右手——"
-            "他惯于把玩一枚【錾花金指套】，套在拇指上。这枚指套似曾相识？"
-        ),
-        "visible_condition": "conditional"
-    },
- 
-    # ── 信任/高难度线索 ───────────────────────────────────────
-    "clue_026": {
-        "id": "clue_026", "name": "顾琼的家书", "location": "顾琼房",
-        "search_difficulty": 1,
-        "description": (
-            "顾琼主动递给你一封家书。"
-            "信中提及她的家族三年前死于一桩冤案，"
-            "主谋正是当时的掌印太监。"
-            "「我此行不是探亲，」她的字迹颤抖，「我要亲眼看着他死。」"
-        ),
-        "visible_condition": "trust_triggered"
-    },
-    "clue_027": {
-        "id": "clue_027", "name": "韩子敬的落榜文书", "location": "韩子敬房",
-        "search_difficulty": 2,
-        "description": (
-            "书页夹层中发现一张官府文书——"
-            "韩子敬此前已参加过两届春闱，皆以「文风不正」为由落榜。"
-            "主考官的批语：「狂悖之词，不堪大用。」"
-            "他的诗稿是反诗，也是他对整个科举制度的绝望控诉。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_028": {
-        "id": "clue_028", "name": "清虚子的度牒", "location": "清虚子房",
-        "search_difficulty": 2,
-        "description": (
-            "床铺底下压着一份道士度牒，"
-            "官方印鉴是真的，但姓名栏被人工涂改过。"
-            "他的真实身份不是道士——或者说，他不一直是道士。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_029": {
-        "id": "clue_029", "name": "清虚子的证词：拂尘是做法时遗落的", "location": "后院",
-        "search_difficulty": 1,
-        "description": (
-            "清虚子压低声音告诉你——"
-            "戌时前，张三请他在后院佛龛前做法消灾。"
-            "做完法事后清虚子回屋，忘记带走拂尘，遗落在佛龛旁。"
-            "「贫道的拂尘……是自己忘拿的，不是故意放在那里的！」"
-        ),
-        "visible_condition": "trust_triggered"
-    },
-    "clue_030": {
-        "id": "clue_030", "name": "李德福行李中的画像", "location": "李德福房",
-        "search_difficulty": 3,
-        "description": (
-            "行李夹层最深处藏着一张折叠画像——"
-            "画中人身着内侍官服，面容与张三有五分相似，"
-            "但眼神截然不同：画中人目光锐利，气度威严。"
-            "画像背面写着：「掌印太监李福运，先帝十二年。」"
-            "死者……是他。"
-        ),
-        "visible_condition": "conditional"
-    },
-    "clue_037_testimony": {
-        "id": "clue_037_testimony", "name": "韩子敬的脚步声证词", "location": "韩子敬房",
-        "search_difficulty": 1,
-        "description": (
-            "韩子敬颤抖着开口——"
-            "寅时前他出门去后院埋诗稿时，看到了尸体，"
-            "吓得拔腿就跑，折扇掉落都顾不上捡。"
-            "但他发誓，他出门之前（大约丑时），就已经听到过一阵沉重的脚步声"
-            "从走廊经过——那脚步声，不像是去如厕，更像是有目的地行动。"
-        ),
-        "visible_condition": "trust_triggered"
-    },
-}
-
-# ==========================================
-# 🏠 场景配置
-# ==========================================
-ROOM_DB = {
-    "后院": {
-        "name": "后院",
-        "atmosphere": "破败的佛龛，泥泞的地面，暴雨声盖过了一切。",
-        "furniture_list": [
-            "死者全身", "死者颈部", "死者手部", "死者左拳",
-            "佛龛", "佛龛底部", "泥地", "草丛", "尸体旁的泥泞"
-        ],
-        "furniture_map": {
-            "死者全身":     "clue_001",
-            "死者颈部":     "clue_002",
-            "死者手部":     "clue_003",
-            "死者左拳":     "clue_003_new",   # 条件：持有clue_003
-            "佛龛":         "clue_004",
-            "佛龛底部":     "clue_022",        # 条件：持有clue_021
-            "泥地":         "clue_005",
-            "草丛":         "clue_017",
-            "尸体旁的泥泞": "clue_019",
-        },
-        "conditional_furniture": {"死者左拳", "佛龛底部"},  # 前端渲染为◈按钮
-        "owner": None
-    },
- 
-    "灶房": {
-        "name": "灶房",
-        "atmosphere": "灰烬的焦味，柴火堆潮湿，有什么东西没烧干净。",
-        "furniture_list": ["炉膛", "水缸", "柴火堆"],
-        "furniture_map": {
-            "炉膛":   "clue_014",
-            "水缸":   None,
-            "柴火堆": None,
-        },
-        "owner": None
-    },
- 
-    "大堂": {
-        "name": "大堂",
-        "atmosphere": "油灯昏黄，雨水从破窗缝渗入，空气潮腻。",
-        "furniture_list": ["大堂桌椅", "顾琼的桌子", "柜台", "柜台后木柜", "角落"],
-        "furniture_map": {
-            "大堂桌椅":   "clue_010",
-            "顾琼的桌子": "clue_011",
-            "柜台":       None,
-            "柜台后木柜": "clue_010_new",   # 条件：持有clue_010
-            "角落":       None,
-        },
-        "conditional_furniture": {"柜台后木柜"},
-        "inspect_texts": {
-            "柜台": "柜台后方有一个上锁的小木柜，锁头看起来很新。也许值得仔细搜一搜。"
-        },
-        "owner": None
-    },
- 
-    "大堂侧屋": {
-        "name": "小二通铺",
-        "atmosphere": "杂乱的铺盖，东西散落一地，有人翻找过。",
-        "furniture_list": ["床铺", "床底", "枕头", "破衣柜", "床板夹缝"],
-        "furniture_map": {
-            "床铺":     None,
-            "床底":     "clue_013",
-            "枕头":     None,
-            "破衣柜":   None,
-            "床板夹缝": "clue_025",   # 条件：持有clue_007+020
-        },
-        "conditional_furniture": {"床板夹缝"},
-        "inspect_texts": {
-            "床铺":   "乱作一团，似乎被人翻过。",
-            "枕头":   "掉在地上，芯子被翻了出来。",
-            "破衣柜": "衣柜门敞开，里面乱七八糟，几件衣服掉在地上。",
-            "床底":   "床底积满灰尘，但有一处长条形空白——像是藏过什么细长的东西。",
-        },
-        "owner": None
-    },
- 
-    "李德福房间": {
-        "name": "李德福房间",
-        "atmosphere": "龙涎香气残存，被褥质地极好，处处透着宫廷习气。",
-        "furniture_list": ["行李", "行李夹层", "桌子", "床铺", "枕头"],
-        "furniture_map": {
-            "行李":     "clue_007",
-            "行李夹层": "clue_030",   # 条件：持有clue_007+025，难度5
-            "桌子":     "clue_015",
-            "床铺":     None,
-            "枕头":     "clue_012",
-        },
-        "conditional_furniture": {"行李夹层"},
-        "hidden_until": {"枕头": "床铺"},  # 枕头在检查床铺后才出现
-        "inspect_texts": {
-            "床铺": (
-                "被褥虽乱，但质地极好。你在被褥间摸索了一番，"
-                "除了残温外一无所获。不过这【枕头】看起来过于鼓囊，"
-                "里面像是塞了什么硬物。"
-            ),
-            "行李": "沉甸甸的行李，最外层是些寻常衣物。夹层深处似乎还有东西……",
-        },
-        "owner": "npc_lidefu"
-    },
- 
-    "赵虎房间": {
-        "name": "赵虎房间",
-        "atmosphere": "床铺硬实，药味若有若无，窗户关得严实。",
-        "furniture_list": ["桌上", "床边", "床底", "床板底缝"],
-        "furniture_map": {
-            "桌上":    "clue_006",
-            "床边":    None,
-            "床底":    None,
-            "床板底缝": "clue_024",   # 条件：持有clue_006，难度3
-        },
-        "conditional_furniture": {"床板底缝"},
-        "inspect_texts": {
-            "床底":    "床底积满灰尘，没有明显异物。但床板和地面之间……有条缝。",
-            "床边":    "床边放着一双靴子，靴底有新鲜的泥点。",
-        },
-        "owner": "npc_zhaohu"
-    },
- 
-    "顾琼房间": {
-        "name": "顾琼房间",
-        "atmosphere": "梳妆台上有佛珠，衣柜微开，淡淡的女子脂粉香。",
-        "furniture_list": ["衣柜", "火炉", "梳妆台"],
-        "furniture_map": {
-            "衣柜":   "clue_016",
-            "火炉":   "clue_008",
-            "梳妆台": None,
-        },
-        "inspect_texts": {
-            "梳妆台": "梳妆台上摆着一串佛珠和一面铜镜，没有其他异常。",
-        },
-        "owner": "npc_guqiong"
-    },
- 
-    "韩子敬房间": {
-        "name": "韩子敬房间",
-        "atmosphere": "墨香混着炭灰味，书卷叠了半桌，炭盆还有余温。",
-        "furniture_list": ["书桌", "炭盆", "书页夹层"],
-        "furniture_map": {
-            "炭盆":     "clue_018",
-            "书桌":     None,
-            "书页夹层": "clue_027",   # 条件：持有clue_018，难度2
-        },
-        "conditional_furniture": {"书页夹层"},
-        "inspect_texts": {
-            "书桌": "桌上摆着几本经义，翻开的那页用手指抠出了折痕。有一本书页间似乎夹着什么。",
-        },
-        "owner": "npc_hanzijing"
-    },
- 
-    "清虚子房间": {
-        "name": "清虚子房间",
-        "atmosphere": "符纸贴了满壁，药草香混着尘土，透着几分江湖气。",
-        "furniture_list": ["桌子", "布袋", "床铺", "床底"],
-        "furniture_map": {
-            "桌子": "clue_009",
-            "布袋": "clue_020",
-            "床铺": None,
-            "床底": "clue_028",   # 条件：持有clue_009，难度2
-        },
-        "conditional_furniture": {"床底"},
-        "inspect_texts": {
-            "床铺": "铺着旧棉被，有些潮。床底压着什么东西——边角露出一点。",
-        },
-        "owner": "npc_qingxuzi"
-    },
- 
-    "二楼走廊": {
-        "name": "二楼走廊",
-        "atmosphere": "走廊昏暗，窗外雨声如注，脚步声在此处格外清晰。",
-        "furniture_list": ["走廊窗台", "地面"],
-        "furniture_map": {
-            "走廊窗台": "clue_new_wall",   # 条件：持有clue_005+006
-            "地面":     None,
-        },
-        "conditional_furniture": {"走廊窗台"},
-        "inspect_texts": {
-            "地面":     "走廊地板有几处新鲜的泥脚印，来自楼下。",
-            "走廊窗台": "窗框紧闭，但窗台下沿……似乎有划痕。",
-        },
-        "owner": None
-    },
-}
-
-NPC_LIST = [
-    {"id": "npc_lidefu", "name": "李德福"},
-    {"id": "npc_zhaohu", "name": "赵虎"},
-    {"id": "npc_guqiong", "name": "顾琼"},
-    {"id": "npc_hanzijing", "name": "韩子敬"},
-    {"id": "npc_qingxuzi", "name": "清虚子"}
-]
-
 # ==========================================
 # 📡 数据模型
 # ==========================================
@@ -705,6 +222,7 @@ class GameRequest(BaseModel):
     npc_id: Optional[str] = None
     confront_clue_id: Optional[str] = None
     model_id: Optional[str] = None   # ← 玩家选择的模型
+    recall_version: Optional[str] = None   # 前端已缓存的回想内容版本（见 recall_system）
 
 class GameResponse(BaseModel):
     reply_text: str
@@ -714,6 +232,7 @@ class GameResponse(BaseModel):
     ui_options: List[UIAction] = []
     bg_image: Optional[str] = None
     status_info: Optional[Dict[str, Any]] = None
+    state_unchanged: bool = False   # 只读指令：new_encrypted_state 为空，客户端沿用当前令牌
 
 class VerifyRequest(BaseModel):
     token: str
@@ -722,84 +241,67 @@ class VerifyRequest(BaseModel):
 # ==========================================
 # 🔧 辅助函数
 # ==========================================
-def load_json(filename: str):
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+# 存档编码：STATE_CODEC=json（默认） / binary（state_codec，ID 换成小整数，体积更小）
+# 两种格式解码时都能识别。binary 的 ID 下标来自 append-only 注册表文件，新增线索 / NPC / 房间后
+# 运行 python state_codec.py 追加新代号，旧存档照样能解
+state_tokens = state_token.from_env()
 
-def decrypt_state(token: str) -> Dict:
+_unregistered = state_tokens.registry.missing(**state_registry_ids())
+if _unregistered:
+    logger.warning("⚠️ 存档注册表缺少以下 ID（binary 存档会把它们放进 JSON extras），请运行 python state_codec.py：%s",
+                   _unregistered)
+
+class StateLoadError(Exception):
+    """令牌格式可识别，但存档取不回来（服务端存档过期 / 不存在、存档编码或版本无法识别等）。不能当成新开局处理。"""
+
+def load_state(token: str) -> Tuple[Dict, bool]:
+    """返回 (state, 是否解出了有效令牌)；令牌为空或无法解密时开新局，存档取不回来 / 解不开时抛 StateLoadError。"""
     if not token:
-        initial_npc_locations = {npc['id']: random.choice(ALL_LOCATIONS) for npc in NPC_LIST}
-        initial_npc_locations["npc_lidefu"] = "李德福房间"
-        return {
-            "player_name": "李密卫",
-            "dynamic_state": {
-                "day": 1,
-                "current_location": "大堂",
-                "time_idx": 4,
-                "ap_used_this_cycle": 0, 
-                "inventory": {"clues_collected": []},
-                "npc_locations": initial_npc_locations,
-                "game_over": False,
-                "temp_accuse_target": None,
-                "conversation_history": {},
-                "confrontation_used": {},
-                "npc_activities": {
-                    npc['id']: {"discovered": [], "theory": "", "last_action": ""}
-                    for npc in NPC_LIST
-                },
-                "tribunal_count": 0,
-                "inferences_unlocked": [],
-                "trust_clues_triggered": [],
-                "npc_statements": {},
-                "npc_trust": {
-                    "npc_lidefu": 30,     # 李德福天生对玩家警惕
-                    "npc_zhaohu": 20,     # 赵虎把玩家当威胁
-                    "npc_guqiong": 10,    # 顾琼敌视官差
-                    "npc_hanzijing": 40,  # 韩子敬胆小但无恶意
-                    "npc_qingxuzi": 45    # 清虚子想利用玩家洗清嫌疑
-                }
-            }
-        }
-    try:
-        decrypted = cipher.decrypt(token.encode())
+        return new_game_state(NPC_IDS, ALL_LOCATIONS), False
+    if is_session_token(token):
+        if session_store is None:
+            raise StateLoadError("服务端存档未开启（STATE_STORE 不是 server）")
         try:
-            raw = zlib.decompress(decrypted)
-        except zlib.error:
-            raw = decrypted  # 兼容旧的未压缩 state
-        state = json.loads(raw.decode())
-        if "day" not in state["dynamic_state"]: state["dynamic_state"]["day"] = 1
-        if "game_over" not in state["dynamic_state"]: state["dynamic_state"]["game_over"] = False
-        if "conversation_history" not in state["dynamic_state"]: state["dynamic_state"]["conversation_history"] = {}
-        if "confrontation_used" not in state["dynamic_state"]: state["dynamic_state"]["confrontation_used"] = {}
-        if "npc_activities" not in state["dynamic_state"]:
-            state["dynamic_state"]["npc_activities"] = {
-                npc['id']: {"discovered": [], "theory": "", "last_action": ""}
-                for npc in NPC_LIST
-            }
-        if "npc_trust" not in state["dynamic_state"]:
-            state["dynamic_state"]["npc_trust"] = {
-                "npc_lidefu": 30, "npc_zhaohu": 20, "npc_guqiong": 10,
-                "npc_hanzijing": 40, "npc_qingxuzi": 45
-            }
-        if "tribunal_count" not in state["dynamic_state"]:
-            state["dynamic_state"]["tribunal_count"] = 0
-        if "inferences_unlocked" not in state["dynamic_state"]:
-            state["dynamic_state"]["inferences_unlocked"] = []
-        if "trust_clues_triggered" not in state["dynamic_state"]:
-            state["dynamic_state"]["trust_clues_triggered"] = []
-        if "npc_statements" not in state["dynamic_state"]:
-            state["dynamic_state"]["npc_statements"] = {}
-        return state
+            session_id, version, raw = session_store.load(token)
+        except SessionError as e:
+            raise StateLoadError(str(e)) from e
+    try:
+        if is_session_token(token):
+            state = state_tokens.deserialize(raw)
+            state["_session"] = {"id": session_id, "version": version}
+        else:
+            state = state_tokens.deserialize(state_tokens.decrypt(token))
+        upgrade_state_schema(state, NPC_IDS)
+        return state, True
+    except StateCodecError as e:
+        # 令牌本身是真的，只是存档编码认不出来：开新局等于悄悄清空玩家进度
+        logger.error("❌ 存档解码失败：%s", e)
+        raise StateLoadError(str(e)) from e
+    except StateSchemaError as e:
+        # 存档版本比代码新（例如回滚部署后遇到新版本令牌）：同样不能开新局
+        logger.error("❌ 存档版本无法识别：%s", e)
+        raise StateLoadError(str(e)) from e
     except Exception:
-        return decrypt_state(None)
+        return new_game_state(NPC_IDS, ALL_LOCATIONS), False
+
+def decrypt_state(token: str) -> Dict:
+    return load_state(token)[0]
+
+async def load_state_async(token: str) -> Tuple[Dict, bool]:
+    """请求路径用：服务端存档可能要查 SQLite，放到线程池里读。"""
+    if session_store is not None and is_session_token(token):
+        return await io_pool.run(load_state, token)
+    return load_state(token)
 
 def encrypt_state(state: Dict) -> str:
-    raw = json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode()
-    compressed = zlib.compress(raw)
-    return cipher.encrypt(compressed).decode()
+    raw = state_tokens.serialize(state)
+    if session_store is not None:
+        session = state.get("_session") or {}
+        token = session_store.save(session.get("id"), session.get("version", 0), raw)
+        _, session_id, version, _ = token.split(".")
+        state["_session"] = {"id": session_id, "version": int(version)}
+        return token
+    return state_tokens.encrypt(raw)
 
 def advance_time(global_state: Dict):
     if "dynamic_state" in global_state:
@@ -828,9 +330,11 @@ def advance_time(global_state: Dict):
         pending_trust_clues = get_trust_triggered_clues(d_state, current_time)
         if pending_trust_clues:
             # 存入 pending_trust_clues，前端下次请求时会带回给玩家
-            existing = d_state.setdefault("pending_trust_clues", [])
+            existing = d_state["pending_trust_clues"]
+            existing_ids = {x["clue_id"] for x in existing}
             for tc in pending_trust_clues:
-                if tc["clue_id"] not in [x["clue_id"] for x in existing]:
+                if tc["clue_id"] not in existing_ids:
+                    existing_ids.add(tc["clue_id"])
                     existing.append({
                         "clue_id": tc["clue_id"],
                         "npc_id": tc["npc_id"],
@@ -905,8 +409,8 @@ def check_auto_trigger_endgame(state: Dict) -> bool:
 # ==========================================
 # 🎭 NPC对话辅助函数（新增）
 # ==========================================
-def load_npc_profile(npc_id: str):
-    """根据NPC ID加载对应的Profile JSON文件。"""
+def _npc_profile_path(npc_id: str) -> str:
+    """NPC ID → Profile JSON 文件路径。"""
     file_base = npc_id.replace('npc_', '').title()
     base_map = {
         "Lidefu": "LiDefu", "Zhaohu": "ZhaoHu", "Guqiong": "GuQiong",
@@ -916,20 +420,141 @@ def load_npc_profile(npc_id: str):
     npc_filename = f"NPC_Profiles/{file_base}_Profile.json"
     if not os.path.exists(npc_filename):
         npc_filename = f"{file_base}_Profile.json"
-    if os.path.exists(npc_filename):
-        return load_json(npc_filename)
-    return None
+    return npc_filename
 
-async def call_llm(system_prompt: str, messages: list, model_id: str = None) -> str:
-    """根据 model_id 调用对应的 LLM。"""
-    model_id = model_id or DEFAULT_MODEL
-    config = MODEL_REGISTRY.get(model_id)
-    if not config:
-        return f"不支持的模型：{model_id}"
+# 档案启动时加载进内存，文件改动后后台热更新，请求路径不读磁盘
+npc_registry = NpcProfileRegistry(
+    {npc["id"]: _npc_profile_path(npc["id"]) for npc in NPC_LIST},
+    check_interval=float(os.getenv("NPC_PROFILE_RELOAD_INTERVAL", "2.0")),
+)
 
+def load_npc_profile(npc_id: str):
+    """根据NPC ID取对应的Profile（内存注册表，只读）。"""
+    return npc_registry.get(npc_id)
+
+def _extract_reply(content: str) -> str:
+    """从模型返回的文本中取出 reply 字段（兼容非 JSON / markdown 包裹等情况）。"""
+    if not content or not content.strip():
+        return "（沉默不语）"
+    # 尝试解析 JSON，失败则直接返回原文
+    try:
+        parsed = json.loads(content)
+        if isinstance(parsed, dict):
+            reply = parsed.get("reply", "")
+            return reply if reply else content
+        return content
+    except json.JSONDecodeError:
+        # 清理残留的 JSON 标记
+        cleaned = content.strip()
+        # 去掉 markdown 代码块包裹
+        if cleaned.startswith('```'):
+            cleaned = cleaned.split('\n', 1)[-1] if '\n' in cleaned else cleaned[3:]
+            if cleaned.endswith('```'):
+                cleaned = cleaned[:-3]
+            cleaned = cleaned.strip()
+            # 再尝试解析一次
+            try:
+                parsed = json.loads(cleaned)
+                if isinstance(parsed, dict):
+                    reply = parsed.get("reply", "")
+                    return reply if reply else cleaned
+            except json.JSONDecodeError:
+                pass
+        # 尝试去掉常见的 JSON 前缀残留
+        for prefix in ['{"reply":', '{"reply" :', 'reply:']:
+            if cleaned.startswith(prefix):
+                cleaned = cleaned[len(prefix):].strip()
+                # 去首尾引号和大括号
+                if cleaned.startswith('"') and '"' in cleaned[1:]:
+                    cleaned = cleaned[1:cleaned.rindex('"')]
+                elif cleaned.endswith('}'):
+                    cleaned = cleaned[:-1].strip().strip('"')
+                cleaned = cleaned.replace('\\n', '\n').replace('\\"', '"')
+                return cleaned if cleaned else content
+        return content
+
+async def call_llm(system_prompt: str, messages: list, model_id: str = None,
+                   purpose: str = None, npc_id: str = None) -> str:
+    """
+    根据 model_id 调用对应的 LLM（复用 llm_pool 中的长连接）。
+    purpose / npc_id 用于统计（如 "talk" / "confront" / "tribunal" / "ending"），
+    purpose 在 LLM_CACHE_PURPOSES 中的调用会走响应缓存。
+    """
+    model_id = model_id or DEFAULT_MODEL
+    key = llm_cache.make_key(model_id, system_prompt, messages)
+    sink = llm_stream.current_sink()
+    use_cache = purpose in LLM_CACHE_PURPOSES
+    if use_cache:
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            if sink is not None:
+                sink.put_nowait(cached)
+            return cached
+
+    async def fetch():
+        reply = await _request_llm(messages, model_id, purpose, npc_id)
+        if use_cache:
+            await llm_cache.put(key, reply)
+        return reply
+
+    reply, leader = await llm_single_flight.do(key, fetch)
+    if not leader and sink is not None:
+        # 合并进来的请求没有收到增量，一次性补发完整回复
+        sink.put_nowait(reply)
+    return reply
+
+async def _request_llm(messages: list, model_id: str, purpose: str, npc_id: str) -> str:
+    """
+    按 llm_router 给出的顺序请求供应商（失败自动降级，可选对冲），返回回复文本。
+    全部失败时抛 LLMUnavailableError。
+    """
+    providers = llm_router.candidates(model_id)
+    if not providers:
+        raise LLMUnavailableError(f"模型 {model_id} 暂无可用的供应商")
+    # 流式输出只能有一个来源，对冲只用于普通请求
+    hedge_delay = llm_router.hedge_delay(model_id) if llm_stream.current_sink() is None else None
+
+    errors = []
+    pending = set()
+    next_idx = 0
+
+    def launch():
+        nonlocal next_idx
+        provider = providers[next_idx]
+        next_idx += 1
+        pending.add(asyncio.create_task(_attempt_provider(provider, messages, purpose, npc_id)))
+
+    launch()
+    try:
+        while pending:
+            can_hedge = hedge_delay is not None and next_idx < len(providers)
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay if can_hedge else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # 主请求慢于 p95：向下一个供应商再发一份，谁先回来用谁
+                llm_router.hedges += 1
+                hedge_delay = None
+                launch()
+                continue
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                errors.append(str(task.exception()))
+            if not pending and next_idx < len(providers):
+                llm_router.failovers += 1
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise LLMUnavailableError("；".join(errors))
+
+async def _attempt_provider(provider: str, messages: list, purpose: str, npc_id: str) -> str:
+    """向单个供应商发一次请求，结果计入熔断统计。失败抛 ProviderError。"""
+    config = MODEL_REGISTRY[provider]
     api_key = os.getenv(config["api_key_env"], "")
     if not api_key:
-        return f"模型 {config['display_name']} 未配置 API Key"
+        raise ProviderError(f"模型 {config['display_name']} 未配置 API Key")
 
     request_body = {
         "model": config["model_name"],
@@ -939,70 +564,82 @@ async def call_llm(system_prompt: str, messages: list, model_id: str = None) ->
     if config.get("supports_json_mode"):
         request_body["response_format"] = {"type": "json_object"}
 
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    dims = {"model": provider, "npc": npc_id, "purpose": purpose}
+    async with llm_scheduler.slot(provider, purpose):
+        # 半开状态只放行一个试探调用；排队期间熔断状态可能已变化，所以在拿到 slot 之后判断
+        probe = llm_router.acquire(provider)
+        if probe is None:
+            raise ProviderError(f"{config['display_name']} 熔断中")
+        started = time.perf_counter()
+        try:
+            # /chat/stream 请求：边生成边把 reply 正文推给前端
+            sink = llm_stream.current_sink()
+            if sink is not None:
+                reply = await _call_llm_streaming(provider, config, headers, request_body, sink, dims)
+            else:
+                reply = await _post_llm(provider, config, headers, request_body, dims)
+        except asyncio.CancelledError:
+            # 对冲落败被取消，不算供应商故障；试探名额还回去
+            if probe:
+                llm_router.release(provider)
+            raise
+        except Exception as e:
+            llm_router.record(provider, False, time.perf_counter() - started, probe)
+            if isinstance(e, ProviderError):
+                raise
+            raise ProviderError(f"{config['display_name']} 网络错误: {e}") from e
+        llm_router.record(provider, True, time.perf_counter() - started, probe)
+        return reply
+
+async def _post_llm(model_id: str, config: Dict, headers: Dict, request_body: Dict, dims: Dict) -> str:
+    """普通（非流式）调用供应商。"""
+    resp = await llm_pool.post(model_id, config["api_url"], headers=headers, json=request_body)
+    if resp.status_code != 200:
+        raise ProviderError(f"{config['display_name']} 调用失败 ({resp.status_code}): {resp.text[:200]}")
+    data = resp.json()
+    prompt_cache_stats.record(data.get("usage"), **dims)
+    return _extract_reply(data['choices'][0]['message']['content'])
+
+async def _call_llm_streaming(model_id: str, config: Dict, headers: Dict,
+                             request_body: Dict, sink: asyncio.Queue, dims: Dict) -> str:
+    """stream=True 调用供应商；正文增量推入 sink，返回完整回复。"""
+    request_body = dict(request_body, stream=True, stream_options={"include_usage": True})
+    extractor = llm_stream.ReplyFieldStreamer()
+    parts = []
+    usage = {}
+    emitted = False
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                config["api_url"],
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json=request_body,
-                timeout=30.0
-            )
-        if resp.status_code == 200:
-            content = resp.json()['choices'][0]['message']['content']
-            if not content or not content.strip():
-                return "（沉默不语）"
-            # 尝试解析 JSON，失败则直接返回原文
-            try:
-                parsed = json.loads(content)
-                if isinstance(parsed, dict):
-                    reply = parsed.get("reply", "")
-                    return reply if reply else content
-                return content
-            except json.JSONDecodeError:
-                # 清理残留的 JSON 标记
-                cleaned = content.strip()
-                # 去掉 markdown 代码块包裹
-                if cleaned.startswith('```'):
-                    cleaned = cleaned.split('\n', 1)[-1] if '\n' in cleaned else cleaned[3:]
-                    if cleaned.endswith('```'):
-                        cleaned = cleaned[:-3]
-                    cleaned = cleaned.strip()
-                    # 再尝试解析一次
-                    try:
-                        parsed = json.loads(cleaned)
-                        if isinstance(parsed, dict):
-                            reply = parsed.get("reply", "")
-                            return reply if reply else cleaned
-                    except json.JSONDecodeError:
-                        pass
-                # 尝试去掉常见的 JSON 前缀残留
-                for prefix in ['{"reply":', '{"reply" :', 'reply:']:
-                    if cleaned.startswith(prefix):
-                        cleaned = cleaned[len(prefix):].strip()
-                        # 去首尾引号和大括号
-                        if cleaned.startswith('"') and '"' in cleaned[1:]:
-                            cleaned = cleaned[1:cleaned.rindex('"')]
-                        elif cleaned.endswith('}'):
-                            cleaned = cleaned[:-1].strip().strip('"')
-                        cleaned = cleaned.replace('\\n', '\n').replace('\\"', '"')
-                        return cleaned if cleaned else content
-                return content
-        else:
-            return f"模型调用失败 ({resp.status_code}): {resp.text[:200]}"
-    except Exception as e:
-        return f"网络错误: {str(e)}"
+        async with llm_pool.stream(model_id, config["api_url"], headers=headers, json=request_body) as resp:
+            if resp.status_code != 200:
+                body = (await resp.aread()).decode(errors="replace")
+                raise ProviderError(f"{config['display_name']} 调用失败 ({resp.status_code}): {body[:200]}")
+            async for delta in llm_stream.iter_content_deltas(resp, usage):
+                parts.append(delta)
+                text = extractor.feed(delta)
+                if text:
+                    sink.put_nowait(text)
+                    emitted = True
+    except Exception:
+        if emitted:
+            # 已推送了半段回复：让前端清掉，降级后的供应商会从头重新推送
+            sink.put_nowait(llm_stream.RESET)
+        raise
+    prompt_cache_stats.record(usage, **dims)
+    return _extract_reply("".join(parts))
 
 def get_npc_history(state: Dict, npc_id: str) -> list:
     """获取指定NPC的对话历史。"""
-    conv = state["dynamic_state"].setdefault("conversation_history", {})
+    conv = state["dynamic_state"]["conversation_history"]
     return conv.setdefault(npc_id, [])
 
 def save_npc_history(state: Dict, npc_id: str, user_msg: str, assistant_msg: str):
     """保存一轮对话到NPC历史，并限制长度。"""
-    conv = state["dynamic_state"].setdefault("conversation_history", {})
+    conv = state["dynamic_state"]["conversation_history"]
     history = conv.setdefault(npc_id, [])
     history.append({"role": "user", "content": user_msg})
     history.append({"role": "assistant", "content": assistant_msg})
@@ -1027,11 +664,9 @@ async def read_root():
 
 @app.post("/verify_token")
 async def verify_token(req: VerifyRequest):
-    valid_tokens = load_allowed_tokens()
-    if req.token not in valid_tokens:
+    if not invite_registry.is_valid(req.token):
         raise HTTPException(status_code=401, detail="无效的邀请码")
-    bindings = load_bindings()
-    existing_device = bindings.get(req.token)
+    existing_device = await invite_registry.lookup_binding(req.token)
     if existing_device:
         if req.device_id == existing_device:
             return {"status": "valid", "device_id": existing_device}
@@ -1039,17 +674,104 @@ async def verify_token(req: VerifyRequest):
             raise HTTPException(status_code=403, detail="此邀请码已绑定其他设备，无法使用")
     else:
         new_device_id = str(uuid.uuid4())
-        save_binding(req.token, new_device_id)
-        return {"status": "bound", "device_id": new_device_id}
+        bound_device = await save_binding(req.token, new_device_id)
+        if bound_device != new_device_id and bound_device != req.device_id:
+            # 并发绑定中输给了另一台设备
+            raise HTTPException(status_code=403, detail="此邀请码已绑定其他设备，无法使用")
+        return {"status": "bound" if bound_device == new_device_id else "valid", "device_id": bound_device}
 
 # 返回可用模型列表（前端用来渲染选择器）
 @app.get("/api/models")
-async def list_models():
-    return {"models": get_available_models(), "default": DEFAULT_MODEL}
+async def list_models(response: Response):
+    # 前端启动时必取、每次都回源校验：manifest_version 从这里拿，不能被浏览器缓存
+    response.headers["Cache-Control"] = "no-cache"
+    return {"models": get_available_models(), "default": DEFAULT_MODEL,
+            "manifest_version": get_manifest()[0]["version"]}
+
+# 静态游戏数据：NPC、房间、问话 / 对质 / 搜查 / 指认菜单（与存档无关）
+# 前端启动时取一次，之后这些菜单在本地渲染，不再走 /chat
+# version 是内容哈希，当前值随 /api/models 下发（该接口每次回源）；
+# 带 ?v=<当前版本> 的地址内容永不变，可永久缓存；其余情况每次按 ETag 协商（304）
+_manifest: Optional[Tuple[Dict[str, Any], bytes]] = None
+
+def get_manifest() -> Tuple[Dict[str, Any], bytes]:
+    """返回 (manifest, 序列化后的 JSON)，首次调用时生成。"""
+    global _manifest
+    if _manifest is None:
+        content = {
+            "npcs": NPC_LIST,
+            "rooms": [{"id": key, "name": room["name"]} for key, room in ROOM_DB.items()],
+            "menus": {
+                verb: {**menu, "ui_options": [o.model_dump() for o in menu["ui_options"]]}
+                for verb, menu in ((v, game_handlers.build_static_menu(v)) for v in game_handlers.STATIC_MENUS)
+            },
+            "time_cycles": TIME_CYCLES,
+            "max_energy": MAX_AP_PER_CYCLE,
+        }
+        digest = hashlib.sha256(json.dumps(content, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        manifest = {"version": digest.hexdigest()[:16], **content}
+        _manifest = (manifest, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+    return _manifest
+
+@app.get("/api/manifest")
+async def game_manifest(
+    v: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
+    manifest, body = get_manifest()
+    etag = f'"{manifest["version"]}"'
+    if v == manifest["version"]:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        # 没带版本，或带的是旧版本 / 其他 worker 的新版本：内容不能和这个地址绑死
+        cache_control = "no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if if_none_match and etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# 运行指标（连接池等）：含事件循环卡顿时的调用栈和源码路径，不对外公开。
+# 设置了 METRICS_TOKEN 时凭 X-Metrics-Token 访问，否则只允许本机直连
+# （带 X-Forwarded-For / X-Real-IP 的请求来自反向代理，即使对端是 127.0.0.1 也不算本机）
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+_LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def check_metrics_access(request: Request, token: Optional[str]):
+    if METRICS_TOKEN:
+        if not token or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="无权查看运行指标")
+    elif (request.client is None or request.client.host not in _LOCAL_HOSTS
+          or "x-forwarded-for" in request.headers or "x-real-ip" in request.headers):
+        raise HTTPException(status_code=403, detail="运行指标仅限本机访问（或设置 METRICS_TOKEN）")
+
+@app.get("/api/metrics")
+async def metrics(request: Request, x_metrics_token: Optional[str] = Header(None, alias="X-Metrics-Token")):
+    check_metrics_access(request, x_metrics_token)
+    return {
+        "llm_pools": llm_pool.stats(),
+        "prompt_cache": prompt_cache_stats.stats(),
+        "response_cache": llm_cache.stats(),
+        "coalescing": llm_single_flight.stats(),
+        "scheduler": llm_scheduler.stats(),
+        "providers": llm_router.stats(),
+        "sessions": session_store.stats() if session_store is not None else None,
+        "npc_profiles": npc_registry.stats(),
+        "blocking_io": io_pool.stats(),
+        "blocking_calls": blocking_detector.stats(),
+        "loop_lag": loop_monitor.stats() if loop_monitor is not None else None,
+    }
 
 # ==========================================
 # 🚀 核心聊天接口
 # ==========================================
+async def check_access(x_access_token: str, x_device_id: str):
+    """邀请码 + 设备绑定校验，失败直接抛 HTTPException。"""
+    if not invite_registry.is_valid(x_access_token):
+        raise HTTPException(status_code=401, detail="邀请码无效")
+    bound_device = await invite_registry.lookup_binding(x_access_token)
+    if not bound_device or bound_device != x_device_id:
+        raise HTTPException(status_code=403, detail="设备校验失败，请勿分享邀请码")
+
 @app.post("/chat", response_model=GameResponse)
 async def chat_endpoint(
     request: GameRequest, 
@@ -1058,29 +780,86 @@ async def chat_endpoint(
    
 ):
     # --- 1. 安全检查 ---
-    valid_tokens = load_allowed_tokens()
-    bindings = load_bindings()
-    if x_access_token not in valid_tokens:
-        raise HTTPException(status_code=401, detail="邀请码无效")
-    bound_device = bindings.get(x_access_token)
-    if not bound_device or bound_device != x_device_id:
-        raise HTTPException(status_code=403, detail="设备校验失败，请勿分享邀请码")
-    
+    await check_access(x_access_token, x_device_id)
+    return await run_chat_turn(request)
+
+# 流式版本：NPC 回复边生成边以 SSE 推送（event: token），
+# 最后以 event: done 发送完整的 GameResponse（新存档、按钮、状态栏）
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: GameRequest,
+    x_access_token: str = Header(..., alias="X-Access-Token"),
+    x_device_id: str = Header(..., alias="X-Device-Id")
+):
+    await check_access(x_access_token, x_device_id)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> GameResponse:
+        llm_stream.bind_sink(queue)   # 只作用于本 task 的上下文
+        try:
+            return await run_chat_turn(request)
+        finally:
+            queue.put_nowait(None)
+
+    async def events():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                text = await queue.get()
+                if text is None:
+                    break
+                if text is llm_stream.RESET:
+                    yield llm_stream.format_sse("reset", {})
+                    continue
+                yield llm_stream.format_sse("token", {"text": text})
+            try:
+                resp = await task
+            except Exception as e:
+                yield llm_stream.format_sse("error", {"detail": str(e)})
+                return
+            yield llm_stream.format_sse("done", resp.model_dump())
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_chat_turn(request: GameRequest) -> GameResponse:
+    """处理一轮游戏指令（/chat 与 /chat/stream 共用）。"""
+    try:
+        return await _run_chat_turn(request)
+    except LLMUnavailableError as e:
+        # 所有供应商都失败：本轮作废，原样返回旧存档，玩家可直接重试（不扣精力、不写对话历史）
+        logger.warning("LLM 不可用：%s", e)
+        return GameResponse(
+            reply_text="（驿站外风雨大作，对方似乎没听清你的话……请稍后再试。）",
+            sender_name="系统",
+            new_encrypted_state=request.encrypted_state or "",
+            ui_type="text", ui_options=[]
+        )
+
+async def _run_chat_turn(request: GameRequest) -> GameResponse:
     model_id = request.model_id or DEFAULT_MODEL
 
     # --- 2. 游戏逻辑 ---
-    current_state = decrypt_state(request.encrypted_state)
-    user_input = request.user_input.strip()
-    
-    reply = ""
-    sender = "系统"
-    ui_type = "text"
-    ui_options = []
-    bg_img = None
+    try:
+        current_state, state_loaded = await load_state_async(request.encrypted_state)
+    except StateLoadError as e:
+        # 不能悄悄开新局覆盖玩家进度：明确提示，客户端保留原令牌
+        logger.warning("存档读取失败：%s", e)
+        return GameResponse(
+            reply_text="【存档已失效】本局存档已过期或无法找回，无法继续。请刷新页面重新开始。",
+            sender_name="系统", new_encrypted_state="", state_unchanged=True,
+            ui_type="text", ui_options=[]
+        )
+    command = parse_command(request.user_input.strip())
 
     # 3. 游戏结束拦截（允许查看报告）
     if current_state["dynamic_state"].get("game_over", False):
-        if not user_input.startswith("CMD_SHOW_REPORT"):
+        if command.verb != "CMD_SHOW_REPORT":
             return GameResponse(
                 reply_text="【游戏已结束】请刷新页面重新开始。",
                 sender_name="系统", new_encrypted_state=encrypt_state(current_state),
@@ -1088,102 +867,59 @@ async def chat_endpoint(
             )
 
     # 4. 自动触发结局判定
-    if check_auto_trigger_endgame(current_state) and not user_input.startswith("CMD_"):
-        user_input = "CMD_SHOW_ACCUSE_MENU"
+    if check_auto_trigger_endgame(current_state) and not command.verb.startswith("CMD_"):
+        command = parse_command("CMD_SHOW_ACCUSE_MENU")
         reply = ('【⏳ 时间已到】\n\n第三日的晨光透过窗棂，李德福彻底失去了耐心。...\n'
                  '"密卫大人，时间到了。咱家要的交代呢？"\n\n(强制进入指认流程)')
         sender = "强制剧情"
     
-     # --- 5. 按顺序尝试各 handler ---
-    # each handler return {"done": True/False, ...}
-    # done=True means match completed, skip following handler
-
-    handlers = [
-        game_handlers.handle_tribunal,   # 群讨系统
-        game_handlers.handle_accuse,     # 指认系统
-        game_handlers.handle_confront,   # 对质系统
-        game_handlers.handle_search,     # 搜查系统
-        game_handlers.handle_talk,       # 对话系统（含 NPC 自由对话）
-        game_handlers.handle_recall_cmd, # 回想系统（只读，不消耗 AP）
-    ]
+    # --- 5. 分发到对应 handler（见 command_router.py）---
+    result = await command_router.dispatch(command, request, current_state, model_id)
+    # 特殊情况:handler 需要直接返回 GameResponse(如房间被阻挡）
+    if result.get("early_return"):
+        return result["early_return"]
+    reply = result["reply"]
+    sender = result["sender"]
+    ui_type = result.get("ui_type", "text")
+    ui_options = result.get("ui_options", [])
+    bg_img = result.get("bg_img")
+
+    # 只读指令不改存档：跳过序列化和加密，客户端继续用手上的令牌
+    state_unchanged = state_loaded and command_router.is_read_only(command, request)
+    new_encrypted_token = "" if state_unchanged else encrypt_state(current_state)
+    d = current_state["dynamic_state"]
 
-    result = None
-    for handler in handlers:
-        result = await handler(user_input, request, current_state, model_id)
-        if result["done"]:
-            # 特殊情况:handler 需要直接返回 GameResponse(如房间被阻挡）
-            if result.get("early_return"):
-                return result["early_return"]
-            reply = result["reply"]
-            sender = result["sender"]
-            break
-    
-    # --- 6. no handler matched → bottom logic(stay  in main )---
-    if not result or not result["done"]:
-        ui_type = "text"
-        ui_options = []
-        bg_img = None
-
-        if user_input == "系统菜单":
-            d_state = current_state['dynamic_state']
-            reply = get_status_report(current_state)
-            reply = f"📅 **第 {d_state.get('day', 1)} 日**\n" + reply
-
-        elif user_input.startswith("CMD_ACCEPT_TRUST_CLUE"):
-            # 玩家点击"接受"信任触发线索
-            # payload: clue_id
-            clue_id_to_accept = user_input.split(":", 1)[1] if ":" in user_input else ""
-            d_state = current_state["dynamic_state"]
-            from conditional_clues import collect_trust_clue, get_trust_triggered_clues
-            # 找到对应的 trust_clue 配置
-            pending = d_state.get("pending_trust_clues", [])
-            matched = next((tc for tc in pending if tc["clue_id"] == clue_id_to_accept), None)
-            if matched:
-                collect_trust_clue(
-                    clue_id=matched["clue_id"],
-                    clue_data=matched["clue_data"],
-                    d_state=d_state,
-                    objective_clues_db=objective_clues_db
-                )
-                # 从 pending 移除
-                d_state["pending_trust_clues"] = [
-                    tc for tc in pending if tc["clue_id"] != clue_id_to_accept
-                ]
-                clue_name = matched["clue_data"].get("name", clue_id_to_accept)
-                reply = matched["trigger_text"] + f"\n\n**▪ 新线索入档：{clue_name}**"
-                sender = next(
-                    (n["name"] for n in NPC_LIST if n["id"] == matched["npc_id"]),
-                    "神秘人"
-                )
-            else:
-                reply = "（线索已收取或不存在）"
-
-        elif user_input.startswith("CMD_EXIT"):
-            mode = user_input.split(":", 1)[1]
-            d_state = current_state["dynamic_state"]
-
-            if mode == "SEARCH":
-                # 退出搜查：不消耗行动点，但检查是否被撞见
-                d_state["room_inspect_count"] = 0
-                caught = check_caught_searching(current_state)
-                if caught:
-                    reply = caught["message"]
-                    sender = "突发事件"
-                    d_state["current_location"] = "大堂"
-                else:
-                    reply = "你离开了搜查区域。"
-            else:
-                # 对话等其他行为：正常消耗行动点
-                advance_time(current_state)
-                if mode == "TALK":
-                    last_npc = d_state.get("last_talk_npc")
-                    if last_npc:
-                        game_handlers.adjust_trust(d_state, last_npc, "talked_nicely")
-                reply = f"你结束了行动。\n⏳ 时间：第{d_state.get('day')}日 {TIME_CYCLES[d_state['time_idx']]}"
+    # ── 信任线索推送：把待推送的线索附在 status_info 里发给前端 ──
+    pending_trust = d.pop("pending_trust_clues", [])
+
+    # ── 陈述追踪：从 handler result 中提取新陈述和已揭穿陈述 ──
+    new_statements = result.get("new_statements", [])
+    confronted_stmts = result.get("confronted_statements", [])
 
+    status_info = {
+        "day": d.get("day", 1),
+        "time": TIME_CYCLES[d.get("time_idx", 4)],
+        "energy": MAX_AP_PER_CYCLE - d.get("ap_used_this_cycle", 0),
+        "max_energy": MAX_AP_PER_CYCLE,
+        "pending_trust_clues": pending_trust,   # 前端据此弹出 NPC 主动递线索的提示
+        "inference_count": len(d.get("inferences_unlocked", [])),
+        "game_over": d.get("game_over", False),  # 结束后前端不再本地渲染 manifest 菜单
+        "new_statements": new_statements,          # 本轮对话新触发的可证伪陈述
+        "confronted_statements": confronted_stmts, # 本轮对质中被揭穿的陈述
+    }
+    if result.get("recall"):
+        # 回想内容版本；unchanged=True 时 reply_text 为空，前端用本地缓存
+        status_info["recall"] = result["recall"]
+    return GameResponse(
+        reply_text=reply, sender_name=sender, new_encrypted_state=new_encrypted_token,
+        ui_type=ui_type, ui_options=ui_options, bg_image=bg_img,
+        status_info=status_info, state_unchanged=state_unchanged
+    )
 
-        elif "进入游戏" in user_input:
-            reply = '''
+# ==========================================
+# 🧭 指令路由：main.py 自己负责的指令
+# ==========================================
+INTRO_TEXT = '''
             轰隆——！
             一道惨白的雷光撕裂夜空，瞬间照亮了头顶那块摇摇欲坠的牌匾——"回马驿"。
 
@@ -1240,39 +976,83 @@ async def chat_endpoint(
 
             你听着几人的叙述皱了皱眉，罢了，这可是你在李公公面前露脸的好机会，不管是谁在此装神弄鬼你都要查个水落石出！
             '''
-        else:
-            reply = "请选择操作。"
 
-    else:
-        ui_type = result.get("ui_type", "text")
-        ui_options = result.get("ui_options", [])
-        bg_img = result.get("bg_img")
 
-    new_encrypted_token = encrypt_state(current_state)
-    d = current_state["dynamic_state"]
+def _text_result(reply: str, sender: str = "系统") -> Dict:
+    return {"reply": reply, "sender": sender, "ui_type": "text", "ui_options": [], "bg_img": None, "done": True}
 
-    # ── 信任线索推送：把待推送的线索附在 status_info 里发给前端 ──
-    pending_trust = d.pop("pending_trust_clues", [])
 
-    # ── 陈述追踪：从 handler result 中提取新陈述和已揭穿陈述 ──
-    new_statements = result.get("new_statements", [])
-    confronted_stmts = result.get("confronted_statements", [])
+async def _cmd_status_menu(command, request, current_state, model_id):
+    d_state = current_state['dynamic_state']
+    reply = get_status_report(current_state)
+    return _text_result(f"📅 **第 {d_state.get('day', 1)} 日**\n" + reply)
 
-    status_info = {
-        "day": d.get("day", 1),
-        "time": TIME_CYCLES[d.get("time_idx", 4)],
-        "energy": MAX_AP_PER_CYCLE - d.get("ap_used_this_cycle", 0),
-        "max_energy": MAX_AP_PER_CYCLE,
-        "pending_trust_clues": pending_trust,   # 前端据此弹出 NPC 主动递线索的提示
-        "inference_count": len(d.get("inferences_unlocked", [])),
-        "new_statements": new_statements,          # 本轮对话新触发的可证伪陈述
-        "confronted_statements": confronted_stmts, # 本轮对质中被揭穿的陈述
-    }
-    return GameResponse(
-        reply_text=reply, sender_name=sender, new_encrypted_state=new_encrypted_token,
-        ui_type=ui_type, ui_options=ui_options, bg_image=bg_img,
-        status_info=status_info
+
+async def _cmd_accept_trust_clue(command, request, current_state, model_id):
+    # 玩家点击"接受"信任触发线索
+    # payload: clue_id
+    clue_id_to_accept = command.payload
+    d_state = current_state["dynamic_state"]
+    from conditional_clues import collect_trust_clue
+    # 找到对应的 trust_clue 配置
+    pending = d_state["pending_trust_clues"]
+    matched = next((tc for tc in pending if tc["clue_id"] == clue_id_to_accept), None)
+    if not matched:
+        return _text_result("（线索已收取或不存在）")
+    collect_trust_clue(clue_id=matched["clue_id"], d_state=d_state)
+    # 从 pending 移除
+    d_state["pending_trust_clues"] = [
+        tc for tc in pending if tc["clue_id"] != clue_id_to_accept
+    ]
+    clue_name = matched["clue_data"].get("name", clue_id_to_accept)
+    sender = next(
+        (n["name"] for n in NPC_LIST if n["id"] == matched["npc_id"]),
+        "神秘人"
     )
+    return _text_result(matched["trigger_text"] + f"\n\n**▪ 新线索入档：{clue_name}**", sender)
+
+
+async def _cmd_exit(command, request, current_state, model_id):
+    mode = command.payload
+    d_state = current_state["dynamic_state"]
+
+    if mode == "SEARCH":
+        # 退出搜查：不消耗行动点，但检查是否被撞见
+        d_state["room_inspect_count"] = 0
+        caught = check_caught_searching(current_state)
+        if caught:
+            d_state["current_location"] = "大堂"
+            return _text_result(caught["message"], "突发事件")
+        return _text_result("你离开了搜查区域。")
+
+    # 对话等其他行为：正常消耗行动点
+    advance_time(current_state)
+    if mode == "TALK":
+        last_npc = d_state.get("last_talk_npc")
+        if last_npc:
+            game_handlers.adjust_trust(d_state, last_npc, "talked_nicely")
+    return _text_result(f"你结束了行动。\n⏳ 时间：第{d_state.get('day')}日 {TIME_CYCLES[d_state['time_idx']]}")
+
+
+async def _cmd_enter_game(command, request, current_state, model_id):
+    return _text_result(INTRO_TEXT)
+
+
+async def _cmd_fallback(command, request, current_state, model_id):
+    # 与原处理链一致：输入里含"进入游戏"（如"开始，进入游戏"）也显示开场
+    if "进入游戏" in command.raw:
+        return _text_result(INTRO_TEXT)
+    return _text_result("请选择操作。")
+
+
+command_router = CommandRouter()
+game_handlers.register_commands(command_router)
+command_router.register(["系统菜单"], _cmd_status_menu, read_only=True)
+command_router.register(["CMD_ACCEPT_TRUST_CLUE"], _cmd_accept_trust_clue)
+command_router.register(["CMD_EXIT"], _cmd_exit)
+command_router.register(["进入游戏"], _cmd_enter_game, read_only=True)
+command_router.set_fallback(_cmd_fallback)
+
 
 game_handlers.init({
     # 数据
@@ -1280,7 +1060,7 @@ game_handlers.init({
     "GameResponse": GameResponse,
     "NPC_LIST": NPC_LIST,
     "SOLUTION": SOLUTION,
-    "objective_clues_db": objective_clues_db,
+    "clue_catalog": clue_catalog,
     "ROOM_DB": ROOM_DB,
     "TIME_CYCLES": TIME_CYCLES,
     "ALL_LOCATIONS": ALL_LOCATIONS,
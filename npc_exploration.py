@@ -14,7 +14,7 @@ def run_npc_exploration(global_state: Dict, npc_list: List, time_cycles: List,
     """
     d_state = global_state["dynamic_state"]
     current_time = time_cycles[d_state["time_idx"]]
-    activities = d_state.setdefault("npc_activities", {})
+    activities = d_state["npc_activities"]
 
     for npc in npc_list:
         npc_id = npc["id"]
@@ -83,7 +83,7 @@ def run_npc_exploration(global_state: Dict, npc_list: List, time_cycles: List,
                 activities[npc_id]["last_action"] = random.choice(_IDLE_SIGHTINGS)
 
         # ---- 步骤 5：低信任 NPC 散布谣言 ----
-        trust_val = d_state.get("npc_trust", {}).get(npc_id, 50)
+        trust_val = d_state["npc_trust"].get(npc_id, 50)
         if trust_val < 25:
             low_trust_rumors = config.get("low_trust_rumors", [])
             if low_trust_rumors:
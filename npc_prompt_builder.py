@@ -6,8 +6,26 @@
 # ==========================================
 
 import json
+import os
 from typing import Dict, List, Optional
 
+# prompt 布局：
+#   classic        — 场景信息在最前（原始顺序）
+#   cache_friendly — 每个 NPC 的静态内容在前且逐字节不变，时间/地点/线索等放在最后，
+#                    供应商的前缀缓存（DeepSeek context caching）可以跨时辰命中
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "classic")
+
+GENERAL_RULES = """【通用扮演规则】
+1. 始终保持角色性格，用符合身份的语气和措辞说话。
+2. 你的背包中如果有 'hidden'（隐藏）物品，在被玩家发现之前，绝不能在对话中直接提及。描述相关动作时必须模糊化。
+3. 严格按照你的 'case_knowledge' 回答关于案发当晚的问题，不要编造你不知道的事情。
+4. 如果玩家问你不知道的事（参见【你不知道的事】），就说你不知道，不要猜测或编造。
+5. 你可以有情绪反应（愤怒、恐惧、厌恶等），让对话更生动自然。
+6. 回复长度控制在50-150字之间，像真人对话一样自然。"""
+
+REPLY_FORMAT = """【回复格式】
+请仅以 JSON 格式回复，格式为：{"reply": "你的回复内容"}。"""
+
 # ------------------------------------------
 # 线索简要描述（供NPC判断玩家手中的牌）
 # ------------------------------------------
@@ -19,37 +37,58 @@ def generate_clue_briefs(clues_db: dict) -> dict:
         briefs[cid] = f"{clue['name']}（{loc}）" if loc else clue['name']
     return briefs
 
+# 线索目录启动后不再变化，按 (对象, 条目数) 缓存简要描述
+_brief_cache = {"db": None, "size": -1, "briefs": {}}
+
+def get_clue_briefs(clues_db: dict) -> dict:
+    if _brief_cache["db"] is not clues_db or _brief_cache["size"] != len(clues_db):
+        _brief_cache.update(db=clues_db, size=len(clues_db), briefs=generate_clue_briefs(clues_db))
+    return _brief_cache["briefs"]
+
 def build_player_clue_summary(player_clues: list, clues_db: dict) -> str:
-    briefs = generate_clue_briefs(clues_db)
+    briefs = get_clue_briefs(clues_db)
     if not player_clues:
         return "玩家目前没有发现任何线索。"
     lines = [f"- {briefs.get(cid, cid)}" for cid in player_clues]
     return "\n".join(lines)
 
 
-def build_confrontation_section(triggers: Dict, player_clues: List[str]) -> str:
+def compile_triggers(triggers: Dict) -> List[tuple]:
+    """
+    预处理 confrontation_triggers：[(所需线索ID元组, 格式化后的文本), ...]，保持原顺序。
+    无法识别的 key 不会被激活，直接丢弃。
+    """
+    compiled = []
+    for trigger_key, trigger_data in (triggers or {}).items():
+        # 处理组合线索 key（如 "combined_clue_012_005_006"）
+        if trigger_key.startswith("combined_"):
+            clue_ids = trigger_key.replace("combined_", "").split("_")
+            required = tuple(f"clue_{cid}" for cid in clue_ids)
+        # 处理单条线索 key（如 "clue_006"）
+        elif trigger_key.startswith("clue_"):
+            required = (trigger_key,)
+        else:
+            continue
+        compiled.append((required, format_trigger(trigger_key, trigger_data)))
+    return compiled
+
+
+def build_confrontation_section(triggers, player_clues: List[str]) -> str:
     """
     根据玩家已有线索，生成当前激活的对质反应指令。
     只有玩家手中有某条线索时，NPC才会收到对应的对质反应指令。
     这样可以避免NPC"未卜先知"地提前准备应对策略。
+
+    triggers 可以是原始 dict，也可以是 compile_triggers() 的结果。
     """
     if not triggers:
         return ""
+    if isinstance(triggers, dict):
+        triggers = compile_triggers(triggers)
 
-    active_lines = []
     collected_set = set(player_clues)
-
-    for trigger_key, trigger_data in triggers.items():
-        # 处理组合线索 key（如 "combined_clue_012_005_006"）
-        if trigger_key.startswith("combined_"):
-            clue_ids = trigger_key.replace("combined_", "").split("_")
-            clue_ids = [f"clue_{cid}" for cid in clue_ids]
-            if all(cid in collected_set for cid in clue_ids):
-                active_lines.append(format_trigger(trigger_key, trigger_data))
-        # 处理单条线索 key（如 "clue_006"）
-        elif trigger_key.startswith("clue_"):
-            if trigger_key in collected_set:
-                active_lines.append(format_trigger(trigger_key, trigger_data))
+    active_lines = [text for required, text in triggers
+                    if all(cid in collected_set for cid in required)]
 
     if not active_lines:
         return ""
@@ -124,6 +163,48 @@ def build_trust_section(npc_id: str, npc_trust: dict) -> str:
                 "你非常不信任甚至敌视调查者。你会撒谎、拒绝回答、甚至故意误导。"
                 "除非有铁证指着你，否则一问三不知。")
 
+# ------------------------------------------
+# 每个 NPC 不随对局变化的部分：只在档案加载 / 热更新后编译一次
+# ------------------------------------------
+class CompiledProfile:
+    __slots__ = ("sender", "identity", "state", "role_directive", "triggers", "unknown_section",
+                 "static_prefix")
+
+    def __init__(self, npc_profile: Dict):
+        static_profile = npc_profile.get("static_profile", {})
+        dynamic_state = npc_profile.get("dynamic_state_template", {})
+        self.sender = static_profile.get("name", "神秘人")
+        self.identity = json.dumps(static_profile, ensure_ascii=False, indent=2)
+        self.state = json.dumps(dynamic_state, ensure_ascii=False, indent=2)
+        self.role_directive = npc_profile.get("role_directive", "")
+        self.triggers = compile_triggers(npc_profile.get("confrontation_triggers", {}))
+        self.unknown_section = build_unknown_facts_section(npc_profile.get("unknown_facts", []))
+        # cache_friendly 布局的固定前缀
+        self.static_prefix = f"""你正在扮演剧本杀中的角色【{self.sender}】。
+
+【你的身份与性格】
+{self.identity}
+
+【你的当前状态与物品】
+{self.state}
+
+{self.role_directive}
+
+{self.unknown_section}
+
+{GENERAL_RULES}"""
+
+
+# npc_id → (profile 对象, 编译结果)；profile 被热更新替换后对象不同，自动重新编译
+_compiled_profiles: Dict[str, tuple] = {}
+
+def get_compiled_profile(npc_id: str, npc_profile: Dict) -> CompiledProfile:
+    cached = _compiled_profiles.get(npc_id)
+    if cached is None or cached[0] is not npc_profile:
+        cached = (npc_profile, CompiledProfile(npc_profile))
+        _compiled_profiles[npc_id] = cached
+    return cached[1]
+
 def build_npc_system_prompt(
     npc_id: str,
     npc_profile: Dict,
@@ -132,7 +213,8 @@ def build_npc_system_prompt(
     player_clues: List[str],
     clues_db,
     npc_activities=None,
-    npc_trust = None
+    npc_trust = None,
+    layout: Optional[str] = None
 ) -> str:
     """
     为指定NPC构建专属的System Prompt（纯数据驱动）。
@@ -146,27 +228,43 @@ def build_npc_system_prompt(
         current_time:  当前游戏时间 (如 "辰时")
         npc_location:  NPC当前所在位置
         player_clues:  玩家已收集的线索ID列表
+        layout:        prompt 布局，默认取 PROMPT_LAYOUT
 
     返回:
         完整的system prompt字符串
     """
 
-    static_profile = npc_profile.get("static_profile", {})
-    dynamic_state = npc_profile.get("dynamic_state_template", {})
-    sender = static_profile.get("name", "神秘人")
-
-    # 从JSON读取三个新字段
-    role_directive = npc_profile.get("role_directive", "")
-    confrontation_triggers = npc_profile.get("confrontation_triggers", {})
-    unknown_facts = npc_profile.get("unknown_facts", [])
+    compiled = get_compiled_profile(npc_id, npc_profile)
+    sender = compiled.sender
+    role_directive = compiled.role_directive
+    unknown_section = compiled.unknown_section
 
-    # 构建各部分
+    # 只有动态部分需要每轮重新生成
     clue_summary = build_player_clue_summary(player_clues,clues_db)
-    confrontation_section = build_confrontation_section(confrontation_triggers, player_clues)
-    unknown_section = build_unknown_facts_section(unknown_facts)
+    confrontation_section = build_confrontation_section(compiled.triggers, player_clues)
     exploration_section = build_exploration_section(npc_id, npc_activities)
     trust_section = build_trust_section(npc_id, npc_trust)
 
+    if (layout or PROMPT_LAYOUT) == "cache_friendly":
+        # 静态前缀在前，本轮变化的内容全部放在后面
+        return f"""{compiled.static_prefix}
+
+【场景信息】
+当前时间：{current_time}
+你当前所在位置：{npc_location}
+
+{confrontation_section}
+
+{exploration_section}
+
+{trust_section}
+
+【玩家当前掌握的线索】
+以下是玩家目前已经发现的证据，你需要据此判断自己的防线和态度：
+{clue_summary}
+
+{REPLY_FORMAT}"""
+
     # 组装完整prompt
     system_prompt = f"""你正在扮演剧本杀中的角色【{sender}】。
 
@@ -175,10 +273,10 @@ def build_npc_system_prompt(
 你当前所在位置：{npc_location}
 
 【你的身份与性格】
-{json.dumps(static_profile, ensure_ascii=False, indent=2)}
+{compiled.identity}
 
 【你的当前状态与物品】
-{json.dumps(dynamic_state, ensure_ascii=False, indent=2)}
+{compiled.state}
 
 {role_directive}
 
@@ -194,18 +292,8 @@ def build_npc_system_prompt(
 以下是玩家目前已经发现的证据，你需要据此判断自己的防线和态度：
 {clue_summary}
 
-【通用扮演规则】
-1. 始终保持角色性格，用符合身份的语气和措辞说话。
-2. 你的背包中如果有 'hidden'（隐藏）物品，在被玩家发现之前，绝不能在对话中直接提及。描述相关动作时必须模糊化。
-3. 严格按照你的 'case_knowledge' 回答关于案发当晚的问题，不要编造你不知道的事情。
-4. 如果玩家问你不知道的事（参见【你不知道的事】），就说你不知道，不要猜测或编造。
-5. 你可以有情绪反应（愤怒、恐惧、厌恶等），让对话更生动自然。
-6. 回复长度控制在50-150字之间，像真人对话一样自然。
+{GENERAL_RULES}
 
-【回复格式】
-请仅以 JSON 格式回复，格式为：{{"reply": "你的回复内容"}}。"""
+{REPLY_FORMAT}"""
 
     return system_prompt
-
-
-
@@ -0,0 +1,153 @@
+"""
+npc_registry.py
+NPC Profile 内存注册表（启动时加载 + 按 mtime 热更新）
+
+逻辑：
+  - 启动时一次性解析并校验 NPC_Profiles/ 下所有档案，按 NPC id 存入内存
+  - 请求路径上 get(npc_id) 只做一次 dict 查找，从不碰磁盘
+  - 后台任务每隔 check_interval 秒 stat 一遍档案文件，
+    有变化的文件在线程池中解析、校验，成功后整体替换 dict（原子切换）
+  - 改坏的档案（JSON 错误 / 缺字段）不会生效，继续使用上一次的有效版本
+
+返回的 profile 是共享对象，调用方只读、不要修改。
+
+对外接口：
+  NpcProfileRegistry(paths, check_interval)
+      .load_all()                → 同步加载全部档案（start() 时自动调用）
+      .get(npc_id)               → profile dict / None
+      await .start() / .stop()   → 启停后台热更新任务
+      .stats()                   → 已加载数量、重载次数、失败次数
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 校验：缺少这些字段的档案视为无效
+REQUIRED_KEYS = ("id", "static_profile")
+
+
+def validate_profile(npc_id: str, raw) -> Optional[str]:
+    """返回错误说明，合法时返回 None。"""
+    if not isinstance(raw, dict):
+        return "档案顶层不是对象"
+    missing = [k for k in REQUIRED_KEYS if k not in raw]
+    if missing:
+        return f"缺少字段 {missing}"
+    if raw["id"] != npc_id:
+        return f"id 不匹配（文件内为 {raw['id']}）"
+    if not isinstance(raw["static_profile"], dict) or "name" not in raw["static_profile"]:
+        return "static_profile 缺少 name"
+    return None
+
+
+class NpcProfileRegistry:
+    def __init__(self, paths: Dict[str, str], check_interval: float = 2.0):
+        """
+        paths:          {npc_id: 档案文件路径}
+        check_interval: 热更新轮询间隔（秒），<= 0 表示不启动后台任务
+        """
+        self._paths = dict(paths)
+        self._check_interval = check_interval
+        self._profiles: Dict[str, Dict] = {}
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+        self._reloads = 0
+        self._failures = 0
+
+    # ---------- 加载 ----------
+
+    @staticmethod
+    def _stat_mtime(path: str) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _parse(self, npc_id: str, path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            logger.warning("NPC 档案 %s 读取失败：%s", path, e)
+            self._failures += 1
+            return None
+        error = validate_profile(npc_id, raw)
+        if error:
+            logger.warning("NPC 档案 %s 校验失败：%s", path, error)
+            self._failures += 1
+            return None
+        return raw
+
+    def _scan(self) -> Tuple[Dict[str, Dict], Dict[str, Optional[float]]]:
+        """stat 全部档案，解析有变化的文件。返回 (新 profile, 新 mtime)。"""
+        updated, mtimes = {}, {}
+        for npc_id, path in self._paths.items():
+            mtime = self._stat_mtime(path)
+            if npc_id in self._mtimes and mtime == self._mtimes[npc_id]:
+                continue
+            mtimes[npc_id] = mtime
+            if mtime is None:
+                continue
+            profile = self._parse(npc_id, path)
+            if profile is not None:
+                updated[npc_id] = profile
+        return updated, mtimes
+
+    def _apply(self, updated: Dict[str, Dict], mtimes: Dict[str, Optional[float]]):
+        self._mtimes.update(mtimes)
+        if updated:
+            profiles = dict(self._profiles)
+            profiles.update(updated)
+            self._profiles = profiles   # 整体替换，读者不会看到半更新状态
+            self._reloads += 1
+
+    def load_all(self):
+        self._apply(*self._scan())
+        self._loaded = True
+        for npc_id in self._paths:
+            if npc_id not in self._profiles:
+                logger.error("NPC 档案缺失或无效：%s（%s）", npc_id, self._paths[npc_id])
+
+    def get(self, npc_id: str) -> Optional[Dict]:
+        if not self._loaded:
+            # 未经 start()（如脚本里直接调用）时按需加载
+            self.load_all()
+        return self._profiles.get(npc_id)
+
+    # ---------- 热更新 ----------
+
+    async def start(self):
+        if not self._loaded:
+            self.load_all()
+        if self._task is None and self._check_interval > 0:
+            self._task = asyncio.create_task(self._watch_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(self._check_interval)
+            try:
+                updated, mtimes = await asyncio.to_thread(self._scan)
+            except Exception:
+                logger.exception("NPC 档案热更新失败")
+                continue
+            if updated:
+                logger.info("NPC 档案已重新加载：%s", ", ".join(sorted(updated)))
+            self._apply(updated, mtimes)
+
+    def stats(self) -> Dict:
+        return {"loaded": len(self._profiles), "reloads": self._reloads, "failures": self._failures}
@@ -12,9 +12,21 @@ recall_system.py
   - 纯只读，不消耗行动点，不推进时间
   - 不给答案，只展示玩家已知信息的整理
   - 时间线条目由线索解锁，未解锁的时段显示「？」
+
+缓存：
+  回想内容只取决于 (clues_collected, inferences_unlocked)，两者的指纹即 recall_version。
+  渲染结果按 (指纹, 指令) 缓存在进程内 LRU（RECALL_CACHE_SIZE，默认 512）；
+  客户端带上已有的 recall_version 且未变化时，返回 unchanged=True、reply 为空，前端沿用本地缓存。
+  时间线可见性用 inference_engine.ClueRuleIndex 的位掩码判断，不再逐条 issubset。
 """
 
-from typing import Dict, List, Tuple
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from inference_engine import ClueRuleIndex, get_all_unlocked
 
 # ─────────────────────────────────────────────
 #  时间线条目库
@@ -95,6 +107,9 @@ TIMELINE_ENTRIES = [
     },
 ]
 
+# 时间线条目 i 的规则 ID 为 "tl_<i>"
+TIMELINE_INDEX = ClueRuleIndex({f"tl_{i}": e["required_clues"] for i, e in enumerate(TIMELINE_ENTRIES)})
+
 # ─────────────────────────────────────────────
 #  线索地点分组（展示用）
 # ─────────────────────────────────────────────
@@ -108,21 +123,27 @@ CLUE_LOCATION_ORDER = [
 #  CMD 处理函数（由 game_handlers.py 调用）
 # ─────────────────────────────────────────────
 
-def handle_recall(user_input: str, d_state: Dict, objective_clues_db: Dict) -> Dict:
+def handle_recall(user_input: str, d_state: Dict, clue_catalog: Dict,
+                  known_version: Optional[str] = None) -> Dict:
     """
     处理所有 CMD_RECALL_* 指令。
-    返回 {"reply": str, "ui_type": str, "ui_options": list}
+    返回 {"reply": str, "ui_type": str, "ui_options": list, "recall_version": str, "unchanged": bool}
+    known_version 与当前 recall_version 相同时 reply 为空、unchanged=True。
     不修改 d_state（纯只读）。
     """
+    version = recall_version(d_state, clue_catalog)
     result = {
         "reply": "",
         "ui_type": "text",
         "ui_options": [],
         "consumes_ap": False,   # 不消耗行动点
+        "recall_version": version,
+        "unchanged": known_version == version,
     }
+    if not result["unchanged"]:
+        result["reply"] = _render_cached(version, user_input, d_state, clue_catalog)
 
     if user_input == "CMD_SHOW_RECALL_MENU":
-        result["reply"] = _menu_text(d_state, objective_clues_db)
         result["ui_type"] = "recall_menu"
         result["ui_options"] = [
             {"label": "▸ 线索档案",   "action_type": "RECALL_CLUES",      "payload": "clues"},
@@ -132,21 +153,18 @@ def handle_recall(user_input: str, d_state: Dict, objective_clues_db: Dict) -> D
         ]
 
     elif user_input == "CMD_RECALL_CLUES":
-        result["reply"] = _format_clues(d_state, objective_clues_db)
         result["ui_type"] = "recall_menu"
         result["ui_options"] = [
             {"label": "‹ 返回回想", "action_type": "RECALL_BACK", "payload": "BACK"},
         ]
 
     elif user_input == "CMD_RECALL_INFERENCES":
-        result["reply"] = _format_inferences(d_state)
         result["ui_type"] = "recall_menu"
         result["ui_options"] = [
             {"label": "‹ 返回回想", "action_type": "RECALL_BACK", "payload": "BACK"},
         ]
 
     elif user_input == "CMD_RECALL_TIMELINE":
-        result["reply"] = _format_timeline(d_state)
         result["ui_type"] = "recall_menu"
         result["ui_options"] = [
             {"label": "‹ 返回回想", "action_type": "RECALL_BACK", "payload": "BACK"},
@@ -155,11 +173,66 @@ def handle_recall(user_input: str, d_state: Dict, objective_clues_db: Dict) -> D
     return result
 
 
+# ─────────────────────────────────────────────
+#  指纹与渲染缓存
+# ─────────────────────────────────────────────
+RECALL_CACHE_SIZE = int(os.getenv("RECALL_CACHE_SIZE", "512"))
+
+_view_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_catalog_digest = {"catalog": None, "digest": b""}
+
+
+def _catalog_fingerprint(clue_catalog: Dict) -> bytes:
+    """线索文案改动（重新部署）后旧的 recall_version 随之失效。"""
+    if _catalog_digest["catalog"] is not clue_catalog:
+        blob = json.dumps(list(clue_catalog.items()), ensure_ascii=False, sort_keys=True, default=sorted)
+        _catalog_digest.update(catalog=clue_catalog, digest=hashlib.blake2b(blob.encode(), digest_size=8).digest())
+    return _catalog_digest["digest"]
+
+
+def recall_version(d_state: Dict, clue_catalog: Dict) -> str:
+    h = hashlib.blake2b(_catalog_fingerprint(clue_catalog), digest_size=8)
+    h.update("\x1f".join(d_state["inventory"]["clues_collected"]).encode())
+    h.update(b"\x1e")
+    h.update("\x1f".join(d_state.get("inferences_unlocked", [])).encode())
+    return h.hexdigest()
+
+
+def _render(user_input: str, d_state: Dict, clue_catalog: Dict) -> str:
+    if user_input == "CMD_SHOW_RECALL_MENU":
+        return _menu_text(d_state, clue_catalog)
+    if user_input == "CMD_RECALL_CLUES":
+        return _format_clues(d_state, clue_catalog)
+    if user_input == "CMD_RECALL_INFERENCES":
+        return _format_inferences(d_state)
+    if user_input == "CMD_RECALL_TIMELINE":
+        return _format_timeline(d_state)
+    return ""
+
+
+def _render_cached(version: str, user_input: str, d_state: Dict, clue_catalog: Dict) -> str:
+    key = (version, user_input)
+    reply = _view_cache.get(key)
+    if reply is None:
+        reply = _render(user_input, d_state, clue_catalog)
+        _view_cache[key] = reply
+        while len(_view_cache) > RECALL_CACHE_SIZE:
+            _view_cache.popitem(last=False)
+    else:
+        _view_cache.move_to_end(key)
+    return reply
+
+
+def _visible_timeline(d_state: Dict) -> set:
+    """当前可见的时间线条目下标。"""
+    return {int(rule_id[3:]) for rule_id in TIMELINE_INDEX.satisfied(d_state["inventory"]["clues_collected"])}
+
+
 # ─────────────────────────────────────────────
 #  格式化函数
 # ─────────────────────────────────────────────
 
-def _menu_text(d_state: Dict, objective_clues_db: Dict) -> str:
+def _menu_text(d_state: Dict, clue_catalog: Dict) -> str:
     collected = d_state["inventory"]["clues_collected"]
     inf_count  = len(d_state.get("inferences_unlocked", []))
     tl_count   = _count_visible_timeline(d_state)
@@ -173,15 +246,16 @@ def _menu_text(d_state: Dict, objective_clues_db: Dict) -> str:
     )
 
 
-def _format_clues(d_state: Dict, objective_clues_db: Dict) -> str:
-    collected = set(d_state["inventory"]["clues_collected"])
+def _format_clues(d_state: Dict, clue_catalog: Dict) -> str:
+    # 同一地点内按获得顺序排列
+    collected = dict.fromkeys(d_state["inventory"]["clues_collected"])
     if not collected:
         return "**〔线索档案〕**\n\n尚未收集到任何线索。"
 
     # 按地点分组
     groups: Dict[str, List] = {}
     for cid in collected:
-        clue = objective_clues_db.get(cid)
+        clue = clue_catalog.get(cid)
         if not clue:
             continue
         loc = clue.get("location", "其他")
@@ -210,7 +284,6 @@ def _format_clues(d_state: Dict, objective_clues_db: Dict) -> str:
 
 
 def _format_inferences(d_state: Dict) -> str:
-    from inference_engine import get_all_unlocked
     infs = get_all_unlocked(d_state)
     if not infs:
         return (
@@ -230,14 +303,14 @@ def _format_inferences(d_state: Dict) -> str:
 
 
 def _format_timeline(d_state: Dict) -> str:
-    collected = set(d_state["inventory"]["clues_collected"])
+    visible_idx = _visible_timeline(d_state)
 
     lines = ["**〔当晚时间线〕**\n"]
     current_time = None
     has_any = False
 
-    for entry in TIMELINE_ENTRIES:
-        visible = entry["required_clues"].issubset(collected)
+    for i, entry in enumerate(TIMELINE_ENTRIES):
+        visible = i in visible_idx
         time_label = entry["time"]
 
         if time_label != current_time:
@@ -259,8 +332,4 @@ def _format_timeline(d_state: Dict) -> str:
 
 
 def _count_visible_timeline(d_state: Dict) -> int:
-    collected = set(d_state["inventory"]["clues_collected"])
-    return sum(
-        1 for e in TIMELINE_ENTRIES
-        if e["required_clues"].issubset(collected) and e["secret"]
-    )
+    return sum(1 for i in _visible_timeline(d_state) if TIMELINE_ENTRIES[i]["secret"])
@@ -0,0 +1,283 @@
+"""
+session_store.py
+服务端存档（可选）：令牌只携带签名过的 会话ID + 版本号
+
+默认模式下整份 dynamic_state 加密后放在令牌里，每轮随请求上传、随响应下发；
+后期对话历史、陈述、NPC 探索记录累积起来，令牌会涨到几十 KB。
+开启服务端存档（STATE_STORE=server）后：
+  - 令牌格式：s1.<会话ID>.<版本>.<签名>，签名为 HMAC-SHA256（密钥由 GAME_SECRET_KEY 派生）
+  - 存档本体存在内存 LRU（序列化后的 bytes），后台线程批量写入 SQLite，重启后仍可恢复
+  - 每轮保存产生新版本；每个会话保留最近 keep_versions 个版本，
+    客户端重试 / 双击提交旧令牌时仍能读到对应的存档
+  - 版本号按会话单调分配（记录每个会话已发出的最高版本）：同一个旧令牌被提交两次
+    （双击、两个标签页）时两次保存拿到不同版本，已发出的令牌永远指向同一份存档
+  - 超过 ttl 未访问的会话从内存和 SQLite 中清除
+
+部署限制：只支持单个 worker 进程。
+  存档先写内存，flush_interval 后才由后台线程写进 SQLite；其他进程在此之前读不到，
+  版本号分配也只在本进程内有效。多 worker 时请用默认的 token 模式。
+
+对外接口：
+  is_session_token(token)              → 是否为 s1 令牌
+  SessionStore(secret, db_path, max_entries, ttl, keep_versions)   # 构造时不碰磁盘
+      .open()                          → 建表并启动后台写入线程（main 在 lifespan 里调用）
+      .save(session_id, version, data) → 新令牌（session_id 为 None 时新建会话）
+      .load(token)                     → (session_id, version, data)；无效 / 过期抛 SessionError
+      .stats()
+      .close()                         → 写完积压的数据后关闭
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "s1"
+
+
+class SessionError(Exception):
+    """令牌签名错误、存档不存在或已过期。"""
+
+
+def is_session_token(token: Optional[str]) -> bool:
+    return bool(token) and token.startswith(TOKEN_PREFIX + ".")
+
+
+class SessionStore:
+    def __init__(self, secret: bytes, db_path: Optional[str] = "sessions.db",
+                 max_entries: int = 2048, ttl: float = 7 * 86400, keep_versions: int = 3,
+                 flush_interval: float = 0.5):
+        """
+        secret:        签名密钥（由 GAME_SECRET_KEY 派生）
+        db_path:       SQLite 文件，为空则只存内存（重启即丢失）
+        max_entries:   内存中最多保留多少个存档版本
+        ttl:           会话多久未访问后过期（秒）
+        keep_versions: 每个会话保留的历史版本数
+        """
+        self._key = hashlib.sha256(b"session-token:" + secret).digest()
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._keep_versions = keep_versions
+        self._flush_interval = flush_interval
+        # (会话ID, 版本) → (最后访问时间, data)
+        self._memory: "OrderedDict[Tuple[str, int], Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, int], Tuple[float, bytes]] = {}   # 待写入 SQLite
+        self._latest: Dict[str, Tuple[int, float]] = {}   # 会话ID → (已发出的最高版本, 最后访问时间)
+        self._last_prune = time.time()
+        self._counts = {"saves": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "bad_tokens": 0}
+
+        self._db_path = db_path
+        self._wake: "queue.Queue[bool]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._opened = False
+
+    def open(self):
+        """打开 SQLite 并启动后台写入线程；只存内存时只做标记。重复调用无副作用。"""
+        if self._opened:
+            return
+        if self._db_path:
+            self._read_conn = self._connect()
+            self._read_conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT NOT NULL,"
+                " version INTEGER NOT NULL,"
+                " data BLOB NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (session_id, version))"
+            )
+            self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+            self._writer.start()
+        self._opened = True
+
+    def _require_open(self):
+        if not self._opened:
+            raise RuntimeError("SessionStore 尚未 open()")
+
+    # ---------- 令牌 ----------
+
+    def _sign(self, body: str) -> str:
+        mac = hmac.new(self._key, body.encode(), hashlib.sha256).digest()[:16]
+        return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+    def _make_token(self, session_id: str, version: int) -> str:
+        body = f"{TOKEN_PREFIX}.{session_id}.{version}"
+        return f"{body}.{self._sign(body)}"
+
+    def _parse_token(self, token: str) -> Tuple[str, int]:
+        parts = token.split(".")
+        if len(parts) != 4 or parts[0] != TOKEN_PREFIX:
+            raise SessionError("令牌格式错误")
+        body = ".".join(parts[:3])
+        if not hmac.compare_digest(self._sign(body), parts[3]):
+            raise SessionError("令牌签名错误")
+        try:
+            return parts[1], int(parts[2])
+        except ValueError:
+            raise SessionError("令牌格式错误")
+
+    # ---------- 读写 ----------
+
+    def _seen(self, session_id: str, version: int, now: float):
+        """记录会话已存在的版本（调用方持有 _lock）。"""
+        latest = self._latest.get(session_id)
+        self._latest[session_id] = (max(version, latest[0] if latest else 0), now)
+
+    def _prune_latest(self, now: float):
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        for sid in [sid for sid, (_, ts) in self._latest.items() if now - ts >= self._ttl]:
+            del self._latest[sid]
+
+    def save(self, session_id: Optional[str], version: int, data: bytes) -> str:
+        """version 为读取时的版本；新版本号取该会话已发出的最高版本 + 1。"""
+        self._require_open()
+        session_id = session_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            latest = self._latest.get(session_id)
+            version = max(version, latest[0] if latest else 0) + 1
+            self._latest[session_id] = (version, now)
+            self._prune_latest(now)
+            key = (session_id, version)
+            self._memory[key] = (now, data)
+            self._memory.move_to_end(key)
+            # 同一会话只保留最近几个版本
+            stale = (session_id, version - self._keep_versions)
+            self._memory.pop(stale, None)
+            while len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+            if self._writer is not None:
+                self._pending[key] = (now, data)
+            self._counts["saves"] += 1
+        if self._writer is not None:
+            self._wake.put(True)
+        return self._make_token(session_id, version)
+
+    def load(self, token: str) -> Tuple[str, int, bytes]:
+        self._require_open()
+        try:
+            session_id, version = self._parse_token(token)
+        except SessionError:
+            self._counts["bad_tokens"] += 1
+            raise
+        key = (session_id, version)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] < self._ttl:
+                self._memory[key] = (now, entry[1])
+                self._memory.move_to_end(key)
+                self._seen(session_id, version, now)
+                self._counts["memory_hits"] += 1
+                return session_id, version, entry[1]
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._seen(session_id, version, now)
+        if pending is not None:
+            return session_id, version, pending[1]
+        if self._db_path:
+            with self._lock:
+                row = self._read_conn.execute(
+                    "SELECT data, updated_at FROM sessions WHERE session_id = ? AND version = ?",
+                    (session_id, version)
+                ).fetchone()
+                # 重启后首次读到该会话：从库里恢复已发出的最高版本，避免新版本号与旧存档冲突
+                max_version = None
+                if row is not None and session_id not in self._latest:
+                    max_version = self._read_conn.execute(
+                        "SELECT MAX(version) FROM sessions WHERE session_id = ?", (session_id,)
+                    ).fetchone()[0]
+            if row is not None and now - row[1] < self._ttl:
+                data = bytes(row[0])
+                with self._lock:
+                    self._seen(session_id, max(version, max_version or 0), now)
+                    self._memory[key] = (now, data)
+                    self._memory.move_to_end(key)
+                    while len(self._memory) > self._max_entries:
+                        self._memory.popitem(last=False)
+                self._counts["disk_hits"] += 1
+                return session_id, version, data
+        self._counts["misses"] += 1
+        raise SessionError("存档不存在或已过期")
+
+    # ---------- SQLite 后台写入 ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=5.0, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _flush(self, conn: sqlite3.Connection):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        conn.execute("BEGIN")
+        try:
+            # 已发出的令牌必须一直指向同一份存档：同一版本已存在时不覆盖
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO sessions (session_id, version, data, updated_at) VALUES (?, ?, ?, ?)",
+                [(sid, ver, data, ts) for (sid, ver), (ts, data) in batch.items()]
+            )
+            conflicts = len(batch) - (conn.total_changes - before)
+            if conflicts:
+                logger.warning("%d 个存档版本已存在，未覆盖（是否有多个 worker 共用同一个库？）", conflicts)
+            conn.executemany(
+                "DELETE FROM sessions WHERE session_id = ? AND version <= ?",
+                [(sid, ver - self._keep_versions) for sid, ver in batch]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            # 写失败：放回待写队列，下次再试（不覆盖更新的数据）
+            with self._lock:
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+            raise
+
+    def _write_loop(self):
+        conn = self._connect()
+        last_purge = 0.0
+        running = True
+        while running:
+            running = self._wake.get()
+            time.sleep(self._flush_interval)     # 攒一批再写
+            while not self._wake.empty():
+                running = self._wake.get_nowait() and running
+            try:
+                self._flush(conn)
+                if time.time() - last_purge > 3600:
+                    conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self._ttl,))
+                    last_purge = time.time()
+            except sqlite3.Error:
+                logger.exception("存档写入 SQLite 失败，稍后重试")
+        conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counts, entries=len(self._memory), pending_writes=len(self._pending))
+
+    def close(self):
+        if self._writer is not None:
+            self._wake.put(False)
+            self._writer.join(timeout=10)
+            self._writer = None
+        if self._read_conn is not None:
+            self._read_conn.close()
+            self._read_conn = None
+        self._opened = False
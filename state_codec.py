@@ -0,0 +1,356 @@
+"""
+state_codec.py
+存档的紧凑二进制编码（替代 JSON，供 encrypt_state 使用）
+
+JSON 存档里反复出现 "clues_collected"、"clue_012"、"npc_zhaohu"、中文房间名等字符串。
+二进制编码把已知 ID 换成小整数（下标来自注册表文件 state_registry.json），
+把计数器、信任值等换成定长整数，集合类字段用位图：
+
+  [1B 版本][2B 注册表代号][2B 字段位图][各字段...][剩余字段的 JSON（extras）]
+
+注册表（StateRegistry）：
+  - 线索 / NPC / 地点 / 推断四张 ID 表，只能在末尾追加，已有 ID 的下标永不改变
+  - 每次追加记一个新「代号」（generation），即当时各表的长度；存档头里写编码时的代号，
+    解码时取各表对应长度的前缀，所以新增线索、房间、NPC 后旧存档照样能解
+  - 文件随代码提交；新增 ID 后运行 python state_codec.py 追加新代号
+    （未登记的 ID 仍能存，只是落进 extras，启动时 main.py 会打 warning）
+  - 每张表最多 254 项（单字节下标，0xFF 表示缺失）；最新代号超出时 can_encode 为 False，
+    state_token 改用 JSON 存档并打 warning，旧代号的 binary 存档照样能解
+
+其余规则：
+  - 编码不了的字段（出现未知 ID、类型不符、自由文本如对话历史）原样放进 extras
+  - clues_collected 的顺序玩家可见（卷宗按获得顺序展示），用有序小整数列表而不是位图
+  - inferences_unlocked / trust_clues_triggered 只有在顺序与注册表一致时才用位图，
+    否则放 extras，保证解码结果与原存档完全一致
+
+对外接口：
+  CODEC_VERSION                      → 编码结果的首字节（JSON 存档首字节为 "{"）
+  is_encoded(raw)                    → 是否为本模块编码的数据
+  StateRegistry.load(path) / .save(path)
+      .generation                    → 最新代号（从 1 开始）
+      .missing(**ids)                → {表名: 未登记的 ID}
+      .extend(**ids)                 → 追加未登记的 ID，有新增时生成新代号；返回新增的 ID
+  StateCodec(registry)
+      .can_encode    → 最新代号能否用单字节下标编码
+      .encode(state) → bytes（使用最新代号）；can_encode 为 False 时抛 StateCodecError
+      .decode(data)  → state dict；版本 / 代号无法识别或数据损坏时抛 StateCodecError
+"""
+
+import json
+import struct
+from typing import Dict, List, Optional, Sequence
+
+CODEC_VERSION = 2
+_NONE = 0xFF   # 单字节字段中表示 None / 缺失
+
+TABLES = ("clues", "npcs", "locations", "inferences")
+
+
+class StateCodecError(Exception):
+    pass
+
+
+def is_encoded(raw: bytes) -> bool:
+    return raw[:1] == bytes([CODEC_VERSION])
+
+
+def _is_small_int(v) -> bool:
+    return type(v) is int and 0 <= v < _NONE
+
+
+# ==========================================
+# 📒 注册表（append-only）
+# ==========================================
+
+class StateRegistry:
+    def __init__(self, tables: Dict[str, List[str]], generations: List[Dict[str, int]]):
+        self.tables = {name: list(tables.get(name, [])) for name in TABLES}
+        self.generations = [dict(g) for g in generations]
+
+    @classmethod
+    def load(cls, path: str) -> "StateRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        return cls(raw["tables"], raw["generations"])
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"generations": self.generations, "tables": self.tables},
+                      f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    @property
+    def generation(self) -> int:
+        return len(self.generations)
+
+    def view(self, generation: int) -> Dict[str, List[str]]:
+        """该代号下的各表（当时长度的前缀）。"""
+        lengths = self.generations[generation - 1]
+        return {name: self.tables[name][:lengths[name]] for name in TABLES}
+
+    def missing(self, **ids: Sequence[str]) -> Dict[str, List[str]]:
+        out = {}
+        for name, values in ids.items():
+            known = set(self.tables[name])
+            new = [v for v in dict.fromkeys(values) if v not in known]
+            if new:
+                out[name] = new
+        return out
+
+    def extend(self, **ids: Sequence[str]) -> Dict[str, List[str]]:
+        added = self.missing(**ids)
+        for name, values in added.items():
+            self.tables[name].extend(values)
+        if added or not self.generations:
+            self.generations.append({name: len(self.tables[name]) for name in TABLES})
+        return added
+
+
+# ==========================================
+# 🧱 某一代号下的编码布局
+# ==========================================
+
+class _Table:
+    """ID ↔ 小整数"""
+
+    def __init__(self, ids: Sequence[str]):
+        self.ids: List[str] = list(ids)
+        if len(self.ids) >= _NONE:
+            raise StateCodecError(f"注册表超过 {_NONE - 1} 项，单字节编码放不下")
+        self.index: Dict[str, int] = {v: i for i, v in enumerate(self.ids)}
+
+    def bitset(self, values: List[str]) -> Optional[bytes]:
+        """values 必须无重复且按注册表顺序排列，否则返回 None。"""
+        last = -1
+        bits = bytearray((len(self.ids) + 7) // 8)
+        for v in values:
+            i = self.index.get(v)
+            if i is None or i <= last:
+                return None
+            last = i
+            bits[i >> 3] |= 1 << (i & 7)
+        return bytes(bits)
+
+    def from_bitset(self, bits: bytes) -> List[str]:
+        return [v for i, v in enumerate(self.ids) if bits[i >> 3] & (1 << (i & 7))]
+
+    @property
+    def bitset_size(self) -> int:
+        return (len(self.ids) + 7) // 8
+
+
+class _Layout:
+    def __init__(self, tables: Dict[str, List[str]]):
+        self.clues = _Table(tables["clues"])
+        self.npcs = _Table(tables["npcs"])
+        self.locations = _Table(tables["locations"])
+        self.inferences = _Table(tables["inferences"])
+
+        # 字段顺序即位图顺序，只能在末尾追加；改动需要提升 CODEC_VERSION
+        self.fields = [
+            ("day", self._enc_u8, self._dec_u8),
+            ("time_idx", self._enc_u8, self._dec_u8),
+            ("ap_used_this_cycle", self._enc_u8, self._dec_u8),
+            ("game_over", self._enc_bool, self._dec_bool),
+            ("tribunal_count", self._enc_u8, self._dec_u8),
+            ("room_inspect_count", self._enc_u8, self._dec_u8),
+            ("current_location", self._enc_location, self._dec_location),
+            ("npc_locations", self._enc_npc_locations, self._dec_npc_locations),
+            ("npc_trust", self._enc_npc_trust, self._dec_npc_trust),
+            ("inventory", self._enc_inventory, self._dec_inventory),
+            ("inferences_unlocked", self._enc_inferences, self._dec_inferences),
+            ("trust_clues_triggered", self._enc_trust_clues, self._dec_trust_clues),
+            ("temp_accuse_target", self._enc_npc_or_none, self._dec_npc_or_none),
+            ("last_talk_npc", self._enc_npc_or_none, self._dec_npc_or_none),
+        ]
+
+    # ---------- 单字段编解码：编码失败返回 None（该字段改放 extras） ----------
+
+    @staticmethod
+    def _enc_u8(v):
+        return bytes([v]) if _is_small_int(v) else None
+
+    @staticmethod
+    def _dec_u8(buf, pos):
+        return buf[pos], pos + 1
+
+    @staticmethod
+    def _enc_bool(v):
+        return bytes([v]) if type(v) is bool else None
+
+    @staticmethod
+    def _dec_bool(buf, pos):
+        return bool(buf[pos]), pos + 1
+
+    def _enc_location(self, v):
+        i = self.locations.index.get(v) if isinstance(v, str) else None
+        return None if i is None else bytes([i])
+
+    def _dec_location(self, buf, pos):
+        return self.locations.ids[buf[pos]], pos + 1
+
+    def _enc_npc_or_none(self, v):
+        if v is None:
+            return bytes([_NONE])
+        i = self.npcs.index.get(v) if isinstance(v, str) else None
+        return None if i is None else bytes([i])
+
+    def _dec_npc_or_none(self, buf, pos):
+        i = buf[pos]
+        return (None if i == _NONE else self.npcs.ids[i]), pos + 1
+
+    def _enc_per_npc(self, mapping, encode_value):
+        """{npc_id: 值} → 按 NPC 注册表顺序每人 1 字节，缺失为 0xFF。"""
+        if not isinstance(mapping, dict) or any(k not in self.npcs.index for k in mapping):
+            return None
+        out = bytearray([_NONE]) * len(self.npcs.ids)
+        for npc_id, value in mapping.items():
+            b = encode_value(value)
+            if b is None:
+                return None
+            out[self.npcs.index[npc_id]] = b
+        return bytes(out)
+
+    def _dec_per_npc(self, buf, pos, decode_value):
+        n = len(self.npcs.ids)
+        mapping = {self.npcs.ids[i]: decode_value(b) for i, b in enumerate(buf[pos:pos + n]) if b != _NONE}
+        return mapping, pos + n
+
+    def _enc_npc_locations(self, v):
+        return self._enc_per_npc(v, lambda loc: self.locations.index.get(loc) if isinstance(loc, str) else None)
+
+    def _dec_npc_locations(self, buf, pos):
+        return self._dec_per_npc(buf, pos, lambda b: self.locations.ids[b])
+
+    def _enc_npc_trust(self, v):
+        return self._enc_per_npc(v, lambda t: t if _is_small_int(t) else None)
+
+    def _dec_npc_trust(self, buf, pos):
+        return self._dec_per_npc(buf, pos, lambda b: b)
+
+    def _enc_inventory(self, v):
+        # 目前 inventory 只有 clues_collected；出现其它键就整体放 extras
+        if not isinstance(v, dict) or set(v) != {"clues_collected"}:
+            return None
+        clues = v["clues_collected"]
+        if not isinstance(clues, list) or len(clues) >= 256:
+            return None
+        idx = [self.clues.index.get(c) for c in clues]
+        if None in idx:
+            return None
+        return bytes([len(idx)] + idx)
+
+    def _dec_inventory(self, buf, pos):
+        n = buf[pos]
+        clues = [self.clues.ids[i] for i in buf[pos + 1:pos + 1 + n]]
+        return {"clues_collected": clues}, pos + 1 + n
+
+    def _enc_inferences(self, v):
+        return self.inferences.bitset(v) if isinstance(v, list) else None
+
+    def _dec_inferences(self, buf, pos):
+        end = pos + self.inferences.bitset_size
+        return self.inferences.from_bitset(buf[pos:end]), end
+
+    def _enc_trust_clues(self, v):
+        return self.clues.bitset(v) if isinstance(v, list) else None
+
+    def _dec_trust_clues(self, buf, pos):
+        end = pos + self.clues.bitset_size
+        return self.clues.from_bitset(buf[pos:end]), end
+
+
+# ==========================================
+# 📦 编解码
+# ==========================================
+
+class StateCodec:
+    def __init__(self, registry: StateRegistry):
+        if not registry.generations:
+            raise ValueError("存档注册表为空")
+        self.registry = registry
+        self.generation = registry.generation
+        self._layouts: Dict[int, _Layout] = {}
+
+    @property
+    def can_encode(self) -> bool:
+        try:
+            self._layout(self.generation)
+        except StateCodecError:
+            return False
+        return True
+
+    def _layout(self, generation: int) -> _Layout:
+        layout = self._layouts.get(generation)
+        if layout is None:
+            if not 1 <= generation <= self.registry.generation:
+                raise StateCodecError(f"存档使用的注册表代号 g{generation} 不存在（当前最新 g{self.generation}）")
+            layout = self._layouts[generation] = _Layout(self.registry.view(generation))
+        return layout
+
+    def encode(self, state: Dict) -> bytes:
+        layout = self._layout(self.generation)
+        dynamic = dict(state.get("dynamic_state", {}))
+        present = 0
+        body = bytearray()
+        for bit, (key, enc, _) in enumerate(layout.fields):
+            if key not in dynamic:
+                continue
+            b = enc(dynamic[key])
+            if b is None:
+                continue
+            present |= 1 << bit
+            body += b
+            del dynamic[key]
+        top = {k: v for k, v in state.items() if k != "dynamic_state"}
+        extras = {}
+        if top:
+            extras["t"] = top
+        if dynamic:
+            extras["d"] = dynamic
+        if "dynamic_state" not in state:
+            extras["no_ds"] = True
+        tail = json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode() if extras else b""
+        return struct.pack("<BHH", CODEC_VERSION, self.generation, present) + bytes(body) + tail
+
+    def _read_header(self, data: bytes):
+        if data[:1] == bytes([CODEC_VERSION]) and len(data) >= 5:
+            _, generation, present = struct.unpack_from("<BHH", data)
+            return self._layout(generation), present, 5
+        raise StateCodecError("不支持的存档编码版本")
+
+    def decode(self, data: bytes) -> Dict:
+        layout, present, pos = self._read_header(data)
+        dynamic = {}
+        try:
+            for bit, (key, _, dec) in enumerate(layout.fields):
+                if present & (1 << bit):
+                    dynamic[key], pos = dec(data, pos)
+            extras = json.loads(data[pos:].decode()) if pos < len(data) else {}
+        except (IndexError, ValueError) as e:
+            raise StateCodecError(f"存档数据损坏：{e}")
+        dynamic.update(extras.get("d", {}))
+        state = dict(extras.get("t", {}))
+        if not extras.get("no_ds"):
+            state["dynamic_state"] = dynamic
+        return state
+
+
+if __name__ == "__main__":
+    # 新增线索 / NPC / 地点 / 推断后运行：把未登记的 ID 追加进注册表文件（生成新代号）
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="更新存档编码注册表")
+    parser.add_argument("--path", default=os.getenv("STATE_REGISTRY_FILE", "state_registry.json"))
+    args = parser.parse_args()
+
+    # 只读游戏数据，不加载游戏服务（main.py）
+    from game_data import state_registry_ids
+    registry = StateRegistry.load(args.path) if os.path.exists(args.path) else StateRegistry({}, [])
+    added = registry.extend(**state_registry_ids())
+    if added:
+        registry.save(args.path)
+        print(f"已追加 {sum(map(len, added.values()))} 个 ID → 代号 g{registry.generation}：{added}")
+    else:
+        print(f"注册表已是最新（g{registry.generation}）")
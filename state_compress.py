@@ -0,0 +1,84 @@
+"""
+state_compress.py
+存档压缩：zlib + 预置字典（preset dictionary）
+
+每局存档都包含同样的键名、NPC ID、线索 ID、房间名，短存档几乎压不动。
+用 train_state_dict.py 从样本存档训练出字典，压缩时作为 zdict 传给 zlib，
+这些公共片段只需一个回溯引用即可表示。
+
+格式：
+  带字典：[0xD1][1B 字典版本][zlib 数据]
+  旧格式：纯 zlib 数据（首字节 0x78），或未压缩的原文
+  0xD1 不是合法的 zlib 头（低 4 位不是 8），不会和旧格式混淆。
+
+字典文件：<dict_dir>/state_v<版本>.zdict。重新训练时生成新版本，旧版本文件保留，
+已发出的令牌仍可解压。
+
+对外接口：
+  StateCompressor(dict_dir, version=None)   # version=0 表示不用字典
+      .compress(raw)    → bytes（无字典时退化为普通 zlib）
+      .decompress(blob) → raw；未知字典版本抛 UnknownDictionaryError（StateCodecError 的子类）
+      .version          → 当前用于压缩的字典版本（None 表示不用字典）
+  dict_path(dict_dir, version) → 字典文件路径
+"""
+
+import os
+import re
+import zlib
+from typing import Dict, Optional
+
+from state_codec import StateCodecError
+
+FRAME_MAGIC = 0xD1
+_DICT_RE = re.compile(r"^state_v(\d+)\.zdict$")
+
+
+class UnknownDictionaryError(StateCodecError):
+    """令牌是真的，但压缩时用的字典本机没有（字典文件丢失 / 回滚到了更早的版本）。"""
+
+
+def dict_path(dict_dir: str, version: int) -> str:
+    return os.path.join(dict_dir, f"state_v{version}.zdict")
+
+
+def load_dictionaries(dict_dir: str) -> Dict[int, bytes]:
+    dicts = {}
+    if not os.path.isdir(dict_dir):
+        return dicts
+    for name in os.listdir(dict_dir):
+        m = _DICT_RE.match(name)
+        if m:
+            with open(os.path.join(dict_dir, name), "rb") as f:
+                dicts[int(m.group(1))] = f.read()
+    return dicts
+
+
+class StateCompressor:
+    def __init__(self, dict_dir: str, version: Optional[int] = None):
+        """version 为空时使用目录中版本号最大的字典，为 0 时压缩不用字典（仍能解压带字典的数据）。"""
+        self._dicts = load_dictionaries(dict_dir)
+        if version is None and self._dicts:
+            version = max(self._dicts)
+        if version == 0:
+            version = None
+        if version is not None and version not in self._dicts:
+            raise ValueError(f"找不到存档压缩字典 v{version}（{dict_dir}）")
+        self.version = version
+
+    def compress(self, raw: bytes) -> bytes:
+        if self.version is None:
+            return zlib.compress(raw)
+        c = zlib.compressobj(level=9, zdict=self._dicts[self.version])
+        return bytes([FRAME_MAGIC, self.version]) + c.compress(raw) + c.flush()
+
+    def decompress(self, blob: bytes) -> bytes:
+        if blob[:1] == bytes([FRAME_MAGIC]):
+            zdict = self._dicts.get(blob[1])
+            if zdict is None:
+                raise UnknownDictionaryError(f"未知的存档压缩字典 v{blob[1]}")
+            d = zlib.decompressobj(zdict=zdict)
+            return d.decompress(blob[2:]) + d.flush()
+        try:
+            return zlib.decompress(blob)
+        except zlib.error:
+            return blob  # 兼容旧的未压缩 state
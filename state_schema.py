@@ -0,0 +1,141 @@
+"""
+state_schema.py
+存档结构版本与迁移
+
+dynamic_state 的所有字段及默认值都在这里声明（default_dynamic_state）。
+存档顶层带 schema_version；旧令牌（没有该字段，视为版本 0）解密后按顺序执行迁移函数，
+升级到 SCHEMA_VERSION。已是最新版本的存档只做一次整数比较。
+
+新增字段的做法：
+  1. 在 default_dynamic_state 里加上默认值
+  2. SCHEMA_VERSION + 1，并用 @migration(新版本) 注册一个迁移函数补上该字段
+  handler 里直接读写 d_state[字段]，不再各自 setdefault。
+
+对外接口：
+  SCHEMA_VERSION
+  StateSchemaError
+  new_game_state(npc_ids, locations)  → 新开局的存档
+  upgrade(state, npc_ids)             → 原地升级到最新版本并返回 state；版本比代码新时抛 StateSchemaError
+"""
+
+import random
+from typing import Callable, Dict, List, Sequence
+
+SCHEMA_VERSION = 2
+
+# 开局时固定位置的 NPC（其余随机分布）
+INITIAL_NPC_LOCATIONS = {
+    "npc_lidefu": "李德福房间",
+}
+
+INITIAL_NPC_TRUST = {
+    "npc_lidefu": 30,     # 李德福天生对玩家警惕
+    "npc_zhaohu": 20,     # 赵虎把玩家当威胁
+    "npc_guqiong": 10,    # 顾琼敌视官差
+    "npc_hanzijing": 40,  # 韩子敬胆小但无恶意
+    "npc_qingxuzi": 45    # 清虚子想利用玩家洗清嫌疑
+}
+
+
+class StateSchemaError(Exception):
+    pass
+
+
+def default_dynamic_state(npc_ids: Sequence[str]) -> Dict:
+    """dynamic_state 全部字段的默认值（每次返回新对象）。npc_locations 由 new_game_state 随机生成。"""
+    return {
+        "day": 1,
+        "current_location": "大堂",
+        "time_idx": 4,
+        "ap_used_this_cycle": 0,
+        "inventory": {"clues_collected": []},
+        "npc_locations": {},
+        "game_over": False,
+        "temp_accuse_target": None,
+        "conversation_history": {},
+        "confrontation_used": {},
+        "npc_activities": {
+            npc_id: {"discovered": [], "theory": "", "last_action": ""}
+            for npc_id in npc_ids
+        },
+        "tribunal_count": 0,
+        "inferences_unlocked": [],
+        "trust_clues_triggered": [],
+        "npc_statements": {},
+        "npc_trust": dict(INITIAL_NPC_TRUST),
+        # v2
+        "search_counts": {},          # "房间:家具" → 搜查次数
+        "search_penalty": {},         # 房间 → 被撞见后的搜查惩罚
+        "pending_trust_clues": [],    # 待玩家接收的信任线索
+        "room_inspect_count": 0,
+        "last_talk_npc": None,
+    }
+
+
+def new_game_state(npc_ids: Sequence[str], locations: Sequence[str]) -> Dict:
+    d_state = default_dynamic_state(npc_ids)
+    d_state["npc_locations"] = {npc_id: random.choice(locations) for npc_id in npc_ids}
+    d_state["npc_locations"].update(INITIAL_NPC_LOCATIONS)
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "player_name": "李密卫",
+        "dynamic_state": d_state,
+    }
+
+
+# ─────────────────────────────────────────────
+#  迁移：MIGRATIONS[i] 把版本 i 的存档升级到 i + 1
+# ─────────────────────────────────────────────
+MIGRATIONS: List[Callable[[Dict, Sequence[str]], None]] = []
+
+
+def migration(version: int):
+    """注册升级到 version 的迁移函数；必须按版本顺序注册。"""
+    def register(func):
+        if version != len(MIGRATIONS) + 1:
+            raise ValueError(f"迁移版本不连续：期望 v{len(MIGRATIONS) + 1}，得到 v{version}")
+        MIGRATIONS.append(func)
+        return func
+    return register
+
+
+def _fill(d_state: Dict, npc_ids: Sequence[str], fields: Sequence[str]):
+    defaults = default_dynamic_state(npc_ids)
+    for key in fields:
+        if key not in d_state:
+            d_state[key] = defaults[key]
+
+
+@migration(1)
+def _add_core_fields(d_state: Dict, npc_ids: Sequence[str]):
+    """无版本号的旧令牌：补上早期逐步加入的字段。"""
+    _fill(d_state, npc_ids, [
+        "day", "game_over", "conversation_history", "confrontation_used", "npc_activities",
+        "npc_trust", "tribunal_count", "inferences_unlocked", "trust_clues_triggered", "npc_statements",
+    ])
+
+
+@migration(2)
+def _add_search_fields(d_state: Dict, npc_ids: Sequence[str]):
+    """原先由各 handler 按需 setdefault 的字段。"""
+    _fill(d_state, npc_ids, [
+        "search_counts", "search_penalty", "pending_trust_clues", "room_inspect_count", "last_talk_npc",
+        "temp_accuse_target",
+    ])
+
+
+if len(MIGRATIONS) != SCHEMA_VERSION:
+    raise RuntimeError("SCHEMA_VERSION 与已注册的迁移数量不一致")
+
+
+def upgrade(state: Dict, npc_ids: Sequence[str]) -> Dict:
+    version = state.get("schema_version", 0)
+    if version == SCHEMA_VERSION:
+        return state
+    if not isinstance(version, int) or version > SCHEMA_VERSION or version < 0:
+        raise StateSchemaError(f"不支持的存档版本：{version!r}")
+    d_state = state["dynamic_state"]
+    for migrate in MIGRATIONS[version:]:
+        migrate(d_state, npc_ids)
+    state["schema_version"] = SCHEMA_VERSION
+    return state
@@ -0,0 +1,85 @@
+"""
+state_token.py
+存档 ⇄ 客户端令牌：序列化（json / binary）→ 字典压缩 → Fernet 加密
+
+只依赖存档相关的几个模块，不 import main：main.py 用它生成 / 解开令牌，
+train_state_dict.py 这类离线工具也直接用它，不会连带创建 FastAPI 应用、LLM 客户端和数据库。
+配置与线上一致，都从环境变量读取（from_env）。
+
+对外接口：
+  StateTokens(secret_key, codec, state_codec, compressor)
+      .serialize(state) → bytes（去掉只在本次请求内使用的 "_session"）
+      .deserialize(raw) → state dict；binary 存档解不开时抛 StateCodecError
+      .encrypt(raw)     → 客户端令牌（压缩 + 加密）
+      .decrypt(token)   → raw；令牌无效抛 InvalidToken，字典版本未知抛 StateCodecError
+      .registry         → binary 编码用的注册表（state_codec.StateRegistry）
+  from_env()            → 按 GAME_SECRET_KEY / STATE_CODEC / STATE_REGISTRY_FILE /
+                          STATE_DICT_DIR / STATE_DICT_VERSION 构建
+"""
+
+import json
+import logging
+import os
+from typing import Dict
+
+from cryptography.fernet import Fernet
+
+from state_codec import StateCodec, StateRegistry, is_encoded
+from state_compress import StateCompressor
+
+logger = logging.getLogger(__name__)
+
+
+class StateTokens:
+    def __init__(self, secret_key: str, codec: str, state_codec: StateCodec, compressor: StateCompressor):
+        """
+        codec:       新存档的编码，json / binary；两种格式解码时都能识别。
+                     注册表超出 binary 容量时退回 json（打 warning），不影响启动
+        state_codec: binary 编码器
+        compressor:  存档压缩（预置字典）
+        """
+        if codec == "binary" and not state_codec.can_encode:
+            # 注册表长过了单字节下标：新存档改用 JSON，已发出的 binary 存档仍按原代号解码
+            logger.warning("存档注册表某张表超过 254 项，binary 编码已停用，改用 json")
+            codec = "json"
+        self.codec = codec
+        self.state_codec = state_codec
+        self.compressor = compressor
+        self._cipher = Fernet(secret_key.encode())
+
+    @property
+    def registry(self) -> StateRegistry:
+        return self.state_codec.registry
+
+    def serialize(self, state: Dict) -> bytes:
+        # "_session" 只在本次请求内记录会话ID与版本，不写进存档
+        payload = {k: v for k, v in state.items() if k != "_session"}
+        if self.codec == "binary":
+            return self.state_codec.encode(payload)
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def deserialize(self, raw: bytes) -> Dict:
+        if is_encoded(raw):
+            return self.state_codec.decode(raw)
+        return json.loads(raw.decode())
+
+    def encrypt(self, raw: bytes) -> str:
+        return self._cipher.encrypt(self.compressor.compress(raw)).decode()
+
+    def decrypt(self, token: str) -> bytes:
+        return self.compressor.decompress(self._cipher.decrypt(token.encode()))
+
+
+def from_env() -> StateTokens:
+    secret_key = os.getenv("GAME_SECRET_KEY")
+    if not secret_key:
+        raise RuntimeError("❌ 请在 .env 中设置 GAME_SECRET_KEY，否则重启后所有存档失效！")
+    # 存档压缩字典（train_state_dict.py 生成）；STATE_DICT_VERSION=0 关闭，缺省用最新版本
+    dict_version = os.getenv("STATE_DICT_VERSION")
+    return StateTokens(
+        secret_key,
+        codec=os.getenv("STATE_CODEC", "json"),
+        state_codec=StateCodec(StateRegistry.load(os.getenv("STATE_REGISTRY_FILE", "state_registry.json"))),
+        compressor=StateCompressor(os.getenv("STATE_DICT_DIR", "state_dicts"),
+                                   version=int(dict_version) if dict_version else None),
+    )
@@ -0,0 +1,59 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from binding_store import SqliteBindingBackend
+from json_cache import MtimeJsonFile
+
+
+def test_close_closes_every_thread_connection(tmp_path):
+    backend = SqliteBindingBackend(str(tmp_path / "bindings.db"))
+    assert backend.bind_many([("tok", "dev1")]) == {"tok": "dev1"}
+    worker = threading.Thread(target=backend.get, args=("tok",))
+    worker.start()
+    worker.join()
+    conns = list(backend._conns)
+    assert len(conns) == 2
+    backend.close()
+    for conn in conns:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_unbind(tmp_path):
+    backend = SqliteBindingBackend(str(tmp_path / "bindings.db"))
+    try:
+        backend.bind_many([("tok", "dev1")])
+        assert backend.unbind("tok")
+        assert backend.get("tok") is None
+        assert not backend.unbind("tok")
+    finally:
+        backend.close()
+
+
+def test_json_replace_is_atomic(tmp_path):
+    path = tmp_path / "token_bindings.json"
+    cache = MtimeJsonFile(str(path))
+    cache.replace({"tok": "dev1"})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"tok": "dev1"}
+    assert [p.name for p in tmp_path.iterdir()] == ["token_bindings.json"]
+
+
+def test_unbind_survives_reopen_with_legacy_json(tmp_path):
+    legacy = tmp_path / "token_bindings.json"
+    legacy.write_text(json.dumps({"tok": "dev1", "other": "dev2"}), encoding="utf-8")
+    db = str(tmp_path / "bindings.db")
+    backend = SqliteBindingBackend(db, legacy_json=str(legacy))
+    assert backend.get("tok") == "dev1"
+    assert backend.unbind("tok")
+    backend.close()
+
+    # 重启：旧 JSON 还在，但已导入过，解绑不能被撤销
+    backend = SqliteBindingBackend(db, legacy_json=str(legacy))
+    try:
+        assert backend.get("tok") is None
+        assert backend.get("other") == "dev2"
+    finally:
+        backend.close()
@@ -0,0 +1,46 @@
+import asyncio
+from types import SimpleNamespace
+
+from command_router import CommandRouter, parse_command
+
+
+def test_parse_command():
+    cmd = parse_command("CMD_INSPECT:灶房:水缸")
+    assert (cmd.verb, cmd.args, cmd.payload) == ("CMD_INSPECT", ("灶房", "水缸"), "灶房:水缸")
+    assert parse_command("CMD_EXIT").args == ()
+    cmd = parse_command("昨夜你在哪：后院？")
+    assert (cmd.verb, cmd.args, cmd.payload, cmd.raw) == ("昨夜你在哪：后院？", (), "", "昨夜你在哪：后院？")
+
+
+def _router(calls):
+    def handler(name):
+        async def handle(command, request, current_state, model_id):
+            calls.append((name, command))
+            return {"done": True}
+        return handle
+
+    router = CommandRouter()
+    router.register(["系统菜单"], handler("menu"), read_only=True)
+    router.register(["CMD_EXIT"], handler("exit"))
+    router.set_talk(handler("talk"))
+    router.set_fallback(handler("fallback"))
+    return router
+
+
+def _dispatch(router, user_input, npc_id=None):
+    request = SimpleNamespace(npc_id=npc_id)
+    command = parse_command(user_input)
+    asyncio.run(router.dispatch(command, request, {}, "m"))
+    return router.is_read_only(command, request)
+
+
+def test_free_talk_takes_precedence_over_plain_verbs():
+    calls = []
+    router = _router(calls)
+    # 与 NPC 聊天时输入"系统菜单"是对话内容，不打开菜单，也不能当只读跳过存档
+    assert _dispatch(router, "系统菜单", npc_id="npc_lidefu") is False
+    assert _dispatch(router, "系统菜单") is True
+    _dispatch(router, "CMD_EXIT:TALK", npc_id="npc_lidefu")
+    _dispatch(router, "随便说说")
+    assert [name for name, _ in calls] == ["talk", "menu", "exit", "fallback"]
+    assert calls[2][1].payload == "TALK"
@@ -0,0 +1,85 @@
+import random
+
+from conditional_clues import (
+    CONDITIONAL_CLUE_DB,
+    TRUST_CLUE_DB,
+    get_available_conditional_clues,
+    get_trust_triggered_clues,
+    is_location_lit,
+)
+from game_data import ALL_LOCATIONS, NPC_IDS, TIME_CYCLES
+
+
+def _scan_conditional(d_state, current_location, current_time, context="search"):
+    """建索引之前的实现：每次遍历整个 CONDITIONAL_CLUE_DB。"""
+    collected = set(d_state.get("inventory", {}).get("clues_collected", []))
+    results = []
+    for clue_id, config in CONDITIONAL_CLUE_DB.items():
+        if clue_id in collected or config["type"] == "trust":
+            continue
+        if current_location not in config.get("valid_locations", []):
+            continue
+        if config.get("trigger_context", "search") == "talk_with_npc":
+            if context != f"talk_with_npc:{config.get('trigger_npc', '')}":
+                continue
+        elif context.startswith("talk_with_npc:"):
+            continue
+        if config["type"] == "time" and current_time not in config.get("available_times", []):
+            continue
+        if not set(config.get("requires_clues", [])) <= collected:
+            continue
+        light_ok = is_location_lit(current_location, current_time) if config.get("light_required", False) else True
+        results.append({"clue_id": clue_id, "button_text": config["button_text"], "light_ok": light_ok})
+    return results
+
+
+def _scan_trust(d_state, current_time):
+    """时辰索引之前的实现：逐条检查全部信任线索。"""
+    collected = set(d_state.get("inventory", {}).get("clues_collected", []))
+    trust = d_state.get("npc_trust", {})
+    already_triggered = set(d_state.get("trust_clues_triggered", []))
+    results = []
+    for tc in TRUST_CLUE_DB:
+        if tc["clue_id"] in collected or tc["clue_id"] in already_triggered:
+            continue
+        if current_time not in tc["trigger_time"]:
+            continue
+        if trust.get(tc["npc_id"], 0) < tc["trust_threshold"]:
+            continue
+        results.append(tc)
+    return results
+
+
+def _clue_pool():
+    pool = set(CONDITIONAL_CLUE_DB)
+    for config in CONDITIONAL_CLUE_DB.values():
+        pool.update(config.get("requires_clues", []))
+        pool.add(config["clue_data"]["id"])
+    pool.update(tc["clue_id"] for tc in TRUST_CLUE_DB)
+    return sorted(pool)
+
+
+def test_conditional_index_matches_full_scan():
+    rng = random.Random(17)
+    pool = _clue_pool()
+    locations = sorted(set(ALL_LOCATIONS) | {loc for c in CONDITIONAL_CLUE_DB.values()
+                                             for loc in c.get("valid_locations", [])})
+    contexts = ["search", "talk_with_npc:npc_unknown"] + [f"talk_with_npc:{npc}" for npc in NPC_IDS]
+    for _ in range(3000):
+        d_state = {"inventory": {"clues_collected": rng.sample(pool, rng.randint(0, len(pool)))}}
+        args = (d_state, rng.choice(locations), rng.choice(TIME_CYCLES), rng.choice(contexts))
+        assert get_available_conditional_clues(*args) == _scan_conditional(*args)
+
+
+def test_trust_time_index_matches_full_scan():
+    rng = random.Random(18)
+    pool = _clue_pool()
+    trust_ids = [tc["clue_id"] for tc in TRUST_CLUE_DB]
+    for _ in range(5000):
+        d_state = {
+            "inventory": {"clues_collected": rng.sample(pool, rng.randint(0, 6))},
+            "npc_trust": {npc: rng.randint(0, 100) for npc in NPC_IDS if rng.random() < 0.9},
+            "trust_clues_triggered": rng.sample(trust_ids, rng.randint(0, len(trust_ids))),
+        }
+        current_time = rng.choice(TIME_CYCLES)
+        assert get_trust_triggered_clues(d_state, current_time) == _scan_trust(d_state, current_time)
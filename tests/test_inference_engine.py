@@ -0,0 +1,36 @@
+import random
+
+from inference_engine import INFERENCE_DB, ClueRuleIndex, check_new_inferences
+
+
+def _reference(collected, already):
+    """原先的全量扫描：按 INFERENCE_DB 顺序检查每条未解锁推断。"""
+    return [inf_id for inf_id, inf in INFERENCE_DB.items()
+            if inf_id not in already and inf["required_clues"].issubset(collected)]
+
+
+def test_incremental_matches_full_scan_on_random_sequences():
+    clue_pool = sorted({c for inf in INFERENCE_DB.values() for c in inf["required_clues"]})
+    clue_pool += ["clue_unrelated_a", "clue_unrelated_b"]
+    rng = random.Random(20261016)
+    for _ in range(3000):
+        order = rng.sample(clue_pool, rng.randint(1, len(clue_pool)))
+        d_state = {"inventory": {"clues_collected": []}, "inferences_unlocked": []}
+        for clue_id in order:
+            expected = _reference(set(d_state["inventory"]["clues_collected"] + [clue_id]),
+                                  set(d_state["inferences_unlocked"]))
+            d_state["inventory"]["clues_collected"].append(clue_id)
+            triggered = check_new_inferences(d_state, [clue_id])
+            assert [inf["id"] for inf in triggered] == expected
+            # 不指定新线索时全量检查：不会再触发已解锁的推断
+            assert check_new_inferences(d_state) == []
+        assert d_state["inferences_unlocked"] == [i for i in INFERENCE_DB if i in d_state["inferences_unlocked"]]
+
+
+def test_index_ignores_unknown_clues_and_keeps_rule_order():
+    index = ClueRuleIndex({"r2": ["a", "b"], "r1": ["b"], "r3": ["c"]})
+    assert index.satisfied(["b", "a", "x"]) == ["r2", "r1"]
+    assert index.satisfied(["a", "b"], new_clues=["a"]) == ["r2"]
+    assert index.satisfied(["a", "b"], new_clues=["x"]) == []
+    assert index.satisfied(["a", "b"], exclude={"r2"}) == ["r1"]
+    assert index.sort(["r3", "r1", "zzz", "r1"]) == ["r1", "r3"]
@@ -0,0 +1,147 @@
+import pytest
+
+import llm_failover
+from llm_failover import DEFAULT_BREAKER_CONFIG, CircuitBreaker, ProviderRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(llm_failover.time, "monotonic", c)
+    return c
+
+
+def make_breaker(**overrides):
+    cfg = dict(DEFAULT_BREAKER_CONFIG, window=10, min_calls=4, cooldown=30.0, probe_timeout=60.0)
+    cfg.update(overrides)
+    return CircuitBreaker(cfg)
+
+
+def trip(breaker):
+    for _ in range(4):
+        breaker.record(False, 0.1)
+
+
+def test_trips_after_error_rate_exceeded(clock):
+    b = make_breaker()
+    for _ in range(3):
+        b.record(False, 0.1)
+    assert b.state == "closed"   # 样本不足 min_calls
+    b.record(False, 0.1)
+    assert b.state == "open"
+    assert b.trips == 1
+    assert not b.available()
+    assert b.acquire() is None
+
+
+def test_trips_on_slow_calls(clock):
+    b = make_breaker(slow_call_seconds=5.0, slow_rate=0.5)
+    for _ in range(4):
+        b.record(True, 6.0)
+    assert b.state == "open"
+
+
+def test_closed_breaker_allows_normal_calls(clock):
+    b = make_breaker()
+    b.record(True, 0.1)
+    assert b.available()
+    assert b.acquire() is False
+
+
+def test_half_open_allows_single_probe(clock):
+    b = make_breaker()
+    trip(b)
+    clock.now += 31
+    assert b.state == "half_open"
+    assert b.available()
+    assert b.acquire() is True
+    # 试探进行中：其余请求一律视为不可用
+    assert not b.available()
+    assert b.acquire() is None
+    assert b.acquire() is None
+
+
+def test_successful_probe_closes_breaker(clock):
+    b = make_breaker()
+    trip(b)
+    clock.now += 31
+    assert b.acquire() is True
+    b.record(True, 0.2, probe=True)
+    assert b.state == "closed"
+    assert b.acquire() is False
+
+
+def test_failed_probe_reopens_breaker(clock):
+    b = make_breaker()
+    trip(b)
+    clock.now += 31
+    assert b.acquire() is True
+    b.record(False, 0.2, probe=True)
+    assert b.state == "open"
+    assert b.trips == 2
+    clock.now += 31
+    assert b.acquire() is True
+
+
+def test_slow_probe_counts_as_failure(clock):
+    b = make_breaker(slow_call_seconds=5.0)
+    trip(b)
+    clock.now += 31
+    b.acquire()
+    b.record(True, 6.0, probe=True)
+    assert b.state == "open"
+
+
+def test_stale_results_do_not_decide_half_open(clock):
+    b = make_breaker()
+    trip(b)
+    clock.now += 31
+    assert b.acquire() is True
+    # 熔断前发出的普通调用此时才返回，不应关闭熔断器或释放试探名额
+    b.record(True, 0.1)
+    assert b.state == "half_open"
+    assert b.acquire() is None
+
+
+def test_released_probe_can_be_retaken(clock):
+    b = make_breaker()
+    trip(b)
+    clock.now += 31
+    assert b.acquire() is True
+    b.release()
+    assert b.acquire() is True
+
+
+def test_lost_probe_expires(clock):
+    b = make_breaker(probe_timeout=10.0)
+    trip(b)
+    clock.now += 31
+    assert b.acquire() is True
+    clock.now += 11
+    assert b.acquire() is True
+
+
+def test_router_skips_breaker_with_probe_in_flight(clock):
+    registry = {
+        "main": {"fallbacks": ["backup"], "breaker": {"min_calls": 2, "cooldown": 30.0}},
+        "backup": {},
+    }
+    router = ProviderRouter(registry)
+    router.record("main", False, 0.1)
+    router.record("main", False, 0.1)
+    assert router.candidates("main") == ["backup"]
+    clock.now += 31
+    assert router.candidates("main") == ["main", "backup"]
+    assert router.acquire("main") is True
+    assert router.candidates("main") == ["backup"]
+    router.record("main", True, 0.1, probe=True)
+    assert router.candidates("main") == ["main", "backup"]
+    assert router.stats()["providers"]["main"]["state"] == "closed"
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import PRIORITIES, LLMScheduler, PriorityLimiter
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_queue_releases_by_priority_then_arrival():
+    async def scenario():
+        limiter = PriorityLimiter(max_in_flight=1)
+        await limiter.acquire(PRIORITIES["talk"])       # 占满唯一名额
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.create_task(waiter(name, PRIORITIES[purpose]))
+                 for name, purpose in [("ending", "ending"), ("tribunal1", "tribunal"),
+                                       ("talk", "talk"), ("tribunal2", "tribunal")]]
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == 4
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert _run(scenario()) == ["talk", "tribunal1", "tribunal2", "ending"]
+
+
+def test_heavy_calls_leave_interactive_reserve():
+    async def scenario():
+        limiter = PriorityLimiter(max_in_flight=3, interactive_reserve=2)
+        await limiter.acquire(PRIORITIES["tribunal"])
+        heavy = asyncio.create_task(limiter.acquire(PRIORITIES["ending"]))
+        await asyncio.sleep(0)
+        assert not heavy.done()          # 非交互调用只能用 1 个名额
+        # 交互调用仍能直接拿到预留名额，不被排队的结局请求挡住
+        await asyncio.wait_for(limiter.acquire(PRIORITIES["talk"]), 0.1)
+        await asyncio.wait_for(limiter.acquire(PRIORITIES["confront"]), 0.1)
+        assert limiter.in_flight == 3
+        limiter.release()                # 释放一个交互名额：in_flight=2，仍超过 heavy_limit
+        await asyncio.sleep(0)
+        assert not heavy.done()
+        limiter.release()
+        limiter.release()
+        await asyncio.wait_for(heavy, 0.1)
+        assert limiter.in_flight == 1
+
+    _run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        limiter = PriorityLimiter(max_in_flight=1)
+        await limiter.acquire(0)
+        waiter = asyncio.create_task(limiter.acquire(0))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        assert limiter.in_flight == 0
+        assert limiter.stats()["queue_depth"] == 0
+
+    _run(scenario())
+
+
+def test_scheduler_uses_registry_config():
+    async def scenario():
+        scheduler = LLMScheduler({"m": {"scheduler": {"max_in_flight": 2, "interactive_reserve": 1}}})
+        async with scheduler.slot("m", "talk"):
+            stats = scheduler.stats()["m"]
+            assert (stats["max_in_flight"], stats["heavy_limit"], stats["in_flight"]) == (2, 1, 1)
+        assert scheduler.stats()["m"]["in_flight"] == 0
+
+    _run(scenario())
@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+
+from session_store import SessionError, SessionStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def _open(*args, **kwargs):
+    store = SessionStore(*args, **kwargs)
+    store.open()
+    return store
+
+
+def _version(token):
+    return int(token.split(".")[2])
+
+
+def test_double_submit_gets_distinct_versions(db_path):
+    store = _open(b"secret", db_path=db_path, flush_interval=0)
+    try:
+        t1 = store.save(None, 0, b"v1")
+        sid, version, _ = store.load(t1)
+        # 同一个旧令牌提交两次：两份新存档各有自己的版本，互不覆盖
+        a = store.save(sid, version, b"fork-a")
+        b = store.save(sid, version, b"fork-b")
+        assert _version(a) != _version(b)
+        assert store.load(a)[2] == b"fork-a"
+        assert store.load(b)[2] == b"fork-b"
+    finally:
+        store.close()
+
+
+def test_versions_survive_restart(db_path):
+    store = _open(b"secret", db_path=db_path, flush_interval=0)
+    t1 = store.save(None, 0, b"v1")
+    sid, version, _ = store.load(t1)
+    t2 = store.save(sid, version, b"v2")
+    store.close()
+
+    store = _open(b"secret", db_path=db_path, flush_interval=0)
+    try:
+        # 重启后用旧令牌 t1 继续：新版本不能与磁盘上的 t2 撞号
+        sid, version, data = store.load(t1)
+        assert data == b"v1"
+        t3 = store.save(sid, version, b"v3")
+        assert _version(t3) > _version(t2)
+        store.close()
+        store = _open(b"secret", db_path=db_path, flush_interval=0)
+        assert store.load(t2)[2] == b"v2"
+        assert store.load(t3)[2] == b"v3"
+    finally:
+        store.close()
+
+
+def test_expired_session_raises(db_path):
+    store = _open(b"secret", db_path=None, ttl=0.01)
+    token = store.save(None, 0, b"v1")
+    time.sleep(0.02)
+    with pytest.raises(SessionError):
+        store.load(token)
+
+
+def test_bad_signature_raises():
+    store = _open(b"secret", db_path=None)
+    token = store.save(None, 0, b"v1")
+    with pytest.raises(SessionError):
+        store.load(token[:-2] + "xx")
+
+
+def test_construction_does_not_touch_disk(db_path):
+    store = SessionStore(b"secret", db_path=db_path)
+    assert not os.path.exists(db_path)
+    with pytest.raises(RuntimeError):
+        store.save(None, 0, b"v1")
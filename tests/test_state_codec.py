@@ -0,0 +1,94 @@
+import copy
+import os
+
+import pytest
+
+from conditional_clues import CONDITIONAL_CLUE_DB, TRUST_CLUE_DB
+from state_codec import StateCodec, StateCodecError, StateRegistry
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "state_registry.json")
+
+
+@pytest.fixture
+def registry():
+    return StateRegistry.load(REGISTRY_PATH)
+
+
+def _late_game_state(registry):
+    tables = registry.tables
+    npcs = tables["npcs"]
+    trust_ids = [tc["clue_id"] for tc in TRUST_CLUE_DB]
+    return {
+        "schema_version": 2,
+        "player_name": "李密卫",
+        "dynamic_state": {
+            "day": 3,
+            "current_location": tables["locations"][-1],
+            "time_idx": 11,
+            "ap_used_this_cycle": 2,
+            # 卷宗按获得顺序展示：不按注册表顺序，且包含信任线索
+            "inventory": {"clues_collected": list(reversed(tables["clues"]))},
+            "npc_locations": {npc: tables["locations"][i] for i, npc in enumerate(npcs)},
+            "game_over": False,
+            "temp_accuse_target": npcs[1],
+            "conversation_history": {npcs[0]: [{"role": "user", "content": "昨夜你在哪？"}]},
+            "confrontation_used": {npcs[0]: True},
+            "npc_activities": {npc: {"discovered": [], "theory": "", "last_action": ""} for npc in npcs},
+            "tribunal_count": 1,
+            "inferences_unlocked": list(tables["inferences"]),
+            "trust_clues_triggered": [c for c in tables["clues"] if c in trust_ids],
+            "npc_statements": {},
+            "npc_trust": {npc: 80 for npc in npcs},
+            "search_counts": {"灶房:灶台": 2},
+            "search_penalty": {},
+            "pending_trust_clues": [],
+            "room_inspect_count": 4,
+            "last_talk_npc": npcs[-1],
+        },
+    }
+
+
+def test_all_catalog_clues_are_registered(registry):
+    clue_ids = [c["clue_data"]["id"] for c in CONDITIONAL_CLUE_DB.values()]
+    clue_ids += [tc["clue_data"]["id"] for tc in TRUST_CLUE_DB]
+    assert not registry.missing(clues=clue_ids)
+
+
+def test_late_game_round_trip(registry):
+    codec = StateCodec(registry)
+    state = _late_game_state(registry)
+    data = codec.encode(state)
+    assert codec.decode(data) == state
+    # 线索都在注册表里：卷宗和信任线索走二进制字段，不会整体落进 JSON extras
+    assert b"clues_collected" not in data
+    assert b"clue_" not in data
+
+
+def test_old_generation_decodes_after_append(registry):
+    old_codec = StateCodec(registry)
+    state = _late_game_state(registry)
+    data = old_codec.encode(state)
+
+    grown = copy.deepcopy(registry)
+    grown.extend(clues=["clue_new"], locations=["新房间"])
+    assert grown.generation == registry.generation + 1
+    codec = StateCodec(grown)
+    assert codec.decode(data) == state
+
+    state["dynamic_state"]["inventory"]["clues_collected"].append("clue_new")
+    assert codec.decode(codec.encode(state)) == state
+    # 新代号的存档旧代码认不出来：明确报错，而不是解出错位的数据
+    with pytest.raises(StateCodecError):
+        old_codec.decode(codec.encode(state))
+
+
+def test_oversized_table_disables_binary_encoding(registry):
+    grown = copy.deepcopy(registry)
+    grown.extend(clues=[f"clue_extra_{i}" for i in range(300)])
+    codec = StateCodec(grown)
+    assert not codec.can_encode
+    with pytest.raises(StateCodecError):
+        codec.encode(_late_game_state(registry))
+    # 旧代号的存档照样能解
+    state = _late_game_state(registry)
+    assert codec.decode(StateCodec(registry).encode(state)) == state
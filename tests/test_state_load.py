@@ -0,0 +1,37 @@
+import pytest
+
+from state_codec import StateCodecError
+from state_compress import FRAME_MAGIC, StateCompressor
+
+
+@pytest.fixture
+def main_module(monkeypatch):
+    """load_state 在 main 里；依赖缺失（fastapi / cryptography）时跳过。"""
+    pytest.importorskip("fastapi")
+    fernet = pytest.importorskip("cryptography.fernet")
+    monkeypatch.setenv("GAME_SECRET_KEY", fernet.Fernet.generate_key().decode())
+    monkeypatch.setenv("STATE_STORE", "token")
+    import main
+    return main
+
+
+def _unknown_dict_frame() -> bytes:
+    return bytes([FRAME_MAGIC, 250]) + b"\x00" * 8
+
+
+def test_unknown_dictionary_raises_codec_error(tmp_path):
+    with pytest.raises(StateCodecError):
+        StateCompressor(str(tmp_path)).decompress(_unknown_dict_frame())
+
+
+def test_unknown_dictionary_is_not_a_new_game(main_module):
+    token = main_module.state_tokens._cipher.encrypt(_unknown_dict_frame()).decode()
+    with pytest.raises(main_module.StateLoadError):
+        main_module.load_state(token)
+
+
+def test_future_schema_version_is_not_a_new_game(main_module):
+    raw = main_module.state_tokens.serialize({"schema_version": 99, "player_name": "李密卫", "dynamic_state": {}})
+    token = main_module.state_tokens.encrypt(raw)
+    with pytest.raises(main_module.StateLoadError):
+        main_module.load_state(token)
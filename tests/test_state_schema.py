@@ -0,0 +1,39 @@
+import pytest
+
+from state_schema import SCHEMA_VERSION, StateSchemaError, default_dynamic_state, new_game_state, upgrade
+
+NPC_IDS = ["npc_lidefu", "npc_zhaohu"]
+
+
+def _state(version, d_state):
+    state = {"player_name": "李密卫", "dynamic_state": d_state}
+    if version is not None:
+        state["schema_version"] = version
+    return state
+
+
+def test_v1_state_gains_v2_fields():
+    d_state = new_game_state(NPC_IDS, ["大堂"])["dynamic_state"]
+    for key in ("search_counts", "search_penalty", "pending_trust_clues", "room_inspect_count", "last_talk_npc"):
+        del d_state[key]
+    d_state["day"] = 3
+    state = upgrade(_state(1, d_state), NPC_IDS)
+    assert state["schema_version"] == 2
+    assert d_state["search_counts"] == {} and d_state["room_inspect_count"] == 0
+    assert d_state["day"] == 3   # 已有字段不被默认值覆盖
+
+
+def test_unversioned_state_runs_every_migration():
+    state = upgrade(_state(None, {"current_location": "灶房", "inventory": {"clues_collected": ["clue_a"]}}), NPC_IDS)
+    assert state["schema_version"] == SCHEMA_VERSION
+    assert set(default_dynamic_state(NPC_IDS)) - {"npc_locations", "time_idx", "ap_used_this_cycle"} \
+        <= set(state["dynamic_state"])
+    assert state["dynamic_state"]["current_location"] == "灶房"
+
+
+@pytest.mark.parametrize("version", [SCHEMA_VERSION + 1, -1, "2"])
+def test_unknown_version_is_rejected(version):
+    state = _state(version, {})
+    with pytest.raises(StateSchemaError):
+        upgrade(state, NPC_IDS)
+    assert state["schema_version"] == version
@@ -0,0 +1,165 @@
+"""
+train_state_dict.py
+训练存档压缩用的 zlib 预置字典（见 state_compress.py）
+
+用法：
+  python train_state_dict.py --simulate 300            # 自动随机游玩生成样本
+  python train_state_dict.py --tokens tokens.txt        # 用线上收集的令牌（每行一个）
+  python train_state_dict.py --states states.jsonl      # 用解密后的存档（每行一个 JSON）
+
+输出到 state_dicts/state_v<N>.zdict（N 为现有最大版本 + 1），不会覆盖旧字典；
+部署后新令牌使用新字典，旧令牌仍按各自的版本号解压。
+
+训练方法：把样本按 STATE_CODEC 序列化，切成 JSON 片段（键名、字符串值、结构符号），
+按「出现在多少份样本中 × 片段长度」打分，高分片段放在字典末尾（离数据最近，引用最短），
+直到填满 --size 字节。
+
+--tokens / --states 只用 state_token 解开存档，不加载游戏服务（main.py）；
+--simulate 需要游戏逻辑，才会 import main，整个模拟在同一个事件循环里跑完。
+服务端存档令牌（STATE_STORE=server）里没有存档内容，--tokens 会跳过它们。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import zlib
+from collections import Counter
+from typing import Iterable, List
+
+from dotenv import load_dotenv
+
+import state_token
+from session_store import is_session_token
+from state_compress import dict_path, load_dictionaries
+from state_schema import upgrade as upgrade_state_schema
+
+# 字符串（含引号）、数字、结构符号序列
+_FRAGMENT_RE = re.compile(rb'"(?:[^"\\]|\\.)*"\s*:?|-?\d+|[\[\]{},:]+')
+
+# 模拟游玩时可以不调用 LLM 的操作（与前端 handleAction 一致）
+_ACTION_INPUTS = {
+    "SEARCH_ENTER": "CMD_ENTER_ROOM:{}",
+    "INSPECT": "CMD_INSPECT:{}",
+    "INSPECT_CONDITIONAL": "CMD_INSPECT_CONDITIONAL:{}",
+    "EXIT": "CMD_EXIT:{}",
+    "RECALL_CLUES": "CMD_RECALL_CLUES",
+    "RECALL_INFERENCES": "CMD_RECALL_INFERENCES",
+    "RECALL_TIMELINE": "CMD_RECALL_TIMELINE",
+    "OBSERVE_NPC_DETAIL": "CMD_OBSERVE_NPC_DETAIL:{}",
+}
+_MENU_INPUTS = ["CMD_SHOW_SEARCH_MENU", "CMD_SHOW_RECALL_MENU", "系统菜单"]
+
+
+async def simulate_states(main, games: int, max_turns: int = 60) -> List[dict]:
+    """不接 LLM，随机走搜查 / 回想流程，收集每一轮的存档。"""
+    states = []
+    for _ in range(games):
+        state = main.decrypt_state(None)
+        token = main.encrypt_state(state)
+        for _ in range(random.randint(5, max_turns)):
+            request = main.GameRequest(user_input=random.choice(_MENU_INPUTS), encrypted_state=token)
+            resp = await main.run_chat_turn(request)
+            options = [o for o in resp.ui_options if o.action_type in _ACTION_INPUTS]
+            token = resp.new_encrypted_state or token
+            for _ in range(random.randint(1, 4)):
+                if not options:
+                    break
+                opt = random.choice(options)
+                user_input = _ACTION_INPUTS[opt.action_type].format(opt.payload)
+                request = main.GameRequest(user_input=user_input, encrypted_state=token)
+                resp = await main.run_chat_turn(request)
+                token = resp.new_encrypted_state or token
+                options = [o for o in resp.ui_options if o.action_type in _ACTION_INPUTS]
+                states.append(main.decrypt_state(token))
+    return states
+
+
+def load_tokens(tokens: state_token.StateTokens, path: str) -> List[dict]:
+    states, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            token = line.strip()
+            if not token:
+                continue
+            if is_session_token(token):
+                skipped += 1
+                continue
+            state = tokens.deserialize(tokens.decrypt(token))
+            upgrade_state_schema(state, tokens.registry.tables["npcs"])
+            states.append(state)
+    if skipped:
+        print(f"跳过 {skipped} 个服务端存档令牌")
+    return states
+
+
+def train(samples: Iterable[bytes], size: int) -> bytes:
+    doc_freq: Counter = Counter()
+    for sample in samples:
+        doc_freq.update(set(_FRAGMENT_RE.findall(sample)))
+    scored = sorted(
+        ((freq * len(frag), frag) for frag, freq in doc_freq.items() if freq > 1 and len(frag) > 2),
+        reverse=True,
+    )
+    chosen, total = [], 0
+    for _, frag in scored:
+        if total + len(frag) > size:
+            continue
+        chosen.append(frag)
+        total += len(frag)
+    # 分数最高的放在最后
+    return b"".join(reversed(chosen))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="训练存档压缩字典")
+    parser.add_argument("--simulate", type=int, default=0, help="随机游玩的局数")
+    parser.add_argument("--tokens", help="令牌文件（每行一个）")
+    parser.add_argument("--states", help="存档 JSONL 文件")
+    parser.add_argument("--size", type=int, default=16 * 1024, help="字典大小上限（字节，最大 32768）")
+    parser.add_argument("--out-dir", default="state_dicts")
+    args = parser.parse_args()
+
+    # 训练时不使用已有字典（解压旧令牌不受影响），也不接 LLM
+    load_dotenv()
+    os.environ["STATE_DICT_VERSION"] = "0"
+    tokens = state_token.from_env()
+
+    states = []
+    if args.simulate:
+        import main
+        states += asyncio.run(simulate_states(main, args.simulate))
+    if args.tokens:
+        states += load_tokens(tokens, args.tokens)
+    if args.states:
+        with open(args.states, encoding="utf-8") as f:
+            states += [json.loads(line) for line in f if line.strip()]
+    if not states:
+        parser.error("没有样本：请指定 --simulate / --tokens / --states")
+
+    samples = [tokens.serialize(s) for s in states]
+    zdict = train(samples, min(args.size, 32768))
+
+    version = max(load_dictionaries(args.out_dir), default=0) + 1
+    if version > 255:
+        sys.exit("字典版本号已用尽（最大 255）")
+    os.makedirs(args.out_dir, exist_ok=True)
+    path = dict_path(args.out_dir, version)
+    with open(path, "wb") as f:
+        f.write(zdict)
+
+    plain = sum(len(zlib.compress(s)) for s in samples)
+    with_dict = 0
+    for s in samples:
+        c = zlib.compressobj(level=9, zdict=zdict)
+        with_dict += len(c.compress(s) + c.flush())
+    print(f"样本 {len(samples)} 份，字典 {len(zdict)} 字节 → {path}")
+    print(f"平均压缩后大小：无字典 {plain / len(samples):.0f} B，有字典 {with_dict / len(samples):.0f} B "
+          f"（{(1 - with_dict / plain) * 100:.1f}%↓）")
+
+
+if __name__ == "__main__":
+    main_cli()